@@ -2,6 +2,7 @@ import sys
 import os
 sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '../'))
 from pycore.tikzeng import *
+from pycore.registry import define_layer
 
 # Define custom colors for quantum and special components
 def to_custom_colors():
@@ -20,51 +21,23 @@ def to_custom_colors():
 """
 
 # Custom Quantum Layer
-def to_Quantum(name, s_filer=256, n_filer=2, offset="(0,0,0)", to="(0,0,0)", width=3, height=25, depth=25, caption="Quantum"):
-    return r"""
-\pic[shift={""" + offset + r"""}] at """ + to + r""" 
-    {Box={
-        name=""" + name + r""",
-        caption=""" + caption + r""",
-        xlabel={{""" + str(n_filer) + r""", }},
-        zlabel=""" + str(s_filer) + r""",
-        fill=\QuantumColor,
-        height=""" + str(height) + r""",
-        width=""" + str(width) + r""",
-        depth=""" + str(depth) + r"""
-        }
-    };
-"""
+to_Quantum = define_layer( 'Quantum', 'Box',
+    keys=( 'caption', 'xlabel', 'zlabel', 'fill', 'height', 'width', 'depth' ),
+    args=( 's_filer', 'n_filer', 'offset', 'to', 'width', 'height', 'depth', 'caption' ),
+    s_filer=256, n_filer=2, width=3, height=25, depth=25, caption="Quantum", fill=r"\QuantumColor" )
 
 # Custom Fusion Layer
-def to_Fusion(name, offset="(0,0,0)", to="(0,0,0)", radius=3.5, opacity=0.8):
-    return r"""
-\pic[shift={""" + offset + r"""}] at """ + to + r""" 
-    {Ball={
-        name=""" + name + r""",
-        fill=\FusionColor,
-        opacity=""" + str(opacity) + r""",
-        radius=""" + str(radius) + r""",
-        logo=$\alpha$
-        }
-    };
-"""
+to_Fusion = define_layer( 'Fusion', 'Ball',
+    keys=( 'fill', 'opacity', 'radius', 'logo' ),
+    args=( 'offset', 'to', 'radius', 'opacity' ),
+    radius=3.5, opacity=0.8, fill=r"\FusionColor", logo=r"$\alpha$" )
 
 # Custom Layer Norm
-def to_LayerNorm(name, n_filer=2, offset="(0,0,0)", to="(0,0,0)", width=1.5, height=20, depth=20, caption="LayerNorm"):
-    return r"""
-\pic[shift={""" + offset + r"""}] at """ + to + r""" 
-    {Box={
-        name=""" + name + r""",
-        caption=""" + caption + r""",
-        xlabel={{""" + str(n_filer) + r"""}},
-        fill=\NormColor,
-        height=""" + str(height) + r""",
-        width=""" + str(width) + r""",
-        depth=""" + str(depth) + r"""
-        }
-    };
-"""
+to_LayerNorm = define_layer( 'LayerNorm', 'Box',
+    keys=( 'caption', 'xlabel', 'fill', 'height', 'width', 'depth' ),
+    args=( 'n_filer', 'offset', 'to', 'width', 'height', 'depth', 'caption' ),
+    n_filer=2, width=1.5, height=20, depth=20, caption="LayerNorm", fill=r"\NormColor",
+    pad_xlabel=False )
 
 # Architecture for Hybrid Model matching HybridQuantumGenomicModel
 arch = [
@@ -0,0 +1,101 @@
+import os
+import hashlib
+
+try:
+    from PIL import Image
+except ImportError:  # optional, only needed to downsample input images
+    Image = None
+
+from . import ir
+from .cache import CACHE_DIR, file_digest
+
+# Input images: to_input draws its image at width x height cm, but \includegraphics
+# embeds the file at whatever resolution it has. With a target DPI the image is
+# resized to the printed size and recompressed (JPEG, PNG if it has transparency)
+# into a content-addressed asset cache, shared by every diagram and run that uses
+# the same file at the same size; the TeX then includes the cached copy. Images
+# that are already small enough, or that Pillow cannot read (PDF, EPS), are used
+# as they are.
+
+ASSET_DIR = os.path.join( CACHE_DIR, 'assets' )
+
+# default for to_input( ..., dpi=None ); None keeps the original file
+INPUT_DPI = None
+
+QUALITY = 85
+
+
+def _pixels( cm, dpi ):
+    return max( 1, int( round( float( cm ) / 2.54 * dpi ) ) )
+
+
+def site_dir( node ):
+    # directory of the script whose to_* call made `node`, None if it is not a file
+    filename = ( node.site or '' ).rpartition( ':' )[0]
+    return os.path.dirname( os.path.abspath( filename ) ) if os.path.isfile( filename ) else None
+
+
+def downsample( path, width, height, dpi, cwd=None, assetdir=None, quality=QUALITY ):
+    # absolute path of a copy of `path` fitting width x height cm at `dpi`, or `path` if it needs none;
+    # a relative `path` is read from `cwd`, the directory the TeX is compiled in
+    if Image is None:
+        raise ImportError( "downsampling input images needs Pillow (pip install pillow)" )
+    source = os.path.join( cwd or os.getcwd(), path )
+    size = ( _pixels( width, dpi ), _pixels( height, dpi ) )
+    try:
+        digest = file_digest( os.path.abspath( source ) )
+    except OSError:
+        return path  # validate and pdflatex report missing files
+    assetdir = assetdir or ASSET_DIR
+    key = hashlib.sha256( '{}\0{}x{}\0{}'.format( digest, size[0], size[1], quality ).encode() ).hexdigest()
+    for ext in ( '.jpg', '.png' ):
+        cached = os.path.join( assetdir, key + ext )
+        if os.path.exists( cached ):
+            return cached
+    # an empty .keep file records that this image at this size is used as it is
+    keep = os.path.join( assetdir, key + '.keep' )
+    if os.path.exists( keep ):
+        return path
+    os.makedirs( assetdir, exist_ok=True )
+    try:
+        img = Image.open( source )
+        img.load()
+    except OSError:
+        img = None
+    # one factor for both sides, large enough that neither drops below `dpi`
+    scale = max( size[0] / img.width, size[1] / img.height ) if img is not None else 1.
+    if scale >= 1.:
+        open( keep, 'w' ).close()
+        return path
+    alpha = img.mode in ( 'RGBA', 'LA' ) or ( img.mode == 'P' and 'transparency' in img.info )
+    img = img.convert( 'RGBA' if alpha else 'RGB' )
+    img = img.resize( ( max( 1, round( img.width * scale ) ), max( 1, round( img.height * scale ) ) ), Image.LANCZOS )
+    cached = os.path.join( assetdir, key + ( '.png' if alpha else '.jpg' ) )
+    tmp = '{}.{}.tmp'.format( cached, os.getpid() )
+    if alpha:
+        img.save( tmp, 'PNG', optimize=True )
+    else:
+        img.save( tmp, 'JPEG', quality=quality, optimize=True, progressive=True )
+    os.replace( tmp, cached )
+    return cached
+
+
+def downsample_inputs( arch, dpi, cwd=None, assetdir=None ):
+    # the arch with every to_input image replaced by its downsampled copy; without a
+    # cwd, relative images are read from the directory of the script that added them
+    out = []
+    for c in arch:
+        if isinstance( c, ir.Block ):
+            out.append( ir.Block( c.kind, c.name, downsample_inputs( c, dpi, cwd, assetdir ), c.site ) )
+            continue
+        if isinstance( c, list ):
+            out.append( downsample_inputs( c, dpi, cwd, assetdir ) )
+            continue
+        node = c.node if isinstance( c, ir.Fragment ) else c
+        if isinstance( node, ir.Layer ) and node.kind == 'Input':
+            image = downsample( node.style['image'], node.dims['width'], node.dims['height'], dpi, cwd or site_dir( node ), assetdir )
+            if image != node.style['image']:
+                node = node.replace( style=dict( node.style, image=image ) )
+                c = ir.Fragment( node ) if isinstance( c, ir.Fragment ) else node
+        out.append( c )
+    return out
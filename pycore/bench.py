@@ -0,0 +1,148 @@
+import io
+import os
+import sys
+import json
+import glob
+import time
+import timeit
+import shutil
+import platform
+import argparse
+
+from .tikzeng import *
+from .blocks import *
+from .render import ENGINE, render_job
+
+# Benchmarks: python -m pycore.bench -o results.json [--baseline old.json]
+# emit.*     one to_*/block_* call
+# generate.* to_generate of a synthetic arch with N layers
+# compile.*  end-to-end pdflatex of pyexamples/*.py and examples/*.tex
+
+ROOT = os.path.dirname( os.path.dirname( os.path.abspath( __file__ ) ) )
+
+EMITTERS = {
+    'to_Conv':         lambda: to_Conv( "conv1", 512, 64, offset="(0,0,0)", to="(0,0,0)", height=64, depth=64, width=2 ),
+    'to_ConvConvRelu': lambda: to_ConvConvRelu( "ccr1", 500, (64,64), offset="(0,0,0)", to="(0,0,0)", width=(2,2), height=40, depth=40 ),
+    'to_Pool':         lambda: to_Pool( "pool1", offset="(0,0,0)", to="(conv1-east)" ),
+    'to_UnPool':       lambda: to_UnPool( "unpool1", offset="(0,0,0)", to="(conv1-east)" ),
+    'to_ConvRes':      lambda: to_ConvRes( "res1", 256, 64, offset="(0,0,0)", to="(conv1-east)" ),
+    'to_ConvSoftMax':  lambda: to_ConvSoftMax( "soft1", 40, offset="(0,0,0)", to="(conv1-east)" ),
+    'to_SoftMax':      lambda: to_SoftMax( "soft1", 10, "(3,0,0)", "(pool1-east)", caption="SOFT" ),
+    'to_Sum':          lambda: to_Sum( "sum1", offset="(1.5,0,0)", to="(soft1-east)" ),
+    'to_input':        lambda: to_input( '../examples/fcn8s/cats.jpg' ),
+    'to_connection':   lambda: to_connection( "pool1", "conv2" ),
+    'to_skip':         lambda: to_skip( of='ccr_b1', to='ccr_res_b9', pos=1.25 ),
+    'block_2ConvPool': lambda: block_2ConvPool( name='b2', botton='pool_b1', top='pool_b2' ),
+    'block_Unconv':    lambda: block_Unconv( name="b6", botton="ccr_b5", top='end_b6' ),
+    'block_Res':       lambda: block_Res( 4, name='res', botton='pool_b1', top='res_top' ),
+}
+
+SIZES = ( 10, 100, 1000, 10000, 100000 )
+
+
+def synthetic_arch( n ):
+    # n layers: conv/pool pairs chained east to west with connections
+    yield to_head( '..' )
+    yield to_cor()
+    yield to_begin()
+    yield to_Conv( "l0", 64, 64, offset="(0,0,0)", to="(0,0,0)", height=32, depth=32, width=2 )
+    for i in range( 1, n ):
+        if i % 2:
+            yield to_Pool( "l{}".format( i ), offset="(0,0,0)", to="(l{}-east)".format( i - 1 ) )
+        else:
+            yield to_Conv( "l{}".format( i ), 64, 64, offset="(1,0,0)", to="(l{}-east)".format( i - 1 ), height=32, depth=32, width=2 )
+            yield to_connection( "l{}".format( i - 1 ), "l{}".format( i ) )
+    yield to_end()
+
+
+def best_of( fn, repeat=3 ):
+    timer = timeit.Timer( fn )
+    number, _ = timer.autorange()
+    return min( timer.repeat( repeat=repeat, number=number ) ) / number
+
+
+def bench_emitters( repeat=3 ):
+    return { 'emit.' + name: best_of( fn, repeat ) for name, fn in EMITTERS.items() }
+
+
+def bench_generate( sizes=SIZES, repeat=3 ):
+    results = {}
+    for n in sizes:
+        def run():
+            to_generate( synthetic_arch( n ), io.StringIO(), echo=False )
+        results['generate.{}'.format( n )] = min( timeit.repeat( run, repeat=repeat if n <= 10000 else 1, number=1 ) )
+    return results
+
+
+def bench_compile( engine=ENGINE, repeat=1 ):
+    sources = sorted( glob.glob( os.path.join( ROOT, 'pyexamples', '*.py' ) ) ) + sorted( glob.glob( os.path.join( ROOT, 'examples', '*', '*.tex' ) ) )
+    results = {}
+    for src in sources:
+        name = 'compile.' + os.path.splitext( os.path.relpath( src, ROOT ) )[0].replace( os.sep, '/' )
+        times = []
+        for _ in range( repeat ):
+            status = render_job( src, outdir=os.path.join( ROOT, '.bench' ), engine=engine )
+            if status['status'] != 'ok':
+                print( '{}: {}'.format( name, status['error'].splitlines()[0] ), file=sys.stderr )
+                break
+            times.append( status['seconds'] )
+        if times:
+            results[name] = min( times )
+    shutil.rmtree( os.path.join( ROOT, '.bench' ), ignore_errors=True )
+    return results
+
+
+def compare( results, baseline, threshold=0.25 ):
+    # (name, baseline seconds, current seconds, ratio) for everything slower than 1 + threshold
+    regressions = []
+    for name, seconds in sorted( results.items() ):
+        base = baseline.get( name )
+        if base and seconds / base > 1 + threshold:
+            regressions.append( ( name, base, seconds, seconds / base ) )
+    return regressions
+
+
+def run( sizes=SIZES, with_compile=True, engine=ENGINE, repeat=3 ):
+    results = {}
+    results.update( bench_emitters( repeat ) )
+    results.update( bench_generate( sizes, repeat ) )
+    if with_compile:
+        if shutil.which( engine ):
+            results.update( bench_compile( engine ) )
+        else:
+            print( '{} not found, skipping compile benchmarks'.format( engine ), file=sys.stderr )
+    return {
+        'meta': { 'python': platform.python_version(), 'platform': platform.platform(), 'time': time.strftime( '%Y-%m-%dT%H:%M:%S' ) },
+        'results': results,
+    }
+
+
+def main( argv=None ):
+    parser = argparse.ArgumentParser( prog='python -m pycore.bench', description='Benchmark emitters, to_generate and pdflatex compiles.' )
+    parser.add_argument( '-o', '--output', default=None, help='write results as JSON' )
+    parser.add_argument( '--baseline', default=None, help='JSON results to compare against' )
+    parser.add_argument( '--threshold', type=float, default=0.25, help='allowed slowdown before a result counts as regression (default: 0.25)' )
+    parser.add_argument( '--sizes', type=int, nargs='+', default=list( SIZES ), help='synthetic arch sizes for to_generate' )
+    parser.add_argument( '--no-compile', action='store_true', help='skip the pdflatex benchmarks' )
+    parser.add_argument( '--engine', default=ENGINE )
+    parser.add_argument( '--repeat', type=int, default=3 )
+    args = parser.parse_args( argv )
+
+    report = run( args.sizes, not args.no_compile, args.engine, args.repeat )
+    for name, seconds in sorted( report['results'].items() ):
+        print( '{:40} {:12.6f} ms'.format( name, seconds * 1e3 ) )
+    if args.output:
+        with open( args.output, 'w' ) as f:
+            json.dump( report, f, indent=2, sort_keys=True )
+    if args.baseline:
+        with open( args.baseline ) as f:
+            baseline = json.load( f )['results']
+        regressions = compare( report['results'], baseline, args.threshold )
+        for name, base, seconds, ratio in regressions:
+            print( 'REGRESSION {}: {:.6f} ms -> {:.6f} ms ({:+.0%})'.format( name, base * 1e3, seconds * 1e3, ratio - 1 ) )
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit( main() )
@@ -1,9 +1,23 @@
 
 from .tikzeng import *
+from .ir import Block, Fragment
+
+
+def _call( macro, *args ):
+    # \macro{a}{b}..., tuples become a run of groups: ( 1, 2 ) -> {{1}{2}}
+    def group( a ):
+        return '{' + ( ''.join( group( x ) for x in a ) if isinstance( a, tuple ) else str( a ) ) + '}'
+    return '\n\\' + macro + ''.join( group( a ) for a in args ) + '\n'
+
+
+def _compact( block, tex ):
+    # same IR nodes, but the whole block is emitted as one macro call from layers/Blocks.sty
+    return Block( block.kind, block.name, [ Fragment( c.node, tex if i == 0 else '' ) for i, c in enumerate( block ) ], block.site )
+
 
 #define new block
-def block_2ConvPool( name, botton, top, s_filer=256, n_filer=64, offset="(1,0,0)", size=(32,32,3.5), opacity=0.5 ):
-    return [
+def block_2ConvPool( name, botton, top, s_filer=256, n_filer=64, offset="(1,0,0)", size=(32,32,3.5), opacity=0.5, compact=False ):
+    block = Block( '2ConvPool', name, [
     to_ConvConvRelu( 
         name="ccr_{}".format( name ),
         s_filer=str(s_filer), 
@@ -26,11 +40,15 @@ def block_2ConvPool( name, botton, top, s_filer=256, n_filer=64, offset="(1,0,0)
         "{}".format( botton ), 
         "ccr_{}".format( name )
         )
-    ]
+    ] )
+    if compact:
+        return _compact( block, _call( 'pnnTwoConvPool', name, botton, top, s_filer, n_filer, offset,
+            ( size[2], size[0], size[1] ), ( 1, size[0] - int(size[0]/4), size[1] - int(size[0]/4) ), opacity ) )
+    return block
 
 
-def block_Unconv( name, botton, top, s_filer=256, n_filer=64, offset="(1,0,0)", size=(32,32,3.5), opacity=0.5 ):
-    return [
+def block_Unconv( name, botton, top, s_filer=256, n_filer=64, offset="(1,0,0)", size=(32,32,3.5), opacity=0.5, compact=False ):
+    block = Block( 'Unconv', name, [
         to_UnPool(  name='unpool_{}'.format(name),    offset=offset,    to="({}-east)".format(botton),         width=1,              height=size[0],       depth=size[1], opacity=opacity ),
         to_ConvRes( name='ccr_res_{}'.format(name),   offset="(0,0,0)", to="(unpool_{}-east)".format(name),    s_filer=str(s_filer), n_filer=str(n_filer), width=size[2], height=size[0], depth=size[1], opacity=opacity ),       
         to_Conv(    name='ccr_{}'.format(name),       offset="(0,0,0)", to="(ccr_res_{}-east)".format(name),   s_filer=str(s_filer), n_filer=str(n_filer), width=size[2], height=size[0], depth=size[1] ),
@@ -40,17 +58,22 @@ def block_Unconv( name, botton, top, s_filer=256, n_filer=64, offset="(1,0,0)",
             "{}".format( botton ), 
             "unpool_{}".format( name ) 
             )
-    ]
+    ] )
+    if compact:
+        return _compact( block, _call( 'pnnUnconv', name, botton, top, s_filer, n_filer, offset,
+            ( size[2], size[0], size[1] ), ( 1, size[0], size[1] ), opacity ) )
+    return block
 
 
 
 
-def block_Res( num, name, botton, top, s_filer=256, n_filer=64, offset="(0,0,0)", size=(32,32,3.5), opacity=0.5 ):
+def block_Res( num, name, botton, top, s_filer=256, n_filer=64, offset="(0,0,0)", size=(32,32,3.5), opacity=0.5, compact=False ):
+    first = botton
     lys = []
     layers = [ *[ '{}_{}'.format(name,i) for i in range(num-1) ], top]
-    for name in layers:        
+    for ly_name in layers:        
         ly = [ to_Conv( 
-            name='{}'.format(name),       
+            name='{}'.format(ly_name),       
             offset=offset, 
             to="({}-east)".format( botton ),   
             s_filer=str(s_filer), 
@@ -61,15 +84,19 @@ def block_Res( num, name, botton, top, s_filer=256, n_filer=64, offset="(0,0,0)"
             ),
             to_connection( 
                 "{}".format( botton  ), 
-                "{}".format( name ) 
+                "{}".format( ly_name ) 
                 )
             ]
-        botton = name
+        botton = ly_name
         lys+=ly
     
     lys += [
         to_skip( of=layers[1], to=layers[-2], pos=1.25),
     ]
-    return lys
+    if compact:
+        # the repeated convs become a \foreach in \pnnResBlock
+        return _compact( Block( 'Res', name, lys ), _call( 'pnnResBlock', name, first, top, num, offset,
+            ( s_filer, n_filer, size[2], size[0], size[1] ), layers[1], layers[-2] ) )
+    return Block( 'Res', name, lys )
 
 
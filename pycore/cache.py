@@ -0,0 +1,151 @@
+import os
+import re
+import shutil
+import hashlib
+import threading
+
+# Content-addressed PDF cache: the key covers the final TeX, the layer library it
+# imports (layers/*.sty, init.tex) and every \includegraphics file it references.
+
+CACHE_DIR = os.path.join( os.path.expanduser( '~' ), '.cache', 'plotneuralnet' )
+
+_SUBIMPORT = re.compile( r'\\subimport\{([^}]*)\}\{([^}]*)\}' )
+_GRAPHICS  = re.compile( r'\\includegraphics(?:\[[^\]]*\])?\{([^}]*)\}' )
+
+# (path, mtime, size) -> sha256, so the layer library is hashed once per process
+_digests = {}
+
+
+def file_digest( path ):
+    st = os.stat( path )
+    key = ( path, st.st_mtime_ns, st.st_size )
+    if key not in _digests:
+        with open( path, 'rb' ) as f:
+            _digests[key] = hashlib.sha256( f.read() ).hexdigest()
+    return _digests[key]
+
+
+def dependencies( tex, cwd='.' ):
+    # files outside the .tex that change the rendered picture
+    deps = []
+    for layers, _ in _SUBIMPORT.findall( tex ):
+        layers = os.path.join( cwd, layers )
+        if os.path.isdir( layers ):
+            deps += [ os.path.join( layers, f ) for f in sorted( os.listdir( layers ) ) if f.endswith( ( '.sty', '.tex' ) ) ]
+    deps += [ os.path.join( cwd, p ) for p in _GRAPHICS.findall( tex ) ]
+    return deps
+
+
+def tex_digest( tex, cwd='.', engine='pdflatex' ):
+    h = hashlib.sha256()
+    h.update( engine.encode() + b'\0' + tex.encode( 'utf-8' ) )
+    for path in dependencies( tex, cwd ):
+        h.update( b'\0' + os.path.basename( path ).encode() + b'\0' )
+        h.update( file_digest( path ).encode() if os.path.exists( path ) else b'missing' )
+    return h.hexdigest()
+
+
+class RenderCache:
+
+    def __init__( self, path=CACHE_DIR, max_bytes=512 * 2**20 ):
+        self.path = os.path.abspath( path )
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.bytes_saved = 0
+        os.makedirs( self.path, exist_ok=True )
+
+    def _file( self, key ):
+        return os.path.join( self.path, key + '.pdf' )
+
+    def get( self, key ):
+        path = self._file( key )
+        try:
+            os.utime( path )  # mtime doubles as the LRU clock
+            size = os.path.getsize( path )
+        except FileNotFoundError:
+            # not cached, or evicted by another process meanwhile
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.bytes_saved += size
+        return path
+
+    def meta( self, key ):
+        # the text stored along with the PDF, None if there is none
+        try:
+            with open( os.path.join( self.path, key + '.meta' ) ) as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def put( self, key, pdfpath, meta=None, keep=() ):
+        # path of the cached copy; a PDF larger than the whole cache is not kept
+        # and its own path is returned. `meta` is a text kept (and evicted) with
+        # the PDF, `keep` keys that must not be evicted to make room for it
+        if os.path.getsize( pdfpath ) > self.max_bytes:
+            return pdfpath
+        path = self._file( key )
+        tmp = '{}.{}.{}.tmp'.format( path, os.getpid(), threading.get_ident() )
+        if meta is not None:
+            # written first, so a cached PDF always has its meta
+            with open( tmp, 'w' ) as f:
+                f.write( meta )
+            os.replace( tmp, os.path.join( self.path, key + '.meta' ) )
+        shutil.copyfile( pdfpath, tmp )
+        os.replace( tmp, path )
+        self.evict( keep={ key, *keep } )
+        return path
+
+    def entries( self ):
+        entries = []
+        for f in os.listdir( self.path ):
+            if f.endswith( '.pdf' ):
+                try:
+                    st = os.stat( os.path.join( self.path, f ) )
+                except FileNotFoundError:
+                    continue
+                entries.append( ( st.st_mtime_ns, st.st_size, f ) )
+        return sorted( entries )
+
+    def evict( self, keep=() ):
+        # oldest entries first until the cache fits, never the keys in `keep`
+        entries = self.entries()
+        total = sum( size for _, size, _ in entries )
+        for _, size, f in entries:
+            if total <= self.max_bytes:
+                break
+            if f[:-len( '.pdf' )] in keep:
+                continue
+            self._remove( f )
+            total -= size
+
+    def _remove( self, f ):
+        for path in ( f, f[:-len( '.pdf' )] + '.meta' ):
+            try:
+                os.remove( os.path.join( self.path, path ) )
+            except FileNotFoundError:
+                pass
+
+    def record( self, hit, nbytes=0 ):
+        # merge a lookup made by a worker process into these stats
+        if hit:
+            self.hits += 1
+            self.bytes_saved += nbytes
+        else:
+            self.misses += 1
+
+    def clear( self ):
+        for _, _, f in self.entries():
+            self._remove( f )
+
+    def stats( self ):
+        entries = self.entries()
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'bytes_saved': self.bytes_saved,
+            'entries': len( entries ),
+            'bytes': sum( size for _, size, _ in entries ),
+            'max_bytes': self.max_bytes,
+        }
@@ -0,0 +1,74 @@
+import os
+import time
+import shutil
+import subprocess
+import tempfile
+
+from .cache import CACHE_DIR, tex_digest
+
+# Precompiled preambles: everything before \begin{document} (to_head, the layer
+# library, colors, to_begin's commands) is dumped once into a format file with
+# mylatexformat and later compiles load it with -fmt instead of re-reading the
+# packages. The format is keyed like the PDF cache, so editing layers/*.sty or
+# init.tex builds a new one. If the format cannot be built (e.g. mylatexformat is
+# not installed) diagrams are compiled the usual way. Formats are opt-in: the
+# renderers take formats=DIR (--formats) and compile without one by default.
+
+FORMAT_DIR = os.path.join( CACHE_DIR, 'formats' )
+RETRY_FAILED = 24 * 3600  # seconds before a preamble whose format failed to build is tried again
+
+
+def split_preamble( tex ):
+    i = tex.find( '\\begin{document}' )
+    return ( tex[:i], tex[i:] ) if i >= 0 else ( None, tex )
+
+
+def build_format( preamble, cwd, path, engine='pdflatex', timeout=None ):
+    # dump `preamble` into `path`.fmt; subimports resolve against cwd as in the diagram
+    tmpdir = tempfile.mkdtemp( prefix='pnn_fmt_' )
+    try:
+        src = os.path.join( tmpdir, 'preamble.tex' )
+        with open( src, 'w' ) as f:
+            f.write( preamble + '\\begin{document}\n\\end{document}\n' )
+        cmd = [ engine, '-ini', '-interaction=nonstopmode', '-halt-on-error', '-jobname=pnn', '-output-directory', tmpdir,
+                '&' + os.path.basename( engine ), 'mylatexformat.ltx', src ]
+        proc = subprocess.run( cmd, cwd=cwd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, timeout=timeout )
+        fmt = os.path.join( tmpdir, 'pnn.fmt' )
+        if proc.returncode != 0 or not os.path.exists( fmt ):
+            log = proc.stdout.decode( 'utf-8', 'replace' )
+            raise RuntimeError( "{} -ini exited with {}\n{}".format( engine, proc.returncode, '\n'.join( log.splitlines()[-20:] ) ) )
+        tmp = '{}.fmt.{}.tmp'.format( path, os.getpid() )
+        shutil.copyfile( fmt, tmp )
+        os.replace( tmp, path + '.fmt' )
+    finally:
+        shutil.rmtree( tmpdir, ignore_errors=True )
+
+
+def preamble_format( tex, cwd, engine='pdflatex', fmtdir=None, timeout=None ):
+    # format for the preamble of `tex` (path without .fmt, as -fmt takes it), built on
+    # first use; None if the TeX has no preamble or the format cannot be built
+    preamble, _ = split_preamble( tex )
+    if not preamble:
+        return None
+    fmtdir = fmtdir or FORMAT_DIR
+    os.makedirs( fmtdir, exist_ok=True )
+    path = os.path.join( fmtdir, tex_digest( preamble, cwd, engine ) )
+    if os.path.exists( path + '.fmt' ):
+        return path
+    try:
+        if time.time() - os.path.getmtime( path + '.failed' ) < RETRY_FAILED:
+            return None
+    except FileNotFoundError:
+        pass
+    try:
+        build_format( preamble, cwd, path, engine, timeout )
+    except RuntimeError as e:
+        # the engine rejected the preamble: remembered so every job does not retry
+        # until RETRY_FAILED has passed (or the .failed file is deleted)
+        with open( path + '.failed', 'w' ) as f:
+            f.write( str( e ) )
+        return None
+    except ( OSError, subprocess.TimeoutExpired ):
+        # a timeout or a missing engine says nothing about the preamble, the next job tries again
+        return None
+    return path
@@ -0,0 +1,194 @@
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import subprocess
+
+from . import ir
+from .validate import check
+from .render import ENGINE, to_job, load_arch, compile_tex
+from .spec import load_spec
+from .fmt import FORMAT_DIR, preamble_format
+from .multi import split_pdf
+
+# Walk-through frames: python -m pycore.frames pyexamples/unet.py --by blocks -o unet_frames.pdf
+# Every frame is the whole picture with the layers and edges it highlights drawn
+# as usual and everything else faded (a transparency group per item), so frames
+# have the same size and overlay exactly. All frames are pages of one document
+# compiled once; they can be split into numbered PDFs (pypdf or qpdf) or PNGs
+# (pdftoppm). Hand-written TeX (titles, \def, \tikzset) is left as it is.
+#
+# A schedule is a list of frames, each a set of names: layer names, block names
+# (every node a block_* call made) or 'of->to' for an edge. An edge is also lit
+# when both of its ends are.
+
+DIM = .15
+
+
+def edge_id( e ):
+    return '{}->{}'.format( e.of, e.to )
+
+
+def _picture( arch ):
+    # (head, opening, items, closing, tail): the TeX before \begin{tikzpicture}, the
+    # \begin{tikzpicture} line with to_begin's styles, the items of the picture and the rest
+    items = list( ir.flatten( arch ) )
+    texts = [ c if isinstance( c, str ) else c.tex() for c in items ]
+    begin = next( ( i for i, t in enumerate( texts ) if '\\begin{tikzpicture}' in t ), None )
+    end = next( ( i for i, t in enumerate( texts ) if i > ( begin or 0 ) and '\\end{tikzpicture}' in t ), None )
+    if begin is None or end is None:
+        raise ValueError( "the arch has no \\begin{tikzpicture} (to_begin) and \\end{tikzpicture} (to_end) to repeat" )
+    cut = texts[begin].index( '\\begin{tikzpicture}' )
+    stop = texts[end].index( '\\end{tikzpicture}' ) + len( '\\end{tikzpicture}\n' )
+    head = ''.join( texts[:begin] ) + texts[begin][:cut]
+    tail = texts[end][stop:] + ''.join( texts[end + 1:] )
+    return head, texts[begin][cut:], items[begin + 1:end], texts[end][:stop], tail
+
+
+def _node( c ):
+    return c.node if isinstance( c, ir.Fragment ) else c
+
+
+def schedule( arch, by='layers', cumulative=False ):
+    # frames for: 'layers' one per layer, 'blocks' one per block (layers outside blocks on
+    # their own), 'skips' one per to_skip with its two ends; cumulative keeps earlier frames lit
+    if by not in ( 'layers', 'blocks', 'skips' ):
+        raise ValueError( "unknown schedule {!r} (layers, blocks or skips)".format( by ) )
+    frames = []
+    for c in ir.flatten( arch ):
+        if isinstance( c, ir.Block ):
+            if by != 'skips':
+                frames.append( { c.name } )
+            continue
+        node = _node( c )
+        if by == 'skips':
+            if isinstance( node, ir.Edge ) and node.kind == 'skip':
+                frames.append( { edge_id( node ), node.of, node.to } )
+        elif isinstance( node, ir.Layer ):
+            if by == 'blocks' and node.block is not None:
+                if not frames or node.block not in frames[-1]:
+                    frames.append( { node.block } )
+            else:
+                frames.append( { node.name } )
+    if cumulative:
+        frames = [ set().union( *frames[:i + 1] ) for i in range( len( frames ) ) ]
+    return frames
+
+
+def lit( c, on ):
+    # whether an item is highlighted in a frame; None for hand-written TeX
+    if isinstance( c, ir.Block ):
+        return c.name in on
+    node = _node( c )
+    if isinstance( node, ir.Layer ):
+        return node.name in on or node.block in on
+    if isinstance( node, ir.Edge ):
+        return edge_id( node ) in on or node.block in on or ( node.of in on and node.to in on )
+    return None
+
+
+def frames_tex( arch, frames, dim=DIM ):
+    # one document with a page per frame
+    head, opening, items, closing, tail = _picture( arch )
+    texts = [ c if isinstance( c, str ) else c.tex() for c in items ]
+    fade = '\\begin{{scope}}[transparency group, opacity={}]'.format( dim )
+    out = [ head ]
+    for n, on in enumerate( frames ):
+        out.append( '% frame {}: {}\n'.format( n + 1, ', '.join( sorted( on ) ) ) )
+        out.append( opening )
+        for c, tex in zip( items, texts ):
+            out.append( tex if lit( c, on ) is not False else '{}{}\\end{{scope}}\n'.format( fade, tex ) )
+        out.append( closing )
+    out.append( tail )
+    return ''.join( out )
+
+
+def render_frames( arch, pathname='frames.pdf', frames=None, by='layers', cumulative=False, dim=DIM, cwd=None,
+                   engine=ENGINE, timeout=None, validate=True, formats=None ):
+    # compile every frame in one run into the pages of `pathname`; returns the frames
+    arch = list( arch )
+    if validate:
+        check( arch )
+    frames = [ { f } if isinstance( f, str ) else set( f ) for f in frames ] if frames is not None else schedule( arch, by, cumulative )
+    if not frames:
+        raise ValueError( "the schedule has no frames" )
+    tex = frames_tex( arch, frames, dim )
+    cwd = os.path.abspath( cwd or os.getcwd() )
+    tmpdir = tempfile.mkdtemp( prefix='pnn_frames_' )
+    try:
+        texpath = os.path.join( tmpdir, 'frames.tex' )
+        with open( texpath, 'w', encoding='utf-8' ) as f:
+            f.write( tex )
+        fmt = preamble_format( tex, cwd, engine, formats, timeout ) if formats is not None else None
+        shutil.copyfile( compile_tex( texpath, cwd, tmpdir, engine, timeout, fmt ), pathname )
+    finally:
+        shutil.rmtree( tmpdir, ignore_errors=True )
+    return frames
+
+
+def split_frames( pdfpath, count, outdir, prefix='frame' ):
+    # numbered single-page PDFs: prefix-001.pdf, ...
+    os.makedirs( outdir, exist_ok=True )
+    outs = [ os.path.join( outdir, '{}-{:03d}.pdf'.format( prefix, i + 1 ) ) for i in range( count ) ]
+    return split_pdf( pdfpath, [ 1 ] * count, outs )
+
+
+def frame_images( pdfpath, outdir, prefix='frame', dpi=150 ):
+    # numbered PNGs of the pages ( prefix-001.png, ... ), drawn by pdftoppm (poppler) in a
+    # temp dir so files left in outdir by an earlier run are neither returned nor mixed in
+    if shutil.which( 'pdftoppm' ) is None:
+        raise RuntimeError( "frame images need pdftoppm (poppler-utils) on the PATH" )
+    os.makedirs( outdir, exist_ok=True )
+    tmpdir = tempfile.mkdtemp( prefix='pnn_png_' )
+    try:
+        subprocess.run( [ 'pdftoppm', '-png', '-r', str( dpi ), pdfpath, os.path.join( tmpdir, 'page' ) ], check=True )
+        # pdftoppm pads the page number to the width of the page count: page-1.png or page-01.png
+        pages = sorted( os.listdir( tmpdir ), key=lambda f: int( f[len( 'page-' ):-len( '.png' )] ) )
+        outs = []
+        for i, f in enumerate( pages ):
+            outs.append( os.path.join( outdir, '{}-{:03d}.png'.format( prefix, i + 1 ) ) )
+            shutil.move( os.path.join( tmpdir, f ), outs[-1] )
+    finally:
+        shutil.rmtree( tmpdir, ignore_errors=True )
+    return outs
+
+
+def main( argv=None ):
+    parser = argparse.ArgumentParser( prog='python -m pycore.frames', description='Draw walk-through frames of an arch, one highlighted step per page, in one compile.' )
+    parser.add_argument( 'source', help='arch script (*.py) or spec (*.json, *.jsonl, *.yaml)' )
+    parser.add_argument( '-o', '--output', default=None, help='multi-page PDF (default: <source>_frames.pdf)' )
+    parser.add_argument( '--by', choices=( 'layers', 'blocks', 'skips' ), default='layers', help='what each frame highlights' )
+    parser.add_argument( '--frame', action='append', metavar='NAMES', default=None,
+                         help='a frame as comma separated layer/block names or of->to edges, instead of --by (repeatable)' )
+    parser.add_argument( '--cumulative', action='store_true', help='keep what earlier frames highlighted' )
+    parser.add_argument( '--dim', type=float, default=DIM, help='opacity of what a frame does not highlight (default: {})'.format( DIM ) )
+    parser.add_argument( '--pdfs', metavar='DIR', default=None, help='also write every frame as DIR/frame-NNN.pdf' )
+    parser.add_argument( '--png', metavar='DIR', default=None, help='also write every frame as DIR/frame-NNN.png' )
+    parser.add_argument( '--dpi', type=int, default=150, help='resolution of --png (default: 150)' )
+    parser.add_argument( '--engine', default=ENGINE )
+    parser.add_argument( '--timeout', type=float, default=None, help='compile timeout in seconds' )
+    parser.add_argument( '--formats', metavar='DIR', nargs='?', const=FORMAT_DIR, default=None,
+                         help='compile against a precompiled preamble kept in DIR (default DIR: {})'.format( FORMAT_DIR ) )
+    parser.add_argument( '--no-validate', action='store_true', help='skip the layer name checks before compiling' )
+    args = parser.parse_args( argv )
+
+    job = to_job( args.source )
+    source = job.get( 'spec' ) or job['script']
+    output = args.output or os.path.splitext( source )[0] + '_frames.pdf'
+    start = time.perf_counter()
+    arch = load_spec( source ) if 'spec' in job else load_arch( source )
+    frames = [ [ n.strip() for n in f.split( ',' ) if n.strip() ] for f in args.frame ] if args.frame else None
+    frames = render_frames( arch, output, frames, args.by, args.cumulative, args.dim, job['cwd'], args.engine, args.timeout,
+                            not args.no_validate, args.formats )
+    print( '{} frames {:6.2f}s  {}'.format( len( frames ), time.perf_counter() - start, output ) )
+    if args.pdfs:
+        print( '\n'.join( split_frames( output, len( frames ), args.pdfs ) ) )
+    if args.png:
+        print( '\n'.join( frame_images( output, args.png, dpi=args.dpi ) ) )
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit( main() )
@@ -0,0 +1,184 @@
+from . import ir
+
+# Geometry emission: the Box, RightBandedBox and Ball pics compute every corner,
+# the running east offset of concatenated boxes and the anchors with pgfmath on
+# each compile. Here the same numbers are computed in Python and the layer is
+# written as plain \draw/\coordinate commands in a scope placed like the \pic.
+# The picture is the same; only the labels of concatenated boxes are printed as
+# given instead of going through pgfmath's array().
+
+SCALE = .2
+
+# defaults of the pics in layers/*.sty
+BOX_DEFAULTS = {
+    'fill': '{rgb:red,5;green,5;blue,5;white,15}', 'opacity': 0.4, 'width': 2, 'height': 13, 'depth': 15,
+    'xlabel': (), 'ylabel': '', 'zlabel': '', 'caption': '',
+}
+BANDED_DEFAULTS = dict( BOX_DEFAULTS, bandfill='{rgb:red,5;green,5;blue,5;white,5}', bandopacity=0.6 )
+BALL_DEFAULTS = { 'fill': 'green', 'opacity': 0.10, 'radius': 0.5, 'logo': '$\\Sigma$', 'caption': '' }
+
+_EDGES = 'every edge/.append style={densely dashed, opacity=.7}'
+
+
+def _num( v ):
+    return '{:g}'.format( round( v, 4 ) + 0. )
+
+def _xyz( x, y, z ):
+    return '({},{},{})'.format( _num( x ), _num( y ), _num( z ) )
+
+def values( v ):
+    # a tuple, list or "{a,b}" string as a list of str
+    if isinstance( v, ( tuple, list ) ):
+        return [ str( x ) for x in v ]
+    return [ x.strip() for x in str( v ).strip().strip( '{}' ).split( ',' ) ]
+
+def unquote( v ):
+    v = str( v ).strip()
+    return v[1:-1] if len( v ) > 1 and v[0] == v[-1] == '"' else v
+
+
+def params( layer, defaults ):
+    p = dict( defaults )
+    for section in ( layer.dims, layer.labels, layer.style ):
+        p.update( section )
+    return p
+
+
+def _scope( layer, styles ):
+    options = [ 'shift={{{}}}'.format( layer.to ), 'shift={{{}}}'.format( layer.offset ) ] + styles
+    return '\n\\begin{{scope}}[{}]\n'.format( ','.join( options ) )
+
+
+def anchor_points( east, y, z ):
+    # ( anchor, ( x, y, z ) ) of a box relative to its west point
+    return [
+        ( 'west', ( 0, 0, 0 ) ), ( 'east', ( east, 0, 0 ) ),
+        ( 'north', ( east / 2, y / 2, 0 ) ), ( 'south', ( east / 2, -y / 2, 0 ) ), ( 'anchor', ( east / 2, 0, 0 ) ),
+        ( 'near', ( east / 2, 0, z / 2 ) ), ( 'far', ( east / 2, 0, -z / 2 ) ),
+        ( 'nearwest', ( 0, 0, z / 2 ) ), ( 'neareast', ( east, 0, z / 2 ) ),
+        ( 'farwest', ( 0, 0, -z / 2 ) ), ( 'fareast', ( east, 0, -z / 2 ) ),
+        ( 'northeast', ( east, y / 2, 0 ) ), ( 'northwest', ( 0, y / 2, 0 ) ),
+        ( 'southeast', ( east, -y / 2, 0 ) ), ( 'southwest', ( 0, -y / 2, 0 ) ),
+        ( 'nearnortheast', ( east, y / 2, z / 2 ) ), ( 'farnortheast', ( east, y / 2, -z / 2 ) ),
+        ( 'nearsoutheast', ( east, -y / 2, z / 2 ) ), ( 'farsoutheast', ( east, -y / 2, -z / 2 ) ),
+        ( 'nearnorthwest', ( 0, y / 2, z / 2 ) ), ( 'farnorthwest', ( 0, y / 2, -z / 2 ) ),
+        ( 'nearsouthwest', ( 0, -y / 2, z / 2 ) ), ( 'farsouthwest', ( 0, -y / 2, -z / 2 ) ),
+    ]
+
+
+def _anchors( name, east, y, z ):
+    return ''.join( '\\coordinate ({}-{}) at {};\n'.format( name, a, _xyz( *p ) ) for a, p in anchor_points( east, y, z ) )
+
+
+def widths( layer, p ):
+    # scaled widths of the concatenated boxes of a layer with params p
+    out = [ float( w ) * SCALE for w in values( p['width'] ) if w != '' ]
+    if not out:
+        raise ValueError( "layer '{}' has no width: width={!r}".format( layer.name, p['width'] ) )
+    return out
+
+
+def corners( west, east, y, z ):
+    # a..h of Box.sty: the near face (a, b, c, d) from the upper west corner counterclockwise,
+    # then the far face (e, f, g, h) from the upper east corner
+    return ( ( west, y/2, z/2 ), ( west, -y/2, z/2 ), ( east, -y/2, z/2 ), ( east, y/2, z/2 ),
+             ( east, y/2, -z/2 ), ( east, -y/2, -z/2 ), ( west, -y/2, -z/2 ), ( west, y/2, -z/2 ) )
+
+
+def band_corners( east, x, y, z ):
+    # art, brt, hrt of RightBandedBox.sty: the band covers the east third of a box of width x
+    third = east - x / 3
+    return ( third, y/2, z/2 ), ( third, -y/2, z/2 ), ( third, y/2, -z/2 )
+
+
+def box( layer, banded=False ):
+    p = params( layer, BANDED_DEFAULTS if banded else BOX_DEFAULTS )
+    y = float( p['height'] ) * SCALE
+    z = float( p['depth'] ) * SCALE
+    labels = [ unquote( l ) for l in values( p['xlabel'] ) ] if p['xlabel'] else []
+
+    styles = [ 'box/.style={{{},fill opacity={},fill={}}}'.format( _EDGES, p['opacity'], p['fill'] ) ]
+    if banded:
+        styles.append( 'band/.style={{{},fill opacity={},fill={},draw={}}}'.format( _EDGES, p['bandopacity'], p['bandfill'], p['bandfill'] ) )
+    out = [ _scope( layer, styles ) ]
+    east = 0.
+    for i, x in enumerate( widths( layer, p ) ):
+        west, east = east, east + x
+        a, b, c, d, e, f, g, h = ( _xyz( *q ) for q in corners( west, east, y, z ) )
+        faces = '{d} -- {a} -- {b} -- {c} -- cycle {d} -- {a} -- {h} -- {e} -- cycle'.format( a=a, b=b, c=c, d=d, e=e, h=h )
+        dashed = '{f} edge {g} {b} edge {g} {h} edge {g}'.format( b=b, f=f, g=g, h=h )
+        if banded:
+            art, brt, hrt = ( _xyz( *q ) for q in band_corners( east, x, y, z ) )
+            out.append( '\\draw [box] {};\n\\draw [box] {};\n'.format( faces, dashed ) )
+            out.append( '\\draw [band] {d} -- {art} -- {brt} -- {c} -- cycle {d} -- {art} -- {hrt} -- {e} -- cycle;\n'.format(
+                d=d, art=art, brt=brt, c=c, hrt=hrt, e=e ) )
+            out.append( '\\draw [box,fill opacity=0] {};\n'.format( faces ) )
+        else:
+            out.append( '\\draw [box] {} {};\n'.format( faces, dashed ) )
+        out.append( '\\def\\xlabel{{{}}}\\path {} edge ["\\xlabel"\',midway] {};\n'.format( labels[i] if i < len( labels ) else '', b, c ) )
+    # east face of the last box
+    last = '{d} -- {e} -- {f} -- {c} -- cycle;\n'.format( d=d, e=e, f=f, c=c )
+    out.append( '\\draw [box] ' + last )
+    if banded:
+        out.append( '\\draw [band] ' + last + '\\draw ' + last )
+
+    out.append( '\\def\\zlabel{{{}}}\\path {} edge ["\\small\\zlabel"\',pos=0,text width={}pt,text centered,sloped] {};\n'.format(
+        p['zlabel'], c, _num( 14 * z ), f ) )
+    out.append( '\\def\\ylabel{{{}}}\\path {} edge ["\\ylabel",midway] {};\n'.format(
+        p['ylabel'], _xyz( 0, -y/2, z/2 ), _xyz( 0, y/2, z/2 ) ) )
+    out.append( '\\def\\caption{{{}}}\\path {} + (0,-25pt) coordinate (cap) edge ["\\textcolor{{black}}{{ \\bf \\caption}}"\',text width={}pt,text centered] (cap);\n'.format(
+        p['caption'], _xyz( east / 2, -y/2, z/2 ), _num( 15 * east / SCALE ) ) )
+    out.append( _anchors( layer.name, east, y, z ) )
+    out.append( '\\end{scope}\n' )
+    return ''.join( out )
+
+
+def ball( layer ):
+    p = params( layer, BALL_DEFAULTS )
+    r = float( p['radius'] ) * SCALE
+    name = layer.name
+    return ''.join( [
+        _scope( layer, [] ),
+        '\\shade[ball color={},opacity={}] (0,0,0) circle ({});\n'.format( p['fill'], p['opacity'], _num( r ) ),
+        '\\draw (0,0,0) circle [radius={}] node[scale={}] {{{}}};\n'.format( _num( r ), _num( 4 * r ), p['logo'] ),
+        '\\coordinate ({}-anchor) at (0,0,0);\n'.format( name ),
+        '\\coordinate ({}-east) at {};\n'.format( name, _xyz( r, 0, 0 ) ),
+        '\\coordinate ({}-west) at {};\n'.format( name, _xyz( -r, 0, 0 ) ),
+        '\\coordinate ({}-north) at {};\n'.format( name, _xyz( 0, r, 0 ) ),
+        '\\coordinate ({}-south) at {};\n'.format( name, _xyz( 0, -r, 0 ) ),
+        '\\def\\caption{{{}}}\\path ({}-south) + (0,-20pt) coordinate (caption-node) edge ["\\textcolor{{black}}{{\\bf \\caption}}"\'] (caption-node);\n'.format(
+            p['caption'], name ),
+        '\\end{scope}\n',
+    ] )
+
+
+_PICS = {
+    'Box': box,
+    'RightBandedBox': lambda layer: box( layer, banded=True ),
+    'Ball': ball,
+}
+
+
+def tex( node ):
+    # TeX of a node with the pic geometry precomputed; other nodes are unchanged
+    if isinstance( node, ir.Layer ):
+        t = ir.LAYER_TYPES.get( node.kind )
+        if t is not None and t.pic in _PICS:
+            return _PICS[t.pic]( node )
+    return node.tex()
+
+
+def expand( arch ):
+    # the arch as TeX strings with precomputed geometry; use it as the last step
+    # before to_generate since the result no longer carries IR nodes
+    out = []
+    for c in arch:
+        if isinstance( c, ir.Fragment ):
+            out.append( tex( c.node ) )
+        elif isinstance( c, ir.Node ):
+            out.append( tex( c ) )
+        elif isinstance( c, list ):
+            out += expand( c )
+        else:
+            out.append( c )
+    return out
@@ -0,0 +1,179 @@
+import os
+import re
+import sys
+import shutil
+import hashlib
+import argparse
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+from . import ir
+from .cache import CACHE_DIR, RenderCache, tex_digest
+from .fmt import preamble_format
+from .render import ENGINE, compile_tex, load_arch
+
+# Incremental rendering: every \pic, edge or hand-written fragment of the picture
+# is compiled into its own small PDF (the layers it is positioned against are
+# replayed invisibly so its coordinates come out right). A unit's key covers its
+# TeX and the geometry of the units it is placed against through to="(x-east)"
+# chains, so an edit only recompiles the edited layers and the ones whose
+# position it moves; the final PDF just composes the cached graphics. Units are
+# kept in a RenderCache (with their origin as its meta), so the least recently
+# used ones are evicted above `max_bytes`.
+
+UNIT_BYTES = 512 * 2**20
+
+_ORIGIN = re.compile( r'PNN-ORIGIN:(-?[\d.]+)pt,(-?[\d.]+)pt' )
+
+_GHOST_BEGIN = '\n\\begin{scope}[overlay,opacity=0,transparency group]\n'
+_GHOST_END   = '\n\\end{scope}\n'
+_ORIGIN_MARK = ( '\n\\path (current bounding box.south west);\\pgfgetlastxy{\\pnnx}{\\pnny}'
+                 '\\typeout{PNN-ORIGIN:\\pnnx,\\pnny}\n' )
+
+
+def split_arch( arch ):
+    # (prelude, body items, epilogue); the prelude ends with to_begin's \begin{tikzpicture}
+    items = list( arch )
+    texts = [ c if isinstance( c, str ) else c.tex() for c in items ]
+    begin = next( i for i, t in enumerate( texts ) if '\\begin{tikzpicture}' in t )
+    end = next( i for i in range( len( texts ) - 1, -1, -1 ) if '\\end{tikzpicture}' in texts[i] )
+    return ''.join( texts[:begin + 1] ), items[begin + 1:end], ''.join( texts[end:] )
+
+
+def _shape( node, tex ):
+    # what other units' coordinates depend on: for layers only the kind, placement and
+    # dimensions, so editing a caption does not invalidate the layers chained after it
+    if isinstance( node, ir.Layer ):
+        return repr( ( node.kind, node.offset, node.to, sorted( node.dims.items() ) ) )
+    return tex
+
+
+def units( arch, cwd='.', engine=ENGINE ):
+    # one unit per body item: name, tex, key and the indices of the units it is drawn against
+    prelude, body, epilogue = split_arch( arch )
+    salt = tex_digest( prelude + epilogue, cwd, engine )
+    declared = {}
+    result = []
+    for i, item in enumerate( body ):
+        node = next( ir.nodes( [ item ] ), item )
+        # each unit draws its own node, also for fragments of a compact block
+        tex = item.node.tex() if isinstance( item, ir.Fragment ) else item if isinstance( item, str ) else item.tex()
+        deps = sorted( { declared[n] for n, _ in ir.references( node ) if n in declared } )
+        upstream = ''.join( result[d]['shape'] for d in deps )
+        key = hashlib.sha256( ( salt + tex_digest( tex, cwd, engine ) + upstream ).encode() ).hexdigest()
+        shape = hashlib.sha256( ( _shape( node, tex ) + upstream ).encode() ).hexdigest()
+        name = getattr( node, 'name', None ) or '{}:{}'.format( getattr( node, 'kind', 'tex' ), i )
+        if isinstance( node, ir.Edge ):
+            name = '{}:{}->{}'.format( node.kind, node.of, node.to )
+        result.append( { 'name': name, 'tex': tex, 'key': key, 'shape': shape, 'deps': deps } )
+        for n in ir.declares( node ):
+            declared[n] = i
+    return prelude, result, epilogue
+
+
+def _ancestors( units, i ):
+    seen = set()
+    stack = list( units[i]['deps'] )
+    while stack:
+        d = stack.pop()
+        if d not in seen:
+            seen.add( d )
+            stack.extend( units[d]['deps'] )
+    return sorted( seen )
+
+
+def unit_document( prelude, units, i, epilogue ):
+    ghosts = ''.join( units[d]['tex'] for d in _ancestors( units, i ) )
+    prelude = re.sub( r'border=[^,\]]*', 'border=0pt', prelude, count=1 )
+    return prelude + ( _GHOST_BEGIN + ghosts + _GHOST_END if ghosts else '' ) + units[i]['tex'] + _ORIGIN_MARK + epilogue
+
+
+def compose_document( placed, border='8pt' ):
+    lines = [ '\\documentclass[border={}, tikz]{{standalone}}'.format( border ),
+              '\\begin{document}', '\\begin{tikzpicture}' ]
+    for pdf, x, y in placed:
+        lines.append( '\\node[inner sep=0pt,outer sep=0pt,anchor=south west] at ({}pt,{}pt) {{\\includegraphics{{{}}}}};'.format(
+            x, y, pdf.replace( '\\', '/' ) ) )
+    lines += [ '\\end{tikzpicture}', '\\end{document}', '' ]
+    return '\n'.join( lines )
+
+
+def _compile_unit( doc, key, cwd, cache, keep, engine, timeout, fmt=None ):
+    tmpdir = tempfile.mkdtemp( prefix='pnn_unit_' )
+    try:
+        texpath = os.path.join( tmpdir, 'unit.tex' )
+        with open( texpath, 'w' ) as f:
+            f.write( doc )
+        pdfpath = compile_tex( texpath, cwd, tmpdir, engine=engine, timeout=timeout, fmt=fmt )
+        with open( os.path.join( tmpdir, 'unit.log' ), encoding='utf-8', errors='replace' ) as f:
+            origin = _ORIGIN.search( f.read() )
+        if origin is None:
+            raise RuntimeError( "no PNN-ORIGIN marker in the log of unit {}".format( key ) )
+        origin = '{},{}'.format( *origin.groups() )
+        path = cache.put( key, pdfpath, origin, keep )
+        if path == pdfpath:
+            # not cached, and gone with the temp dir before it could be composed
+            raise RuntimeError( "unit {} is larger than the unit cache ({} bytes)".format( key, cache.max_bytes ) )
+        return path, origin
+    finally:
+        shutil.rmtree( tmpdir, ignore_errors=True )
+
+
+def render_incremental( arch, pathname="file.pdf", cwd=None, cachedir=None, engine=ENGINE, workers=None, timeout=None, formats=None, max_bytes=UNIT_BYTES ):
+    cwd = os.path.abspath( cwd or os.getcwd() )
+    cache = RenderCache( os.path.join( cachedir or CACHE_DIR, 'units' ), max_bytes )
+    prelude, us, epilogue = units( arch, cwd, engine )
+    # the units of this diagram are never evicted to make room for each other
+    keep = { u['key'] for u in us }
+
+    paths = [ cache.get( u['key'] ) for u in us ]
+    origins = [ cache.meta( u['key'] ) if p else None for u, p in zip( us, paths ) ]
+    stale = [ i for i, o in enumerate( origins ) if o is None ]
+    # all units share one preamble, so they share one precompiled format
+    fmt = None
+    if stale and formats is not None:
+        fmt = preamble_format( unit_document( prelude, us, stale[0], epilogue ), cwd, engine, formats, timeout )
+    with ThreadPoolExecutor( max_workers=workers or os.cpu_count() or 1 ) as pool:
+        futures = [ pool.submit( _compile_unit, unit_document( prelude, us, i, epilogue ), us[i]['key'], cwd, cache, keep, engine, timeout, fmt )
+                    for i in stale ]
+        for i, f in zip( stale, futures ):
+            paths[i], origins[i] = f.result()
+
+    placed = []
+    for path, origin in zip( paths, origins ):
+        x, y = origin.split( ',' )
+        placed.append( ( path, x, y ) )
+    border = re.search( r'border=([^,\]]*)', prelude )
+    tmpdir = tempfile.mkdtemp( prefix='pnn_compose_' )
+    try:
+        texpath = os.path.join( tmpdir, 'compose.tex' )
+        with open( texpath, 'w' ) as f:
+            f.write( compose_document( placed, border.group( 1 ) if border else '8pt' ) )
+        shutil.copyfile( compile_tex( texpath, tmpdir, tmpdir, engine=engine, timeout=timeout ), pathname )
+    finally:
+        shutil.rmtree( tmpdir, ignore_errors=True )
+    return { 'units': len( us ), 'rebuilt': [ us[i]['name'] for i in stale ] }
+
+
+def main( argv=None ):
+    parser = argparse.ArgumentParser( prog='python -m pycore.incremental', description='Render an arch script, recompiling only the layers that changed.' )
+    parser.add_argument( 'script' )
+    parser.add_argument( '-o', '--output', default=None, help='PDF path (default: next to the script)' )
+    parser.add_argument( '--cache', metavar='DIR', default=None )
+    parser.add_argument( '--cache-size', type=float, default=UNIT_BYTES / 2**20, help='MB of unit graphics to keep (default: 512)' )
+    parser.add_argument( '--engine', default=ENGINE )
+    parser.add_argument( '-j', '--jobs', type=int, default=None )
+    args = parser.parse_args( argv )
+
+    script = os.path.abspath( args.script )
+    output = args.output or os.path.splitext( script )[0] + '.pdf'
+    report = render_incremental( load_arch( script ), output, os.path.dirname( script ), args.cache, args.engine, args.jobs,
+                                 max_bytes=int( args.cache_size * 2**20 ) )
+    print( '{}: {} of {} units recompiled'.format( output, len( report['rebuilt'] ), report['units'] ) )
+    for name in report['rebuilt']:
+        print( '  ' + name )
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit( main() )
@@ -0,0 +1,263 @@
+import os
+import re
+import sys
+
+# Intermediate representation of an arch. Layers, edges and blocks are small
+# __slots__ objects that can be inspected, changed and compared; TeX is only
+# built when they are serialized (tex(), str() or to_generate).
+
+_PYCORE = os.path.dirname( os.path.abspath( __file__ ) )
+
+
+# co_filename -> whether it belongs to pycore
+_internal = {}
+
+
+def call_site():
+    # first frame outside pycore, i.e. the user's to_*/block_* call
+    f = sys._getframe( 1 )
+    while f is not None:
+        filename = f.f_code.co_filename
+        if filename not in _internal:
+            _internal[filename] = os.path.dirname( os.path.abspath( filename ) ) == _PYCORE
+        if not _internal[filename]:
+            break
+        f = f.f_back
+    return '{}:{}'.format( f.f_code.co_filename, f.f_lineno ) if f is not None else None
+
+
+class Node:
+    __slots__ = ()
+
+    def fields( self ):
+        return tuple( getattr( self, s ) for s in self.__slots__ if s not in ( 'block', 'site' ) )
+
+    def key( self ):
+        # hashable identity of the emitted picture (ignores where it was declared)
+        return ( type( self ).__name__, ) + tuple( _freeze( v ) for v in self.fields() )
+
+    def replace( self, **changes ):
+        new = object.__new__( type( self ) )
+        for s in self.__slots__:
+            value = changes[s] if s in changes else getattr( self, s )
+            setattr( new, s, dict( value ) if isinstance( value, dict ) else value )
+        return new
+
+    def __eq__( self, other ):
+        return type( self ) is type( other ) and self.fields() == other.fields()
+
+    def __hash__( self ):
+        return hash( self.key() )
+
+    def __str__( self ):
+        return self.tex()
+
+    def __repr__( self ):
+        return '{}({})'.format( type( self ).__name__, ', '.join( '{}={!r}'.format( s, getattr( self, s ) ) for s in self.__slots__ if s != 'site' ) )
+
+
+def _freeze( v ):
+    if isinstance( v, dict ):
+        return tuple( sorted( ( k, _freeze( x ) ) for k, x in v.items() ) )
+    if isinstance( v, list ):
+        return tuple( _freeze( x ) for x in v )
+    return v
+
+
+class Layer( Node ):
+    __slots__ = ( 'kind', 'name', 'offset', 'to', 'dims', 'labels', 'style', 'block', 'site' )
+
+    def __init__( self, kind, name, offset="(0,0,0)", to="(0,0,0)", dims=None, labels=None, style=None, block=None, site=None ):
+        self.kind = kind
+        self.name = name
+        self.offset = offset
+        self.to = to
+        self.dims = dims or {}
+        self.labels = labels or {}
+        self.style = style or {}
+        self.block = block
+        self.site = site or call_site()
+
+    def tex( self ):
+        if self.kind in LAYER_TYPES:
+            return LAYER_TYPES[self.kind].emit( self )
+        return _EMIT[self.kind]( self )
+
+
+class Edge( Node ):
+    __slots__ = ( 'kind', 'of', 'to', 'pos', 'block', 'site' )
+
+    def __init__( self, kind, of, to, pos=None, block=None, site=None ):
+        self.kind = kind
+        self.of = of
+        self.to = to
+        self.pos = pos
+        self.block = block
+        self.site = site or call_site()
+
+    def tex( self ):
+        return _EMIT[self.kind]( self )
+
+
+class Block( list ):
+    # a block_* result: still a plain list of fragments, tagged with its kind and name
+    __slots__ = ( 'kind', 'name', 'site' )
+
+    def __init__( self, kind, name, items=(), site=None ):
+        super().__init__( items )
+        self.kind = kind
+        self.name = name
+        self.site = site or call_site()
+        for n in nodes( self ):
+            n.block = name
+
+    def tex( self ):
+        return ''.join( c if isinstance( c, str ) else c.tex() for c in self )
+
+    def __reduce__( self ):
+        return ( Block, ( self.kind, self.name, list( self ), self.site ) )
+
+
+class Fragment( str ):
+    # a to_* result: the TeX string existing code expects, with its IR node attached;
+    # `text` replaces the node's own TeX (compact blocks emit one macro call for all their nodes)
+    def __new__( cls, node, text=None ):
+        self = str.__new__( cls, node.tex() if text is None else text )
+        self.node = node
+        return self
+
+    def __reduce__( self ):
+        return ( Fragment, ( self.node, str( self ) ) )
+
+
+def fragment( constructor ):
+    # turn an IR constructor into a to_* style function returning TeX
+    def to_fn( *args, **kwargs ):
+        return Fragment( constructor( *args, **kwargs ) )
+    to_fn.__name__ = 'to_' + constructor.__name__
+    to_fn.__doc__ = constructor.__doc__
+    to_fn.__wrapped__ = constructor
+    return to_fn
+
+
+def nodes( arch ):
+    # IR nodes of an arch; fragments without IR (hand-written TeX) are yielded as str
+    for c in arch:
+        if isinstance( c, Fragment ):
+            yield c.node
+        elif isinstance( c, Node ):
+            yield c
+        elif isinstance( c, list ):
+            yield from nodes( c )
+        else:
+            yield c
+
+
+_PIC_NAME  = re.compile( r'\\pic\b.*?\bname\s*=\s*([^,\s}]+)', re.S )
+_NODE_NAME = re.compile( r'\\(?:node|coordinate)\b\s*(?:\[[^\]]*\])?\s*\(([^()]+)\)' )
+_REF       = re.compile( r'\(\s*([^(),\s]+)-([A-Za-z]+)\s*\)' )
+
+
+def declares( node ):
+    # names a node or hand-written fragment adds to the picture
+    if isinstance( node, Layer ):
+        return [ node.name ]
+    if isinstance( node, Edge ):
+        return []
+    return _PIC_NAME.findall( node ) + _NODE_NAME.findall( node )
+
+
+def references( node ):
+    # (name, anchor) pairs a node or hand-written fragment positions itself against
+    if isinstance( node, Layer ):
+        return _REF.findall( node.to )
+    if isinstance( node, Edge ):
+        if node.kind == 'skip':
+            return [ ( node.of, 'southeast' ), ( node.of, 'northeast' ), ( node.to, 'south' ), ( node.to, 'north' ) ]
+        if node.pos is not None:
+            return [ ( node.of, 'east' ), ( node.of, 'southeast' ), ( node.of, 'northeast' ),
+                     ( node.to, 'west' ), ( node.to, 'southwest' ), ( node.to, 'northwest' ) ]
+        return [ ( node.of, 'east' ), ( node.to, 'west' ) ]
+    return _REF.findall( node )
+
+
+def compact( block ):
+    # whether a block is emitted as one macro call for all its nodes (blocks.py, compact=True)
+    return any( isinstance( x, Fragment ) and str( x ) != x.node.tex() for x in block )
+
+
+def flatten( arch ):
+    # top-level items of an arch with nested lists and blocks spliced in; a compact
+    # block stays a single item
+    for c in arch:
+        if isinstance( c, Block ) and compact( c ):
+            yield c
+        elif isinstance( c, list ):
+            yield from flatten( c )
+        else:
+            yield c
+
+
+def to_tex( arch ):
+    return ''.join( c if isinstance( c, str ) else c.tex() for c in arch )
+
+
+# constructors
+
+def Input( pathfile, to='(-3,0,0)', width=8, height=8, name="temp" ):
+    return Layer( 'Input', name, to=to, dims={ 'width': width, 'height': height }, style={ 'image': pathfile } )
+
+def Connection( of, to ):
+    return Edge( 'connection', of, to )
+
+def Skip( of, to, pos=1.25 ):
+    return Edge( 'skip', of, to, pos )
+
+
+# serialization
+
+def _tex_Input( l ):
+    return r"""
+\node[canvas is zy plane at x=0] (""" + l.name + """) at """+ l.to +""" {\includegraphics[width="""+ str(l.dims['width'])+"cm"+""",height="""+ str(l.dims['height'])+"cm"+"""]{"""+ l.style['image'] +"""}};
+"""
+
+def _ends( pos ):
+    # a skip or routed connection rises to `pos` of each end's height; pycore.route gives the two ends their own
+    return pos if isinstance( pos, ( tuple, list ) ) else ( pos, pos )
+
+def _tex_connection( e ):
+    if e.pos is None:
+        return r"""
+\draw [connection]  ("""+e.of+"""-east)    -- node {\midarrow} ("""+e.to+"""-west);
+"""
+    # routed over a lane by pycore.route; the lane ends are named after both layers, so
+    # every connection has its own
+    a, b = _ends( e.pos )
+    lane = e.of + '-' + e.to
+    return r"""
+\path ("""+ e.of +"""-southeast) -- ("""+ e.of +"""-northeast) coordinate[pos="""+ str(a) +"""] ("""+ lane +"""-lanestart) ;
+\path ("""+ e.to +"""-southwest) -- ("""+ e.to +"""-northwest) coordinate[pos="""+ str(b) +"""] ("""+ lane +"""-laneend) ;
+\draw [connection]  ("""+e.of+"""-east) -- ("""+lane+"""-lanestart) -- node {\midarrow} ("""+lane+"""-laneend) -- ("""+e.to+"""-west);
+"""
+
+def _tex_skip( e ):
+    a, b = _ends( e.pos )
+    return r"""
+\path ("""+ e.of +"""-southeast) -- ("""+ e.of +"""-northeast) coordinate[pos="""+ str(a) +"""] ("""+ e.of +"""-top) ;
+\path ("""+ e.to +"""-south)  -- ("""+ e.to +"""-north)  coordinate[pos="""+ str(b) +"""] ("""+ e.to +"""-top) ;
+\draw [copyconnection]  ("""+e.of+"""-northeast)  
+-- node {\copymidarrow}("""+e.of+"""-top)
+-- node {\copymidarrow}("""+e.to+"""-top)
+-- node {\copymidarrow} ("""+e.to+"""-north);
+"""
+
+_EMIT = {
+    'Input': _tex_Input,
+    'connection': _tex_connection,
+    'skip': _tex_skip,
+}
+
+# pic based layer kinds (Conv, Pool, ...) are declared in registry.py
+LAYER_TYPES = {}
+
+from . import registry  # noqa: E402 registers the built-in layer types
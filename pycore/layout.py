@@ -0,0 +1,228 @@
+import re
+import sys
+import argparse
+from collections import deque
+
+from . import ir
+
+# Automatic layout: layers are ranked by the longest path from the inputs of the
+# layer graph (to_connection, to_skip and to="(x-east)" references), every rank
+# becomes a column and the layers of a column are spread over lanes near the
+# average lane of their predecessors. A layer put at the east of another with
+# offset (0,0,0), as the block_* functions do, stays glued to it: the whole run
+# is one item of its column. Ties are broken by declaration order, so
+# a small edit only moves the layers downstream of it. Linear in the number of
+# layers and edges, apart from sorting the layers within a column.
+
+SCALE = .2    # scale= of the Box, RightBandedBox and Ball pics
+DEPTH = .385  # drawn height (and width) per unit of depth along the default z vector
+
+_GLUE = re.compile( r'^\(\s*([^()\s]+)-east\s*\)$' )
+
+
+def _total( v ):
+    if isinstance( v, ( tuple, list ) ):
+        return sum( float( x ) for x in v )
+    return sum( float( x ) for x in str( v ).strip( '{}' ).split( ',' ) )
+
+
+def extent( layer ):
+    # (width, height) in cm of a layer as drawn
+    d = layer.dims
+    if layer.kind == 'Input':
+        return 0., float( d.get( 'height', 8 ) )
+    t = ir.LAYER_TYPES.get( layer.kind )
+    if t is not None and t.pic == 'Ball':
+        r = 2 * float( d.get( 'radius', .5 ) ) * SCALE
+        return r, r
+    return _total( d.get( 'width', 2 ) ) * SCALE, ( float( d.get( 'height', 13 ) ) + DEPTH * float( d.get( 'depth', 15 ) ) ) * SCALE
+
+
+def _still( offset ):
+    # whether an offset= is (0,0,0)
+    try:
+        return all( float( v ) == 0. for v in offset.strip().strip( '()' ).split( ',' ) )
+    except ValueError:
+        return False
+
+
+def graph( arch ):
+    # layers in declaration order, their predecessor and successor indices and the
+    # index of the layer each is glued to (to="(x-east)" with offset (0,0,0), as
+    # block_* place their layers) or None; glued layers form no edge
+    layers = [ n for n in ir.nodes( arch ) if isinstance( n, ir.Layer ) ]
+    index = { l.name: i for i, l in enumerate( layers ) }
+    preds = [ [] for _ in layers ]
+    succs = [ [] for _ in layers ]
+    glue = [ None ] * len( layers )
+    def link( a, b ):
+        a, b = index.get( a ), index.get( b )
+        if a is not None and b is not None and a != b:
+            preds[b].append( a )
+            succs[a].append( b )
+    for n in ir.nodes( arch ):
+        if isinstance( n, ir.Edge ):
+            link( n.of, n.to )
+        elif isinstance( n, ir.Layer ):
+            m = _GLUE.match( n.to )
+            if m and _still( n.offset ) and index.get( m.group( 1 ), len( layers ) ) < index[n.name]:
+                glue[index[n.name]] = index[m.group( 1 )]
+                continue
+            for name, _ in ir.references( n ):
+                link( name, n.name )
+    return layers, preds, succs, glue
+
+
+def ranks( preds, succs ):
+    # longest path from a source, Kahn's algorithm in declaration order
+    indegree = [ len( p ) for p in preds ]
+    rank = [ 0 ] * len( preds )
+    queue = deque( i for i, d in enumerate( indegree ) if d == 0 )
+    done = 0
+    while queue:
+        i = queue.popleft()
+        done += 1
+        for j in succs[i]:
+            rank[j] = max( rank[j], rank[i] + 1 )
+            indegree[j] -= 1
+            if indegree[j] == 0:
+                queue.append( j )
+    if done != len( preds ):
+        raise ValueError( "layer graph has a cycle" )
+    return rank
+
+
+def lanes( preds, rank, members ):
+    # lane per layer: columns are filled left to right, each layer asks for the
+    # mean lane of its predecessors and collisions are pushed apart, centred
+    columns = {}
+    for i in members:
+        columns.setdefault( rank[i], [] ).append( i )
+    lane = [ 0 ] * len( rank )
+    for r in sorted( columns ):
+        column = columns[r]
+        prefs = { i: sum( lane[j] for j in preds[i] ) / len( preds[i] ) if preds[i] else 0. for i in column }
+        order = sorted( column, key=lambda i: ( prefs[i], i ) )
+        assigned = []
+        for i in order:
+            want = int( round( prefs[i] ) )
+            assigned.append( want if not assigned else max( want, assigned[-1] + 1 ) )
+        shift = int( round( ( sum( prefs.values() ) - sum( assigned ) ) / len( column ) ) )
+        for i, l in zip( order, assigned ):
+            lane[i] = l + shift
+    return lane
+
+
+def _east( layer, size ):
+    # x of the east anchor from the pic origin: boxes are drawn east of it, balls and images around it
+    t = ir.LAYER_TYPES.get( layer.kind )
+    return size[0] if t is not None and t.pic != 'Ball' else size[0] / 2
+
+
+def overhang( layer ):
+    # how far the depth of a box reaches out on either side in x
+    t = ir.LAYER_TYPES.get( layer.kind )
+    if t is None or t.pic == 'Ball':
+        return 0.
+    return DEPTH * float( layer.dims.get( 'depth', 15 ) ) * SCALE / 2
+
+
+def positions( arch, gap=2., lane_gap=1. ):
+    # name -> (x, y) of the pic origin for every layer with at least one edge; a layer
+    # glued to another keeps touching it, its whole run is placed as one item
+    layers, preds, succs, glue = graph( arch )
+    sizes = [ extent( l ) for l in layers ]
+    # run head of every layer and its origin relative to the head's origin
+    head, shift = list( range( len( layers ) ) ), [ 0. ] * len( layers )
+    for i, p in enumerate( glue ):
+        if p is not None:
+            head[i] = head[p]
+            shift[i] = shift[p] + _east( layers[p], sizes[p] )
+    run_preds = [ [] for _ in layers ]
+    run_succs = [ [] for _ in layers ]
+    for j in range( len( layers ) ):
+        for i in preds[j]:
+            a, b = head[i], head[j]
+            if a != b:
+                run_preds[b].append( a )
+                run_succs[a].append( b )
+    members = {}
+    for i in range( len( layers ) ):
+        members.setdefault( head[i], [] ).append( i )
+    linked = [ h for h, m in members.items() if run_preds[h] or run_succs[h] or len( m ) > 1 ]
+    if not linked:
+        return {}
+    rank = ranks( run_preds, run_succs )
+    lane = lanes( run_preds, rank, linked )
+
+    # drawn x range of every run relative to its head's origin, depth included
+    span = {}
+    for h in linked:
+        left = min( shift[i] + _east( layers[i], sizes[i] ) - sizes[i][0] - overhang( layers[i] ) for i in members[h] )
+        right = max( shift[i] + _east( layers[i], sizes[i] ) + overhang( layers[i] ) for i in members[h] )
+        span[h] = ( left, right )
+    widths = {}
+    for h in linked:
+        widths[rank[h]] = max( widths.get( rank[h], 0. ), span[h][1] - span[h][0] )
+    x, column_x = 0., {}
+    for r in sorted( widths ):
+        column_x[r] = x
+        x += widths[r] + gap
+    pitch = max( sizes[i][1] for h in linked for i in members[h] ) + lane_gap
+
+    result = {}
+    for h in linked:
+        origin = column_x[rank[h]] - span[h][0]
+        for i in members[h]:
+            result[layers[i].name] = ( origin + shift[i], -lane[h] * pitch )
+    return result
+
+
+def _coord( v ):
+    return '{:g}'.format( round( v, 3 ) + 0. )
+
+
+def _placed( c, pos, moved ):
+    # `moved`: names of the blocks with a layer in pos
+    if isinstance( c, ir.Fragment ):
+        if c.node.block in moved and str( c ) != c.node.tex():
+            # part of a compact block, whose one macro call draws it from its own offsets:
+            # once a layer of the block moves, every node of it is drawn on its own
+            return ir.Fragment( _placed( c.node, pos, moved ) )
+        return ir.Fragment( _placed( c.node, pos, moved ) ) if isinstance( c.node, ir.Layer ) and c.node.name in pos else c
+    if isinstance( c, ir.Layer ):
+        if c.name not in pos:
+            return c
+        x, y = pos[c.name]
+        return c.replace( offset="(0,0,0)", to="({},{},0)".format( _coord( x ), _coord( y ) ) )
+    if isinstance( c, ir.Block ):
+        return ir.Block( c.kind, c.name, [ _placed( x, pos, moved ) for x in c ], c.site )
+    if isinstance( c, list ):
+        return [ _placed( x, pos, moved ) for x in c ]
+    return c
+
+
+def layout( arch, gap=2., lane_gap=1. ):
+    # the arch with every connected layer at an absolute to="(x,y,0)"; layers
+    # without edges (e.g. a to_input image) keep their hand-written position
+    arch = list( arch )
+    pos = positions( arch, gap, lane_gap )
+    moved = { n.block for n in ir.nodes( arch ) if isinstance( n, ir.Layer ) and n.block is not None and n.name in pos }
+    return [ _placed( c, pos, moved ) for c in arch ]
+
+
+def main( argv=None ):
+    from .render import load_arch
+    from .tikzeng import to_generate
+    parser = argparse.ArgumentParser( prog='python -m pycore.layout', description='Lay out an arch script automatically and write its TeX.' )
+    parser.add_argument( 'script' )
+    parser.add_argument( '-o', '--output', required=True, help='.tex file to write' )
+    parser.add_argument( '--gap', type=float, default=2., help='space between columns in cm (default: 2)' )
+    parser.add_argument( '--lane-gap', type=float, default=1., help='space between branch lanes in cm (default: 1)' )
+    args = parser.parse_args( argv )
+    to_generate( layout( load_arch( args.script ), args.gap, args.lane_gap ), args.output, echo=False )
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit( main() )
@@ -0,0 +1,169 @@
+import re
+
+from . import ir
+from .layout import extent
+
+# Level of detail: above a layer count (or canvas width) runs of equal units are
+# drawn as one box captioned "×N". A unit is a top-level layer or a block (its
+# layers share node.block); runs of equal blocks collapse first, then runs of
+# same-kind layers inside the remaining blocks (e.g. the convs of block_Res).
+# The summary box takes the name of the last layer of the run, so everything
+# drawn after it still finds its anchors; references to the other layers of the
+# run are redirected to it. `detail` picks the level per block (or layer) name:
+# 'full' never collapses, 'summary' always collapses the block into one box.
+
+_OFFSET_X = re.compile( r'\(\s*(-?[\d.]+)' )
+
+
+def canvas_width( layers ):
+    # rough width in cm of a chain of layers: boxes plus their x offsets
+    width = 0.
+    for l in layers:
+        m = _OFFSET_X.match( l.offset )
+        width += extent( l )[0] + ( float( m.group( 1 ) ) if m else 0. )
+    return width
+
+
+def _segments( items ):
+    # consecutive items grouped into units: a block, a top-level layer (with the
+    # edges after it) or hand-written TeX
+    segments = []
+    for c in items:
+        node = next( ir.nodes( [ c ] ), c ) if not isinstance( c, list ) else None
+        if node is None:
+            segments += _segments( list( c ) )
+            continue
+        current = segments[-1] if segments else None
+        if isinstance( node, ir.Layer ):
+            if node.block is not None and current is not None and current['block'] == node.block:
+                current['items'].append( c )
+                current['layers'].append( node )
+            else:
+                segments.append( { 'block': node.block, 'name': node.block or node.name, 'items': [ c ], 'layers': [ node ] } )
+        elif isinstance( node, ir.Edge ) and current is not None and current['layers']:
+            current['items'].append( c )
+        else:
+            segments.append( { 'block': None, 'name': None, 'items': [ c ], 'layers': [] } )
+    for s in segments:
+        kinds = tuple( l.kind for l in s['layers'] )
+        s['sig'] = ( s['block'] is not None, kinds ) if kinds else None
+    return segments
+
+
+def _split( segment ):
+    # a block as one unit per layer, for runs inside the block
+    units = []
+    for c in segment['items']:
+        node = next( ir.nodes( [ c ] ) )
+        if isinstance( node, ir.Layer ) or not units:
+            units.append( { 'block': None, 'name': segment['name'], 'items': [ c ], 'layers': [], 'sig': None } )
+        else:
+            units[-1]['items'].append( c )
+        if isinstance( node, ir.Layer ):
+            units[-1]['layers'].append( node )
+            units[-1]['sig'] = ( False, ( node.kind, ) )
+    return units
+
+
+def _summary( segments, alias, count ):
+    layers = [ l for s in segments for l in s['layers'] ]
+    first, last = layers[0], layers[-1]
+    node = first.replace( name=last.name, block=None )
+    t = ir.LAYER_TYPES.get( node.kind )
+    if t is not None and 'caption' in t.keys:
+        node.labels['caption'] = '$\\times {}$'.format( count )
+    for l in layers[:-1]:
+        alias[l.name] = last.name
+    edges = [ c for s in segments for c in s['items'] if isinstance( next( ir.nodes( [ c ] ), c ), ir.Edge ) ]
+    return { 'block': None, 'name': last.name, 'items': [ ir.Fragment( node ) ] + edges, 'layers': [ node ], 'sig': ( False, ( node.kind, ) ), 'changed': True }
+
+
+def _collapse_runs( segments, min_run, detail, alias ):
+    out = []
+    i = 0
+    while i < len( segments ):
+        s = segments[i]
+        level = detail.get( s['name'] )
+        if s['sig'] is None or level == 'full':
+            out.append( s )
+            i += 1
+            continue
+        j = i + 1
+        if min_run is not None:
+            while j < len( segments ) and segments[j]['sig'] == s['sig'] and detail.get( segments[j]['name'] ) != 'full':
+                j += 1
+        if min_run is not None and j - i >= max( min_run, 2 ):
+            out.append( _summary( segments[i:j], alias, j - i ) )
+        elif level == 'summary' and s['block'] is not None:
+            out.append( _summary( [ s ], alias, len( s['layers'] ) ) )
+            j = i + 1
+        else:
+            out.append( s )
+            j = i + 1
+        i = j
+    return out
+
+
+def _ref( alias ):
+    def sub( m ):
+        return '({}-{})'.format( alias.get( m.group( 1 ), m.group( 1 ) ), m.group( 2 ) )
+    return sub
+
+
+def _remap( segment, alias, seen ):
+    # items with references to collapsed layers pointed at their summary box
+    sub = _ref( alias )
+    items = []
+    changed = segment.get( 'changed', False )
+    for c in segment['items']:
+        node = next( ir.nodes( [ c ] ), c )
+        if isinstance( node, ir.Edge ):
+            of, to = alias.get( node.of, node.of ), alias.get( node.to, node.to )
+            if of == to or ( node.kind, of, to ) in seen:
+                changed = True
+                continue
+            seen.add( ( node.kind, of, to ) )
+            if ( of, to ) != ( node.of, node.to ):
+                node, changed = node.replace( of=of, to=to ), True
+        elif isinstance( node, ir.Layer ):
+            to = ir._REF.sub( sub, node.to )
+            if to != node.to:
+                node, changed = node.replace( to=to ), True
+        else:
+            node = ir._REF.sub( sub, node )
+        items.append( ( c, node ) )
+    if not changed:
+        return [ c for c, _ in items ]
+    # fragments are rebuilt from their nodes, which also expands compact blocks
+    return [ ir.Fragment( node ) if isinstance( node, ir.Node ) else node for _, node in items ]
+
+
+def collapse( arch, max_layers=100, max_width=None, min_run=3, detail=None ):
+    arch = list( arch )
+    detail = detail or {}
+    layers = [ n for n in ir.nodes( arch ) if isinstance( n, ir.Layer ) ]
+    auto = len( layers ) > max_layers or ( max_width is not None and canvas_width( layers ) > max_width )
+    if not auto and 'summary' not in detail.values():
+        return arch
+    run = min_run if auto else None
+    alias = {}
+    segments = _collapse_runs( _segments( arch ), run, detail, alias )
+    if auto:
+        inner = []
+        for s in segments:
+            if s['block'] is not None and detail.get( s['name'] ) != 'full':
+                units = _split( s )
+                collapsed = _collapse_runs( units, run, {}, alias )
+                if len( collapsed ) < len( units ):
+                    s = { 'block': None, 'name': s['name'], 'items': [ c for u in collapsed for c in u['items'] ], 'layers': [], 'changed': True }
+            inner.append( s )
+        segments = inner
+    # chains of aliases (a run whose last layer was collapsed again) resolve to the final box
+    for name in alias:
+        while alias[name] in alias and alias[alias[name]] != alias[name]:
+            alias[name] = alias[alias[name]]
+    out = []
+    seen = set()
+    for s in segments:
+        out += _remap( s, alias, seen )
+    return out
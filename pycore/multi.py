@@ -0,0 +1,244 @@
+import os
+import re
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import subprocess
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import pypdf
+except ImportError:  # optional, qpdf on the PATH splits as well
+    pypdf = None
+
+from .cache import RenderCache, tex_digest
+from .fmt import FORMAT_DIR, split_preamble, preamble_format
+from .render import ENGINE, to_job, generate_job, compile_tex, expand_sources
+
+# Packed rendering: python -m pycore.multi specs/ -o out/ --per-doc 100
+# to_head's standalone class has the `multi` option, so every tikzpicture of a
+# document is a page of its own. Diagrams that share a preamble (and directory)
+# are packed into one document, compiled once and the PDF is cut back into one
+# file per diagram, so hundreds of small diagrams pay for one pdflatex start and
+# one preamble load instead of one each. Every diagram's pictures get the TikZ
+# `name prefix` d<i>-, so equal layer names in different diagrams (ccr_b1, ...)
+# are different nodes. If the packed document does not compile, its diagrams are
+# compiled one by one, so one broken diagram fails on its own. Splitting needs
+# pypdf (pip install pypdf) or qpdf.
+
+PREFIX = 'd{}-'
+
+_PICTURE = re.compile( r'\\begin\{tikzpicture\}(\[)?' )
+
+
+def body( tex ):
+    # what is between \begin{document} and \end{document}
+    _, doc = split_preamble( tex )
+    doc = doc[len( '\\begin{document}' ):] if doc.startswith( '\\begin{document}' ) else doc
+    end = doc.rfind( '\\end{document}' )
+    return doc[:end] if end >= 0 else doc
+
+
+def prefix_names( text, prefix ):
+    # every tikzpicture in `text` with name prefix=`prefix`, which applies to node names and references alike
+    def opts( m ):
+        return '\\begin{{tikzpicture}}[name prefix={}{}'.format( prefix, ',' if m.group( 1 ) else ']' )
+    return _PICTURE.sub( opts, text )
+
+
+def pages( tex ):
+    # pages a diagram adds to a multi document: one per tikzpicture
+    return len( _PICTURE.findall( body( tex ) ) )
+
+
+def pack( texs ):
+    # one document for TeX sources with the same preamble; returns it and the page count of each
+    preamble, _ = split_preamble( texs[0] )
+    out = [ preamble, '\\begin{document}\n' ]
+    for i, tex in enumerate( texs ):
+        out.append( '% diagram {}\n'.format( i ) )
+        out.append( prefix_names( body( tex ), PREFIX.format( i ) ) )
+    out.append( '\\end{document}\n' )
+    return ''.join( out ), [ pages( tex ) for tex in texs ]
+
+
+def _need_splitter():
+    if pypdf is None and shutil.which( 'qpdf' ) is None:
+        raise ImportError( "splitting packed PDFs needs pypdf (pip install pypdf) or qpdf" )
+
+
+def split_pdf( pdfpath, counts, outpaths ):
+    # pages [0, counts[0]) into outpaths[0], the next counts[1] into outpaths[1], ...
+    _need_splitter()
+    if pypdf is not None:
+        reader = pypdf.PdfReader( pdfpath )
+        total = len( reader.pages )
+    else:
+        proc = subprocess.run( [ 'qpdf', '--show-npages', pdfpath ], stdout=subprocess.PIPE, stderr=subprocess.STDOUT )
+        total = int( proc.stdout.split()[0] ) if proc.returncode == 0 else -1
+    if total != sum( counts ):
+        raise RuntimeError( "{} has {} pages, expected {}".format( pdfpath, total, sum( counts ) ) )
+    first = 0
+    for n, out in zip( counts, outpaths ):
+        tmp = '{}.{}.tmp'.format( out, os.getpid() )
+        if pypdf is not None:
+            writer = pypdf.PdfWriter()
+            for page in reader.pages[first:first + n]:
+                writer.add_page( page )
+            with open( tmp, 'wb' ) as f:
+                writer.write( f )
+        else:
+            subprocess.run( [ 'qpdf', '--empty', '--pages', pdfpath, '{}-{}'.format( first + 1, first + n ), '--', tmp ], check=True,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL )
+        os.replace( tmp, out )
+        first += n
+    return outpaths
+
+
+def render_pack( jobs, outdir='.', engine=ENGINE, timeout=None, cache=None, validate=True, formats=None, geometry=False, lod=None, styles=False, input_dpi=None, route=False ):
+    # render_job for a list of jobs, compiled as one document per preamble; returns their status dicts
+    jobs = [ to_job( j ) for j in jobs ]
+    outdir = os.path.abspath( outdir )
+    os.makedirs( outdir, exist_ok=True )
+    start = time.perf_counter()
+    tmpdir = tempfile.mkdtemp( prefix='pnn_pack_' )
+    results, groups = [], {}
+    try:
+        for job in jobs:
+            status = { 'name': job['name'], 'source': job.get( 'script' ) or job.get( 'tex' ) or job.get( 'spec' ) or '<arch>',
+                       'status': 'error', 'pdf': None, 'error': None, 'cache': None, 'pack': 1 }
+            results.append( status )
+            try:
+                texpath = generate_job( job, tmpdir, validate, geometry, lod, styles, input_dpi, route )
+                with open( texpath, encoding='utf-8' ) as f:
+                    tex = f.read()
+            except Exception as e:
+                status['error'] = '{}: {}'.format( type( e ).__name__, e )
+                continue
+            key = tex_digest( tex, job['cwd'], engine ) if cache is not None else None
+            if cache is not None:
+                status['cache'] = 'miss'
+                hit = cache.get( key )
+                if hit is not None:
+                    status['cache'] = 'hit'
+                    _done( status, shutil.copyfile( hit, os.path.join( outdir, job['name'] + '.pdf' ) ) )
+                    continue
+            preamble, _ = split_preamble( tex )
+            item = { 'status': status, 'tex': tex, 'texpath': texpath, 'key': key }
+            if preamble is None or pages( tex ) == 0:
+                _compile_alone( item, job['cwd'], outdir, engine, timeout, cache, formats )
+            else:
+                groups.setdefault( ( job['cwd'], preamble ), [] ).append( item )
+
+        for n, ( ( cwd, preamble ), items ) in enumerate( groups.items() ):
+            if len( items ) == 1:
+                _compile_alone( items[0], cwd, outdir, engine, timeout, cache, formats )
+                continue
+            tex, counts = pack( [ it['tex'] for it in items ] )
+            texpath = os.path.join( tmpdir, 'pack{}.tex'.format( n ) )
+            with open( texpath, 'w', encoding='utf-8' ) as f:
+                f.write( tex )
+            try:
+                fmt = preamble_format( tex, cwd, engine, formats, timeout ) if formats is not None else None
+                pdfpath = compile_tex( texpath, cwd, tmpdir, engine, timeout, fmt )
+                outs = split_pdf( pdfpath, counts, [ os.path.join( outdir, it['status']['name'] + '.pdf' ) for it in items ] )
+            except ( RuntimeError, OSError, subprocess.SubprocessError ):
+                # one of them is broken: compile them one by one so the others still come out
+                for it in items:
+                    _compile_alone( it, cwd, outdir, engine, timeout, cache, formats )
+                continue
+            for it, out in zip( items, outs ):
+                it['status']['pack'] = len( items )
+                if cache is not None:
+                    cache.put( it['key'], out )
+                _done( it['status'], out )
+    finally:
+        shutil.rmtree( tmpdir, ignore_errors=True )
+    seconds = time.perf_counter() - start
+    for status in results:
+        status['seconds'] = seconds
+    return results
+
+
+def _done( status, pdfpath ):
+    status['status'] = 'ok'
+    status['pdf'] = pdfpath
+    status['pdf_bytes'] = os.path.getsize( pdfpath )
+
+
+def _compile_alone( item, cwd, outdir, engine, timeout, cache, formats ):
+    status = item['status']
+    tmpdir = os.path.dirname( item['texpath'] )
+    try:
+        fmt = preamble_format( item['tex'], cwd, engine, formats, timeout ) if formats is not None else None
+        pdfpath = compile_tex( item['texpath'], cwd, tmpdir, engine, timeout, fmt )
+        if cache is not None:
+            cache.put( item['key'], pdfpath )
+        _done( status, shutil.copyfile( pdfpath, os.path.join( outdir, status['name'] + '.pdf' ) ) )
+    except Exception as e:
+        status['error'] = '{}: {}'.format( type( e ).__name__, e )
+
+
+def render_packed( jobs, outdir='.', workers=None, per_doc=100, cache=None, **kwargs ):
+    # render_batch with up to `per_doc` diagrams per document and one document per worker at a time
+    _need_splitter()
+    jobs = [ to_job( j ) for j in jobs ]
+    packs = [ jobs[i:i + per_doc] for i in range( 0, len( jobs ), per_doc ) ]
+    workers = min( workers or os.cpu_count() or 1, len( packs ) or 1 )
+    if cache is not None:
+        # workers count on their own copy, the totals are merged back below
+        kwargs['cache'] = RenderCache( cache.path, cache.max_bytes )
+    if workers == 1:
+        results = [ r for p in packs for r in render_pack( p, outdir, **kwargs ) ]
+    else:
+        with ProcessPoolExecutor( max_workers=workers ) as pool:
+            futures = [ pool.submit( render_pack, p, outdir, **kwargs ) for p in packs ]
+            results = [ r for f in futures for r in f.result() ]
+    if cache is not None:
+        for r in results:
+            if r.get( 'cache' ):
+                cache.record( r['cache'] == 'hit', r.get( 'pdf_bytes', 0 ) )
+    return results
+
+
+def main( argv=None ):
+    parser = argparse.ArgumentParser( prog='python -m pycore.multi', description='Render many diagrams per pdflatex run and split the PDF per diagram.' )
+    parser.add_argument( 'sources', nargs='+', help='arch scripts (*.py), specs (*.json, *.jsonl, *.yaml), directories of specs or generated .tex files' )
+    parser.add_argument( '-o', '--outdir', default='.', help='directory for the PDFs' )
+    parser.add_argument( '-j', '--jobs', type=int, default=None, help='worker processes (default: number of cores)' )
+    parser.add_argument( '--per-doc', type=int, default=100, help='diagrams packed into one document (default: 100)' )
+    parser.add_argument( '--engine', default=ENGINE )
+    parser.add_argument( '--timeout', type=float, default=None, help='per-compile timeout in seconds' )
+    parser.add_argument( '--cache', metavar='DIR', default=None, help='reuse PDFs of unchanged diagrams from this cache directory' )
+    parser.add_argument( '--cache-size', type=float, default=512, help='cache size limit in MB (default: 512)' )
+    parser.add_argument( '--formats', metavar='DIR', nargs='?', const=FORMAT_DIR, default=None,
+                         help='compile against a precompiled preamble kept in DIR (default DIR: {})'.format( FORMAT_DIR ) )
+    parser.add_argument( '--geometry', action='store_true', help='emit layers as plain \\draw commands with precomputed coordinates' )
+    parser.add_argument( '--styles', action='store_true', help='define repeated layer options once as TikZ styles' )
+    parser.add_argument( '--route', action='store_true', help='put skips (and connections crossing layers) on separate lanes' )
+    parser.add_argument( '--input-dpi', type=float, metavar='DPI', default=None, help='include to_input images resized to their printed size at DPI' )
+    parser.add_argument( '--lod', type=int, metavar='N', default=None, help='collapse runs of equal layers/blocks into "xN" boxes in archs of more than N layers' )
+    parser.add_argument( '--no-validate', action='store_true', help='skip the layer name checks before compiling' )
+    parser.add_argument( '--json', action='store_true', help='print per-job status as JSON' )
+    args = parser.parse_args( argv )
+
+    cache = RenderCache( args.cache, int( args.cache_size * 2**20 ) ) if args.cache else None
+    results = render_packed( list( expand_sources( args.sources ) ), args.outdir, workers=args.jobs, per_doc=max( 1, args.per_doc ), cache=cache,
+                             engine=args.engine, timeout=args.timeout, validate=not args.no_validate, formats=args.formats,
+                             geometry=args.geometry, lod=args.lod, styles=args.styles, input_dpi=args.input_dpi, route=args.route )
+    if args.json:
+        json.dump( results, sys.stdout, indent=2 )
+        print()
+    else:
+        for r in results:
+            print( '{:5} {:6.2f}s  x{:<3} {}  {}'.format( r['status'], r['seconds'], r['pack'], r['name'], r['pdf'] or r['error'] ) )
+    if cache is not None:
+        print( 'cache: {hits} hits, {misses} misses, {bytes_saved} bytes saved'.format( **cache.stats() ), file=sys.stderr )
+    return 0 if all( r['status'] == 'ok' for r in results ) else 1
+
+
+if __name__ == '__main__':
+    sys.exit( main() )
@@ -0,0 +1,175 @@
+import os
+import re
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+
+from . import ir
+from .tikzeng import to_generate
+from .render import ENGINE, to_job, load_arch, compile_tex
+from .spec import load_spec
+from .fmt import FORMAT_DIR, preamble_format
+
+# Compile-time profiling: python -m pycore.profile my_arch.py [--json report.json]
+# Every item of the picture (\pic, to_connection, to_skip, hand-written TeX) is
+# followed by a marker that writes \pdfelapsedtime to the log, so the time TeX
+# spent on an item is the difference to the marker before it. Together with the
+# time Python takes to emit the item this gives a ranked list of hot spots, plus
+# the phases: preamble (packages, up to \begin{document}), picture (all items)
+# and shipout (\end{tikzpicture}, where the picture is actually written out).
+
+_PROF = re.compile( r'PNN-PROF:(\w+):(\d+)' )
+
+_SETUP = ( '\n\\ifdefined\\pdfelapsedtime\\else\\ifdefined\\elapsedtime\\let\\pdfelapsedtime\\elapsedtime'
+           '\\else\\chardef\\pdfelapsedtime=0 \\fi\\fi\n'
+           '\\gdef\\pnnprof#1{\\typeout{PNN-PROF:#1:\\the\\pdfelapsedtime}}\n'
+           '\\AtEndDocument{\\pnnprof{end}}\n'
+           '\\pnnprof{begin}\n' )
+
+
+def label( c ):
+    # what the report calls an item
+    if isinstance( c, ir.Block ):
+        return 'block_{} {}'.format( c.kind, c.name )
+    node = next( ir.nodes( [ c ] ), c )
+    if isinstance( node, ir.Layer ):
+        return '{} {}'.format( node.kind, node.name )
+    if isinstance( node, ir.Edge ):
+        return '{} {} -> {}'.format( node.kind, node.of, node.to )
+    line = next( ( l.strip() for l in node.splitlines() if l.strip() ), '' )
+    return 'tex ' + ( line[:40] + '...' if len( line ) > 40 else line )
+
+
+def _site( c ):
+    node = c if isinstance( c, ir.Block ) else next( ir.nodes( [ c ] ), c )
+    return getattr( node, 'site', None )
+
+
+def _emit( c ):
+    # TeX of an item as it is written and the seconds Python needs to produce it
+    start = time.perf_counter()
+    if isinstance( c, ir.Fragment ):
+        c.node.tex()
+        tex = str( c )
+    elif isinstance( c, ir.Block ):
+        for x in ir.nodes( c ):
+            if isinstance( x, ir.Node ):
+                x.tex()
+        tex = c.tex()
+    elif isinstance( c, ir.Node ):
+        tex = c.tex()
+    else:
+        tex = c
+    return tex, time.perf_counter() - start
+
+
+def instrument( arch ):
+    # (TeX chunks with markers, per-item info); the markers start after the
+    # fragment that opens the document
+    items = list( ir.flatten( arch ) )
+    begin = next( ( i for i, c in enumerate( items ) if isinstance( c, str ) and '\\begin{document}' in c ), None )
+    if begin is None:
+        raise ValueError( "the arch has no \\begin{document} (to_begin) to put the profiling markers after" )
+    out, info = [], []
+    for i, c in enumerate( items ):
+        tex, seconds = _emit( c )
+        out.append( tex )
+        if i == begin:
+            out.append( _SETUP )
+        elif i > begin and '\\end{document}' not in tex:
+            out.append( '\\pnnprof{{{}}}\n'.format( len( info ) ) )
+            info.append( { 'item': label( c ), 'site': _site( c ), 'emit_seconds': seconds } )
+    return out, info
+
+
+def parse_log( log ):
+    # marker -> elapsed seconds (\pdfelapsedtime counts 1/65536 s)
+    return { m.group( 1 ): int( m.group( 2 ) ) / 65536. for m in _PROF.finditer( log ) }
+
+
+def report( info, marks ):
+    items = []
+    prev = marks.get( 'begin' )
+    for i, entry in enumerate( info ):
+        t = marks.get( str( i ) )
+        entry = dict( entry, tex_seconds=t - prev if t is not None and prev is not None else None )
+        items.append( entry )
+        prev = t if t is not None else prev
+    last = marks.get( str( len( info ) - 1 ) ) if info else marks.get( 'begin' )
+    phases = {
+        'preamble': marks.get( 'begin' ),
+        'picture': last - marks['begin'] if last is not None and 'begin' in marks else None,
+        'shipout': marks['end'] - last if last is not None and 'end' in marks else None,
+        'emit': sum( e['emit_seconds'] for e in info ),
+    }
+    ranked = sorted( items, key=lambda e: -( e['tex_seconds'] or 0. ) )
+    return { 'phases': phases, 'total': marks.get( 'end' ), 'items': ranked }
+
+
+def profile( arch, cwd=None, engine=ENGINE, timeout=None, formats=None ):
+    # compile an instrumented copy of the arch (never cached) and return the report
+    chunks, info = instrument( arch )
+    cwd = os.path.abspath( cwd or os.getcwd() )
+    tmpdir = tempfile.mkdtemp( prefix='pnn_prof_' )
+    try:
+        texpath = os.path.join( tmpdir, 'profile.tex' )
+        to_generate( chunks, texpath, echo=False )
+        fmt = None
+        if formats is not None:
+            with open( texpath, encoding='utf-8' ) as f:
+                fmt = preamble_format( f.read(), cwd, engine, formats, timeout )
+        compile_tex( texpath, cwd, tmpdir, engine=engine, timeout=timeout, fmt=fmt )
+        with open( os.path.join( tmpdir, 'profile.log' ), encoding='utf-8', errors='replace' ) as f:
+            marks = parse_log( f.read() )
+    finally:
+        shutil.rmtree( tmpdir, ignore_errors=True )
+    if 'begin' not in marks:
+        raise RuntimeError( "no PNN-PROF markers in the log; the engine has no \\pdfelapsedtime?" )
+    return report( info, marks )
+
+
+def _seconds( v ):
+    return '     -' if v is None else '{:6.3f}'.format( v )
+
+
+def format_report( result, top=20 ):
+    lines = [ 'phase       seconds' ]
+    for phase in ( 'preamble', 'picture', 'shipout' ):
+        lines.append( '{:10} {}'.format( phase, _seconds( result['phases'][phase] ) ) )
+    lines.append( '{:10} {}  (python)'.format( 'emit', _seconds( result['phases']['emit'] ) ) )
+    lines.append( '' )
+    lines.append( '   tex s   emit ms  item' )
+    for e in result['items'][:top]:
+        lines.append( '{}  {:8.3f}  {}{}'.format( _seconds( e['tex_seconds'] ), e['emit_seconds'] * 1e3, e['item'],
+                                                  '  ({})'.format( e['site'] ) if e['site'] else '' ) )
+    if len( result['items'] ) > top:
+        lines.append( '... {} more'.format( len( result['items'] ) - top ) )
+    return '\n'.join( lines )
+
+
+def main( argv=None ):
+    parser = argparse.ArgumentParser( prog='python -m pycore.profile', description='Report where compiling a diagram spends its time.' )
+    parser.add_argument( 'source', help='arch script (*.py) or spec (*.json, *.jsonl, *.yaml)' )
+    parser.add_argument( '--engine', default=ENGINE )
+    parser.add_argument( '--timeout', type=float, default=None, help='compile timeout in seconds' )
+    parser.add_argument( '--formats', metavar='DIR', nargs='?', const=FORMAT_DIR, default=None,
+                         help='compile against a precompiled preamble kept in DIR (default DIR: {})'.format( FORMAT_DIR ) )
+    parser.add_argument( '--top', type=int, default=20, help='items to list (default: 20)' )
+    parser.add_argument( '--json', metavar='FILE', default=None, help='also write the full report as JSON' )
+    args = parser.parse_args( argv )
+
+    job = to_job( args.source )
+    arch = load_spec( job['spec'] ) if 'spec' in job else load_arch( job['script'] )
+    result = profile( arch, job['cwd'], args.engine, args.timeout, args.formats )
+    print( format_report( result, args.top ) )
+    if args.json:
+        with open( args.json, 'w' ) as f:
+            json.dump( result, f, indent=2 )
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit( main() )
@@ -0,0 +1,195 @@
+import hashlib
+from functools import lru_cache
+
+from . import ir
+
+# Declarative layer types. A kind is declared once with its pic (Box,
+# RightBandedBox, Ball), its default colors and the keys it passes to the pic;
+# the \pic body is compiled into a single %-template at declaration time.
+
+DIMS   = ( 'width', 'height', 'depth', 'radius' )
+LABELS = ( 'caption', 'xlabel', 'ylabel', 'zlabel' )
+
+# argument names used by the to_* functions for pic keys
+ALIASES = { 's_filer': 'zlabel', 'n_filer': 'xlabel' }
+
+
+def _labels( v, pad=True ):
+    # to_Conv and friends write a single label as {{64, }}; pad=False writes {{64}}
+    v = tuple( v ) if isinstance( v, ( tuple, list ) ) else ( v, )
+    return '{{' + ', '.join( str( x ) for x in v ) + ( ', ' if pad and len( v ) == 1 else '' ) + '}}'
+
+def _labels_unpadded( v ):
+    return _labels( v, pad=False )
+
+def _list( v ):
+    return '{' + ','.join( str( x ) for x in v ) + '}' if isinstance( v, ( tuple, list ) ) else str( v )
+
+_FORMAT = { 'xlabel': _labels, 'width': _list }
+
+# kinds nothing can redeclare; filled in once the built-in types below are registered
+BUILTIN = frozenset()
+
+
+def _section( key ):
+    # index into ( dims, labels, style )
+    return 0 if key in DIMS else 1 if key in LABELS else 2
+
+
+def _canonical( key, v ):
+    if isinstance( v, list ):
+        v = tuple( v )
+    if key == 'xlabel' and not isinstance( v, tuple ):
+        v = ( v, )
+    return v
+
+
+def _definition( pic, keys, args, aliases, defaults, pad_xlabel ):
+    # what makes two declarations of a kind the same
+    return repr( ( pic, tuple( keys ), tuple( args ), sorted( ( aliases or {} ).items() ), sorted( defaults.items() ), pad_xlabel ) )
+
+
+class LayerType:
+    __slots__ = ( 'kind', 'pic', 'keys', 'args', 'aliases', 'defaults', 'params', 'head', 'body', 'getters', 'formats', 'definition' )
+
+    def __init__( self, kind, pic, keys, args=(), aliases=None, defaults=None, pad_xlabel=True ):
+        self.kind = kind
+        self.definition = _definition( pic, keys, args, aliases, defaults or {}, pad_xlabel )
+        self.pic = pic
+        self.keys = tuple( keys )
+        self.args = tuple( args )
+        self.aliases = dict( ALIASES, **( aliases or {} ) )
+        # accepted parameter name -> ( pic key, section )
+        self.params = {}
+        for p in self.args + self.keys + tuple( self.aliases ):
+            key = self.aliases.get( p, p )
+            self.params[p] = ( key, _section( key ) )
+        self.defaults = ( {}, {}, {} )
+        for p, v in ( defaults or {} ).items():
+            key, section = self.params.get( p ) or ( p, _section( p ) )
+            self.defaults[section][key] = _canonical( key, v )
+        # the \pic is split so the body can be memoized independently of name and position
+        self.head = '\n\\pic[shift={%s}] at %s \n    {' + pic + '={\n        name=%s,\n'
+        self.body = ',\n'.join( '        {}=%s'.format( k ) for k in self.keys ) + '\n        }\n    };\n'
+        self.getters = tuple( ( _section( k ), k ) for k in self.keys )
+        formats = _FORMAT if pad_xlabel else dict( _FORMAT, xlabel=_labels_unpadded )
+        self.formats = tuple( formats.get( k, str ) for k in self.keys )
+
+    def layer( self, name, *args, **kwargs ):
+        if args:
+            if len( args ) > len( self.args ):
+                raise TypeError( "{}() takes at most {} positional arguments after name".format( self.kind, len( self.args ) ) )
+            for p, v in zip( self.args, args ):
+                if p in kwargs:
+                    raise TypeError( "{}() got multiple values for argument '{}'".format( self.kind, p ) )
+                kwargs[p] = v
+        offset = kwargs.pop( 'offset', "(0,0,0)" )
+        to = kwargs.pop( 'to', "(0,0,0)" )
+        sections = ( self.defaults[0].copy(), self.defaults[1].copy(), self.defaults[2].copy() )
+        params = self.params
+        for p, v in kwargs.items():
+            if p not in params:
+                raise TypeError( "{}() got an unexpected keyword argument '{}'".format( self.kind, p ) )
+            key, section = params[p]
+            if key == 'xlabel' or type( v ) is list:
+                v = _canonical( key, v )
+            sections[section][key] = v
+        return ir.Layer( self.kind, name, offset, to, *sections )
+
+    def emit( self, layer ):
+        sections = ( layer.dims, layer.labels, layer.style )
+        values = tuple( sections[i].get( k, '' ) for i, k in self.getters )
+        return self.head % ( layer.offset, layer.to, layer.name ) + _body( self, values )
+
+
+@lru_cache( maxsize=4096 )
+def _body( t, values ):
+    # identical parameter sets (repeated layers, re-serialized archs) are formatted once
+    return t.body % tuple( f( v ) for f, v in zip( t.formats, values ) )
+
+
+def register_layer( kind, pic, keys, args=(), aliases=None, pad_xlabel=True, replace=False, **defaults ):
+    # returns the IR constructor; positional arguments after `name` follow `args`. Layers are
+    # emitted late, so replacing a kind would change layers already built: a kind declared again
+    # must have the same definition (a script run twice) unless replace=True, built-ins never change
+    if kind in BUILTIN:
+        raise ValueError( "layer type '{}' is built in and cannot be redeclared".format( kind ) )
+    t = LayerType( kind, pic, keys, args, aliases, defaults, pad_xlabel )
+    old = ir.LAYER_TYPES.get( kind )
+    if old is not None and old.definition == t.definition:
+        t = old
+    elif old is not None and not replace:
+        raise ValueError( "layer type '{}' is already declared differently; pass replace=True to replace it".format( kind ) )
+    ir.LAYER_TYPES[kind] = t
+    def constructor( name, *args, **kwargs ):
+        return t.layer( name, *args, **kwargs )
+    constructor.__name__ = kind
+    constructor.__qualname__ = kind
+    return constructor
+
+
+def scoped_layer( kind, pic, keys, args=(), aliases=None, pad_xlabel=True, **defaults ):
+    # a layer type for one spec build: registered under a kind unique to its definition
+    # (Quantum@1f3a9c20), so the same name declared differently elsewhere never replaces it
+    if kind in BUILTIN:
+        raise ValueError( "layer type '{}' is built in and cannot be redeclared".format( kind ) )
+    if not kind.isidentifier():
+        raise ValueError( "layer type name '{}' is not an identifier".format( kind ) )
+    definition = _definition( pic, keys, args, aliases, defaults, pad_xlabel )
+    scoped = '{}@{}'.format( kind, hashlib.sha1( definition.encode( 'utf-8' ) ).hexdigest()[:8] )
+    if scoped not in ir.LAYER_TYPES:
+        ir.LAYER_TYPES[scoped] = LayerType( scoped, pic, keys, args, aliases, defaults, pad_xlabel )
+    return ir.LAYER_TYPES[scoped]
+
+
+def define_layer( kind, pic, keys, args=(), aliases=None, pad_xlabel=True, replace=False, **defaults ):
+    # register a layer type and return its to_* function
+    return ir.fragment( register_layer( kind, pic, keys, args, aliases, pad_xlabel, replace, **defaults ) )
+
+
+# built-in layer types
+
+Conv = register_layer( 'Conv', 'Box',
+    keys=( 'caption', 'xlabel', 'zlabel', 'fill', 'height', 'width', 'depth' ),
+    args=( 's_filer', 'n_filer', 'offset', 'to', 'width', 'height', 'depth', 'caption' ),
+    s_filer=256, n_filer=64, width=1, height=40, depth=40, caption=" ", fill=r'\ConvColor' )
+
+# Conv,Conv,relu
+ConvConvRelu = register_layer( 'ConvConvRelu', 'RightBandedBox',
+    keys=( 'caption', 'xlabel', 'zlabel', 'fill', 'bandfill', 'height', 'width', 'depth' ),
+    args=( 's_filer', 'n_filer', 'offset', 'to', 'width', 'height', 'depth', 'caption' ),
+    s_filer=256, n_filer=(64,64), width=(2,2), height=40, depth=40, caption=" ", fill=r'\ConvColor', bandfill=r'\ConvReluColor' )
+
+Pool = register_layer( 'Pool', 'Box',
+    keys=( 'caption', 'fill', 'opacity', 'height', 'width', 'depth' ),
+    args=( 'offset', 'to', 'width', 'height', 'depth', 'opacity', 'caption' ),
+    width=1, height=32, depth=32, opacity=0.5, caption=" ", fill=r'\PoolColor' )
+
+UnPool = register_layer( 'UnPool', 'Box',
+    keys=( 'caption', 'fill', 'opacity', 'height', 'width', 'depth' ),
+    args=( 'offset', 'to', 'width', 'height', 'depth', 'opacity', 'caption' ),
+    width=1, height=32, depth=32, opacity=0.5, caption=" ", fill=r'\UnpoolColor' )
+
+ConvRes = register_layer( 'ConvRes', 'RightBandedBox',
+    keys=( 'caption', 'xlabel', 'zlabel', 'fill', 'bandfill', 'opacity', 'height', 'width', 'depth' ),
+    args=( 's_filer', 'n_filer', 'offset', 'to', 'width', 'height', 'depth', 'opacity', 'caption' ),
+    s_filer=256, n_filer=64, width=6, height=40, depth=40, opacity=0.2, caption=" ",
+    fill='{rgb:white,1;black,3}', bandfill='{rgb:white,1;black,2}' )
+
+ConvSoftMax = register_layer( 'ConvSoftMax', 'Box',
+    keys=( 'caption', 'zlabel', 'fill', 'height', 'width', 'depth' ),
+    args=( 's_filer', 'offset', 'to', 'width', 'height', 'depth', 'caption' ),
+    s_filer=40, width=1, height=40, depth=40, caption=" ", fill=r'\SoftmaxColor' )
+
+SoftMax = register_layer( 'SoftMax', 'Box',
+    keys=( 'caption', 'xlabel', 'zlabel', 'fill', 'opacity', 'height', 'width', 'depth' ),
+    args=( 's_filer', 'offset', 'to', 'width', 'height', 'depth', 'opacity', 'caption' ),
+    s_filer=10, width=1.5, height=3, depth=25, opacity=0.8, caption=" ", xlabel=( '" "', '"dummy"' ), fill=r'\SoftmaxColor' )
+
+Sum = register_layer( 'Sum', 'Ball',
+    keys=( 'fill', 'opacity', 'radius', 'logo' ),
+    args=( 'offset', 'to', 'radius', 'opacity' ),
+    radius=2.5, opacity=0.6, fill=r'\SumColor', logo='$+$' )
+
+# kinds a spec can use without declaring them, and nothing can redeclare
+BUILTIN = frozenset( ir.LAYER_TYPES ) | { 'Input', 'input' }
@@ -0,0 +1,232 @@
+import os
+import sys
+import json
+import time
+import runpy
+import shutil
+import argparse
+import tempfile
+import subprocess
+from concurrent.futures import ProcessPoolExecutor
+
+from .tikzeng import to_generate
+from .cache import RenderCache, tex_digest
+from .validate import check
+from .fmt import FORMAT_DIR, preamble_format
+from .geometry import expand
+from .lod import collapse
+from .styles import dedup
+from .assets import downsample_inputs
+from .route import route as route_edges
+from .spec import EXTENSIONS as SPEC_EXTENSIONS, load_spec
+
+# Batch renderer: python -m pycore.render arch1.py arch2.py ... -o out/
+
+ENGINE = 'pdflatex'
+
+
+def load_arch( path ):
+    # run an arch script from its own directory (as tikzmake.sh does) and pick up `arch`,
+    # main() is not called so nothing is written next to the script
+    path = os.path.abspath( path )
+    cwd = os.getcwd()
+    os.chdir( os.path.dirname( path ) )
+    try:
+        scope = runpy.run_path( path, run_name='__pycore_render__' )
+    finally:
+        os.chdir( cwd )
+    if 'arch' not in scope:
+        raise ValueError( "{} does not define `arch`".format( path ) )
+    return scope['arch']
+
+
+def to_job( item, name=None, cwd=None ):
+    # a job is a plain dict so it pickles cheaply into the pool
+    if isinstance( item, dict ):
+        return item
+    if isinstance( item, str ):
+        path = os.path.abspath( item )
+        base, ext = os.path.splitext( os.path.basename( path ) )
+        kind = 'tex' if ext == '.tex' else 'spec' if ext.lower() in SPEC_EXTENSIONS else 'script'
+        return { 'name': name or base, kind: path, 'cwd': cwd or os.path.dirname( path ) }
+    if name is None:
+        raise ValueError( "arch lists need a job name" )
+    return { 'name': name, 'arch': list( item ), 'cwd': os.path.abspath( cwd or os.getcwd() ) }
+
+
+def compile_tex( texpath, cwd, outdir, engine=ENGINE, timeout=None, fmt=None ):
+    # relative paths in the TeX (\subimport{../layers/}, \includegraphics) resolve against cwd;
+    # with a preamble format from fmt.preamble_format the packages are not read again
+    cmd = [ engine, '-interaction=nonstopmode', '-halt-on-error', '-output-directory', outdir, texpath ]
+    if fmt is not None:
+        cmd.insert( 1, '-fmt=' + fmt )
+    proc = subprocess.run( cmd, cwd=cwd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, timeout=timeout )
+    pdfpath = os.path.join( outdir, os.path.splitext( os.path.basename( texpath ) )[0] + '.pdf' )
+    if proc.returncode != 0 or not os.path.exists( pdfpath ):
+        log = proc.stdout.decode( 'utf-8', 'replace' )
+        raise RuntimeError( "{} exited with {}\n{}".format( engine, proc.returncode, '\n'.join( log.splitlines()[-20:] ) ) )
+    return pdfpath
+
+
+def compile_cached( texpath, cwd, outdir, engine=ENGINE, timeout=None, cache=None, formats=None ):
+    # returns (pdf path, 'hit' | 'miss' | None); a hit skips the engine entirely,
+    # `formats` is the directory of precompiled preambles (None compiles without)
+    if cache is None and formats is None:
+        return compile_tex( texpath, cwd, outdir, engine=engine, timeout=timeout ), None
+    with open( texpath, encoding='utf-8' ) as f:
+        tex = f.read()
+    if cache is not None:
+        key = tex_digest( tex, cwd, engine )
+        pdfpath = cache.get( key )
+        if pdfpath is not None:
+            return pdfpath, 'hit'
+    fmt = preamble_format( tex, cwd, engine, formats, timeout ) if formats is not None else None
+    pdfpath = compile_tex( texpath, cwd, outdir, engine=engine, timeout=timeout, fmt=fmt )
+    if cache is None:
+        return pdfpath, None
+    return cache.put( key, pdfpath ), 'miss'
+
+
+def prepare( arch, cwd=None, validate=True, geometry=False, lod=None, styles=False, input_dpi=None, route=False ):
+    # the arch as it is written out: with lod=N archs of more than N layers are drawn with runs of
+    # equal layers collapsed, the checks run before routing and the TeX-level rewrites come last
+    if lod is not None:
+        arch = collapse( arch, lod )
+    if input_dpi:
+        arch = downsample_inputs( arch, input_dpi, cwd )
+    if validate:
+        arch = list( arch )
+        check( arch )
+    if route:
+        arch = route_edges( arch )
+    if styles:
+        arch = dedup( arch )
+    if geometry:
+        arch = expand( arch )
+    return arch
+
+
+def render( arch, pathname="file.pdf", cwd=None, cache=None, engine=ENGINE, timeout=None, validate=True, formats=None, geometry=False, lod=None, styles=False, input_dpi=None, route=False ):
+    # to_generate followed by a (cached) compile into `pathname`; a broken arch raises ArchError before any compile
+    arch = prepare( arch, cwd, validate, geometry, lod, styles, input_dpi, route )
+    tmpdir = tempfile.mkdtemp( prefix='pnn_' )
+    try:
+        texpath = os.path.join( tmpdir, os.path.splitext( os.path.basename( pathname ) )[0] + '.tex' )
+        to_generate( arch, texpath, echo=False )
+        pdfpath, hit = compile_cached( texpath, os.path.abspath( cwd or os.getcwd() ), tmpdir, engine, timeout, cache, formats )
+        shutil.copyfile( pdfpath, pathname )
+        return hit
+    finally:
+        shutil.rmtree( tmpdir, ignore_errors=True )
+
+
+def generate_job( job, tmpdir, validate=True, geometry=False, lod=None, styles=False, input_dpi=None, route=False ):
+    texpath = os.path.join( tmpdir, job['name'] + '.tex' )
+    if 'tex' in job:
+        shutil.copyfile( job['tex'], texpath )
+        return texpath
+    if 'arch' in job:
+        arch = job['arch']
+    elif 'spec' in job:
+        arch = load_spec( job['spec'] )
+    else:
+        arch = load_arch( job['script'] )
+    to_generate( prepare( arch, job['cwd'], validate, geometry, lod, styles, input_dpi, route ), texpath, echo=False )
+    return texpath
+
+
+def render_job( job, outdir='.', engine=ENGINE, keep=False, keep_tex=False, timeout=None, cache=None, validate=True, formats=None, geometry=False, lod=None, styles=False, input_dpi=None, route=False ):
+    job = to_job( job )
+    status = { 'name': job['name'], 'source': job.get( 'script' ) or job.get( 'tex' ) or job.get( 'spec' ) or '<arch>',
+               'status': 'error', 'pdf': None, 'error': None }
+    start = time.perf_counter()
+    tmpdir = tempfile.mkdtemp( prefix='pnn_{}_'.format( job['name'] ) )
+    try:
+        texpath = generate_job( job, tmpdir, validate, geometry, lod, styles, input_dpi, route )
+        status['generate_seconds'] = time.perf_counter() - start
+        pdfpath, status['cache'] = compile_cached( texpath, job['cwd'], tmpdir, engine, timeout, cache, formats )
+        os.makedirs( outdir, exist_ok=True )
+        status['pdf'] = shutil.copyfile( pdfpath, os.path.join( outdir, job['name'] + '.pdf' ) )
+        status['pdf_bytes'] = os.path.getsize( status['pdf'] )
+        if keep_tex:
+            status['tex'] = shutil.copy( texpath, os.path.join( outdir, job['name'] + '.tex' ) )
+        status['status'] = 'ok'
+    except Exception as e:
+        status['error'] = '{}: {}'.format( type( e ).__name__, e )
+    finally:
+        status['seconds'] = time.perf_counter() - start
+        if keep:
+            status['tmpdir'] = tmpdir
+        else:
+            shutil.rmtree( tmpdir, ignore_errors=True )
+    return status
+
+
+def render_batch( jobs, outdir='.', workers=None, cache=None, **kwargs ):
+    jobs = [ to_job( j ) for j in jobs ]
+    workers = min( workers or os.cpu_count() or 1, len( jobs ) or 1 )
+    outdir = os.path.abspath( outdir )
+    if cache is not None:
+        # workers count on their own copy, the totals are merged back below
+        kwargs['cache'] = RenderCache( cache.path, cache.max_bytes )
+    if workers == 1:
+        results = [ render_job( j, outdir, **kwargs ) for j in jobs ]
+    else:
+        with ProcessPoolExecutor( max_workers=workers ) as pool:
+            futures = [ pool.submit( render_job, j, outdir, **kwargs ) for j in jobs ]
+            results = [ f.result() for f in futures ]
+    if cache is not None:
+        for r in results:
+            if r.get( 'cache' ):
+                cache.record( r['cache'] == 'hit', r.get( 'pdf_bytes', 0 ) )
+    return results
+
+
+def expand_sources( sources ):
+    # directories stand for the spec files in them
+    for src in sources:
+        if os.path.isdir( src ):
+            yield from sorted( os.path.join( src, f ) for f in os.listdir( src ) if os.path.splitext( f )[1].lower() in SPEC_EXTENSIONS )
+        else:
+            yield src
+
+
+def main( argv=None ):
+    parser = argparse.ArgumentParser( prog='python -m pycore.render', description='Render arch scripts and .tex files to PDF in parallel.' )
+    parser.add_argument( 'sources', nargs='+', help='arch scripts (*.py), specs (*.json, *.jsonl, *.yaml), directories of specs or generated .tex files' )
+    parser.add_argument( '-o', '--outdir', default='.', help='directory for the PDFs' )
+    parser.add_argument( '-j', '--jobs', type=int, default=None, help='worker processes (default: number of cores)' )
+    parser.add_argument( '--engine', default=ENGINE )
+    parser.add_argument( '--timeout', type=float, default=None, help='per-compile timeout in seconds' )
+    parser.add_argument( '--keep', action='store_true', help='keep per-job temp directories' )
+    parser.add_argument( '--keep-tex', action='store_true', help='copy the generated .tex next to the PDF' )
+    parser.add_argument( '--cache', metavar='DIR', default=None, help='reuse PDFs of unchanged diagrams from this cache directory' )
+    parser.add_argument( '--cache-size', type=float, default=512, help='cache size limit in MB (default: 512)' )
+    parser.add_argument( '--formats', metavar='DIR', nargs='?', const=FORMAT_DIR, default=None,
+                         help='compile against a precompiled preamble kept in DIR (default DIR: {})'.format( FORMAT_DIR ) )
+    parser.add_argument( '--geometry', action='store_true', help='emit layers as plain \\draw commands with precomputed coordinates' )
+    parser.add_argument( '--styles', action='store_true', help='define repeated layer options once as TikZ styles' )
+    parser.add_argument( '--route', action='store_true', help='put skips (and connections crossing layers) on separate lanes' )
+    parser.add_argument( '--input-dpi', type=float, metavar='DPI', default=None, help='include to_input images resized to their printed size at DPI' )
+    parser.add_argument( '--lod', type=int, metavar='N', default=None, help='collapse runs of equal layers/blocks into "xN" boxes in archs of more than N layers' )
+    parser.add_argument( '--no-validate', action='store_true', help='skip the layer name checks before compiling' )
+    parser.add_argument( '--json', action='store_true', help='print per-job status as JSON' )
+    args = parser.parse_args( argv )
+
+    cache = RenderCache( args.cache, int( args.cache_size * 2**20 ) ) if args.cache else None
+    results = render_batch( list( expand_sources( args.sources ) ), args.outdir, workers=args.jobs, cache=cache, engine=args.engine,
+                            keep=args.keep, keep_tex=args.keep_tex, timeout=args.timeout, validate=not args.no_validate,
+                            formats=args.formats, geometry=args.geometry, lod=args.lod, styles=args.styles, input_dpi=args.input_dpi, route=args.route )
+    if args.json:
+        json.dump( results, sys.stdout, indent=2 )
+        print()
+    else:
+        for r in results:
+            print( '{:5} {:6.2f}s  {}  {}'.format( r['status'], r['seconds'], r['name'], r['pdf'] or r['error'] ) )
+    if cache is not None:
+        print( 'cache: {hits} hits, {misses} misses, {bytes_saved} bytes saved'.format( **cache.stats() ), file=sys.stderr )
+    return 0 if all( r['status'] == 'ok' for r in results ) else 1
+
+
+if __name__ == '__main__':
+    sys.exit( main() )
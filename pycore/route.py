@@ -0,0 +1,187 @@
+import math
+import warnings
+import itertools
+from bisect import bisect_left, bisect_right
+
+from . import ir
+from . import scene
+
+# Edge routing: to_skip draws its run over the top at a fixed pos=1.25 of each
+# end's height and to_connection a straight east-west line, so in U-Nets and
+# densely connected nets skips lie on top of each other and connections cross
+# the layers between their ends. route() places the layers as pycore/scene.py
+# does and gives every skip (and every connection with a layer in its way) a
+# lane: a height above all layers under its run, on which no other run overlaps
+# it. Shorter runs are placed first, so nested skips stack from the inside out.
+# Layer boxes are kept sorted by x with a sparse table of their tops and lanes
+# as sorted interval lists, so an edge costs O(log n) plus the lanes it tries.
+# The result is the arch with the edges' pos set per end; no TeX changes besides.
+
+CLEARANCE = .4  # cm between a lane and the highest layer under it
+GAP = .35       # cm between lanes
+
+
+class _Boxes:
+    # projected layer boxes ( x0, x1, y0, y1, name ) sorted by x0, with the range maximum of y1
+
+    def __init__( self, boxes ):
+        self.boxes = sorted( boxes )
+        self.x0 = [ b[0] for b in self.boxes ]
+        self.reach = max( ( b[1] - b[0] for b in self.boxes ), default=0. )
+        self.table = [ [ b[3] for b in self.boxes ] ]
+        k = 1
+        while 2 * k <= len( self.boxes ):
+            prev = self.table[-1]
+            self.table.append( [ max( prev[i], prev[i + k] ) for i in range( len( prev ) - k ) ] )
+            k *= 2
+
+    def _range( self, a, b ):
+        # indices of the boxes starting in [a, b] and of those starting early enough to reach a
+        return bisect_left( self.x0, a - self.reach ), bisect_left( self.x0, a ), bisect_right( self.x0, b )
+
+    def top( self, a, b ):
+        # highest top of the boxes overlapping [a, b], None if none do
+        k, i, j = self._range( a, b )
+        best = None
+        if i < j:
+            level = ( j - i ).bit_length() - 1
+            best = max( self.table[level][i], self.table[level][j - ( 1 << level )] )
+        for box in self.boxes[k:i]:
+            if box[1] >= a and ( best is None or box[3] > best ):
+                best = box[3]
+        return best
+
+    def blocked( self, a, b, y0, y1, ends ):
+        # whether a box other than `ends` lies across the segment a..b at heights y0..y1
+        k, _, j = self._range( a, b )
+        return any( x0 < b and x1 > a and lo < y1 and hi > y0 and name not in ends
+                    for x0, x1, lo, hi, name in self.boxes[k:j] )
+
+
+class _Lanes:
+    # per lane (a multiple of `gap`) the disjoint x intervals already taken, sorted
+
+    def __init__( self, gap ):
+        self.gap = gap
+        self.levels = {}
+
+    def place( self, a, b, base ):
+        # height of the lowest lane at or above `base` that is free over [a, b]
+        k = math.ceil( base / self.gap )
+        while True:
+            starts, ends = self.levels.setdefault( k, ( [], [] ) )
+            i = bisect_right( starts, b )
+            if i == 0 or ends[i - 1] < a:
+                starts.insert( i, a )
+                ends.insert( i, b )
+                return k * self.gap
+            k += 1
+
+
+# anchors in the middle plane (z=0) of a box, which straight connections run in
+_MIDDLE = ( 'west', 'east', 'north', 'south', 'northeast', 'northwest', 'southeast', 'southwest' )
+
+
+def _boxes( layers, anchors, only=None ):
+    # projected bounding boxes of the layers' anchors (`only` these anchors)
+    points = {}
+    for key, p in anchors.items():
+        name, _, anchor = key.rpartition( '-' )
+        if only is None or anchor in only:
+            points.setdefault( name, [] ).append( scene.project( p ) )
+    out = []
+    for layer in layers:
+        if layer.name in points:
+            xs, ys = [ x for x, _ in points[layer.name] ], [ y for _, y in points[layer.name] ]
+            out.append( ( min( xs ), max( xs ), min( ys ), max( ys ), layer.name ) )
+    return out
+
+
+def _heights( anchors, name, south, north ):
+    return scene.project( anchors[name + '-' + south] )[1], scene.project( anchors[name + '-' + north] )[1]
+
+
+def _pos( anchors, name, south, north, y ):
+    # pos along name-south -- name-north that is at height y
+    y0, y1 = _heights( anchors, name, south, north )
+    return round( ( y - y0 ) / ( y1 - y0 ), 3 )
+
+
+def lanes( arch, clearance=CLEARANCE, gap=GAP, connections=True ):
+    # { edge index in ir.nodes( arch ): ( pos of, pos to ) } for the edges that get a lane
+    anchors = {}
+    scene.build( arch, anchors )
+    nodes = list( ir.nodes( arch ) )
+    layers = [ n for n in nodes if isinstance( n, ir.Layer ) ]
+    boxes = _Boxes( _boxes( layers, anchors ) )
+    middle = _Boxes( _boxes( layers, anchors, _MIDDLE ) )
+
+    wanted = []
+    for i, n in enumerate( nodes ):
+        if not isinstance( n, ir.Edge ):
+            continue
+        if n.kind == 'skip':
+            ends = ( 'southeast', 'northeast', 'south', 'north' )
+        elif n.kind == 'connection' and connections:
+            ends = ( 'southeast', 'northeast', 'southwest', 'northwest' )
+        else:
+            continue
+        names = [ n.of + '-' + a for a in ends[:2] ] + [ n.to + '-' + a for a in ends[2:] ]
+        if not all( k in anchors for k in names ):
+            continue  # e.g. a Ball end, which has no southeast/northeast
+        if any( y0 == y1 for y0, y1 in ( _heights( anchors, n.of, *ends[:2] ), _heights( anchors, n.to, *ends[2:] ) ) ):
+            continue  # a flat end has no pos that reaches a lane
+        a, b = scene.project( anchors[names[1]] )[0], scene.project( anchors[names[3]] )[0]
+        if b <= a:
+            continue
+        if n.kind == 'connection':
+            ya, yb = scene.project( anchors[n.of + '-east'] )[1], scene.project( anchors[n.to + '-west'] )[1]
+            if not middle.blocked( a, b, min( ya, yb ), max( ya, yb ), ( n.of, n.to ) ):
+                continue
+        wanted.append( ( b - a, a, i, b, ends ) )
+
+    taken = _Lanes( gap )
+    out = {}
+    for _, a, i, b, ends in sorted( wanted ):
+        n = nodes[i]
+        y = taken.place( a - gap / 2, b + gap / 2, boxes.top( a, b ) + clearance )
+        out[i] = ( _pos( anchors, n.of, ends[0], ends[1], y ), _pos( anchors, n.to, ends[2], ends[3], y ) )
+    return out
+
+
+def route( arch, clearance=CLEARANCE, gap=GAP, connections=True ):
+    # the arch with skips, and connections that would cross a layer, moved onto lanes
+    arch = list( arch )
+    pos = lanes( arch, clearance, gap, connections )
+    index = itertools.count()  # position in ir.nodes( arch )
+
+    def rewrite( items ):
+        out = []
+        for c in items:
+            if isinstance( c, ir.Block ) and ir.compact( c ):
+                # one macro call draws the whole block: a routed edge inside it means drawing
+                # the block node by node instead
+                first = next( index )
+                count = sum( 1 for _ in ir.nodes( c ) )
+                for _ in range( count - 1 ):
+                    next( index )
+                routed = [ i for i in range( first, first + count ) if i in pos ]
+                if routed:
+                    c = ir.Block( c.kind, c.name, [ ir.Fragment( x.node.replace( pos=pos[i] ) if i in pos else x.node )
+                                                    for i, x in zip( range( first, first + count ), c ) ], c.site )
+            elif isinstance( c, ir.Block ):
+                c = ir.Block( c.kind, c.name, rewrite( c ), c.site )
+            elif isinstance( c, list ):
+                c = rewrite( c )
+            else:
+                i = next( index )
+                if i in pos and isinstance( c, ir.Fragment ) and str( c ) == c.node.tex():
+                    c = ir.Fragment( c.node.replace( pos=pos[i] ) )
+                elif i in pos and isinstance( c, ir.Fragment ):
+                    # drawn by TeX of its own, e.g. a fragment of a compact block taken out of it
+                    warnings.warn( "edge {} -> {} is drawn by its own TeX and was not routed".format( c.node.of, c.node.to ) )
+                elif i in pos and isinstance( c, ir.Node ):
+                    c = c.replace( pos=pos[i] )
+            out.append( c )
+        return out
+    return rewrite( arch )
@@ -0,0 +1,251 @@
+import re
+
+from . import ir
+from .tikzeng import to_cor
+from .layout import DEPTH
+from .geometry import SCALE, BOX_DEFAULTS, BANDED_DEFAULTS, BALL_DEFAULTS, params, values, unquote, anchor_points, widths, corners, band_corners
+
+# Scene: the picture TeX would draw, as plain primitives for backends that do
+# not go through LaTeX (pycore/svg.py). Layers are placed by resolving their
+# `to`/`offset` against the anchors of the layers before them, the shapes follow
+# layers/*.sty and the colors are xcolor expressions evaluated in Python from
+# to_cor() and the \defs of the arch. Points are 3D in cm; project() applies the
+# default TikZ z vector (-3.85mm,-3.85mm). Primitives are dicts:
+#   polygon  points, fill, opacity, stroke, dashed
+#   line     points, stroke, opacity, width (pt), arrows ('mid' on every segment)
+#   circle   at, r, fill, opacity, shaded
+#   text     at, text, dx, dy (pt), size (pt), bold
+#   image    at, width, height, href (canvas is the zy plane)
+
+XCOLORS = {
+    'red': ( 1, 0, 0 ), 'green': ( 0, 1, 0 ), 'blue': ( 0, 0, 1 ), 'cyan': ( 0, 1, 1 ), 'magenta': ( 1, 0, 1 ),
+    'yellow': ( 1, 1, 0 ), 'black': ( 0, 0, 0 ), 'white': ( 1, 1, 1 ), 'gray': ( .5, .5, .5 ),
+    'darkgray': ( .25, .25, .25 ), 'lightgray': ( .75, .75, .75 ), 'brown': ( .75, .5, .25 ), 'lime': ( .75, 1, 0 ),
+    'olive': ( .5, .5, 0 ), 'orange': ( 1, .5, 0 ), 'pink': ( 1, .75, .75 ), 'purple': ( .75, 0, .25 ),
+    'teal': ( 0, .5, .5 ), 'violet': ( .5, 0, .5 ),
+}
+
+# connection and copyconnection of to_begin, \edgecolor of layers/init.tex
+EDGE_COLOR = 'rgb:blue,4;red,1;green,4;black,3'
+COPY_COLOR = 'rgb:blue,4;red,1;green,1;black,3'
+EDGE_WIDTH = 1.6  # ultra thick
+LINE_WIDTH = .4
+PT = 28.4528      # pt per cm
+
+_DEF = re.compile( r'\\def\\([A-Za-z]+)\{(.*)\}' )
+_MACRO = re.compile( r'^\\([A-Za-z]+)$' )
+
+
+def definitions( text ):
+    return { m.group( 1 ): m.group( 2 ).strip() for m in _DEF.finditer( text ) }
+
+DEFAULT_COLORS = definitions( to_cor() )
+
+
+def color( expr, defs=None ):
+    # ( r, g, b ) in 0..1 of an xcolor expression: a name, \Macro, rgb:red,5;white,2 or red!30!white
+    expr = str( expr ).strip()
+    while expr.startswith( '{' ) and expr.endswith( '}' ):
+        expr = expr[1:-1].strip()
+    m = _MACRO.match( expr )
+    if m:
+        defs = DEFAULT_COLORS if defs is None else defs
+        return color( defs.get( m.group( 1 ), DEFAULT_COLORS.get( m.group( 1 ), 'black' ) ), defs )
+    if expr.startswith( 'rgb:' ):
+        total, mix = 0., [ 0., 0., 0. ]
+        for part in expr[4:].split( ';' ):
+            name, _, weight = part.partition( ',' )
+            c, w = color( name, defs ), float( weight or 1 )
+            total += w
+            mix = [ a + w * b for a, b in zip( mix, c ) ]
+        return tuple( a / total for a in mix ) if total else ( 0., 0., 0. )
+    if '!' in expr:
+        # a!p!b!q!c...: p% of a with b, that mixed q% with c, ...; a!p is a!p!white
+        parts = expr.split( '!' )
+        c = color( parts[0], defs )
+        for i in range( 1, len( parts ), 2 ):
+            other = color( parts[i + 1], defs ) if i + 1 < len( parts ) else ( 1., 1., 1. )
+            p = float( parts[i] ) / 100.
+            c = tuple( p * a + ( 1 - p ) * b for a, b in zip( c, other ) )
+        return c
+    return tuple( float( x ) for x in XCOLORS.get( expr, ( 0, 0, 0 ) ) )
+
+
+def project( p ):
+    # 2D page position in cm of a 3D point
+    x, y, z = p
+    return x - DEPTH * z, y - DEPTH * z
+
+
+def _add( a, b ):
+    return tuple( x + y for x, y in zip( a, b ) )
+
+
+def point( expr, anchors ):
+    # a TikZ coordinate: (x,y,z), (x,y), (name-anchor) or ($(a)+(b)-(c)$); unknown names are the origin
+    expr = expr.strip()
+    if expr.startswith( '($' ) and expr.endswith( '$)' ):
+        total = ( 0., 0., 0. )
+        for op, term in re.findall( r'([+-]?)\s*(\([^()]*\))', expr[2:-2] ):
+            sign = -1 if op == '-' else 1
+            total = tuple( a + sign * b for a, b in zip( total, point( term, anchors ) ) )
+        return total
+    inner = expr.strip( '()' ).strip()
+    parts = [ x.strip() for x in inner.split( ',' ) ]
+    try:
+        nums = [ float( x ) for x in parts ]
+    except ValueError:
+        return anchors.get( inner, ( 0., 0., 0. ) )
+    return tuple( nums + [ 0. ] * ( 3 - len( nums ) ) )[:3]
+
+
+def _text( tex ):
+    # a TeX label as plain text: \\ breaks lines, math and font switches are dropped
+    s = str( tex )
+    for a, b in ( ( '\\times', '×' ), ( '\\Sigma', 'Σ' ), ( '\\alpha', 'α' ), ( '\\beta', 'β' ), ( '\\sigma', 'σ' ), ( '~', ' ' ) ):
+        s = s.replace( a, b )
+    s = s.replace( '\\\\', '\n' )
+    s = re.sub( r'\\[A-Za-z]+\s*', '', s )
+    return s.replace( '$', '' ).replace( '{', '' ).replace( '}', '' ).strip()
+
+
+def _label( at, tex, dx=0., dy=0., size=10., bold=False ):
+    text = _text( tex )
+    return [ { 'kind': 'text', 'at': at, 'text': text, 'dx': dx, 'dy': dy, 'size': size, 'bold': bold } ] if text else []
+
+
+def box( layer, origin, defs, banded=False ):
+    p = params( layer, BANDED_DEFAULTS if banded else BOX_DEFAULTS )
+    y = float( p['height'] ) * SCALE
+    z = float( p['depth'] ) * SCALE
+    labels = [ unquote( l ) for l in values( p['xlabel'] ) ] if p['xlabel'] else []
+    fill, opacity = color( p['fill'], defs ), float( p['opacity'] )
+    band = ( color( p['bandfill'], defs ), float( p['bandopacity'] ) ) if banded else None
+
+    def at( x, yy, zz ):
+        return _add( origin, ( x, yy, zz ) )
+    def face( points, f=fill, o=opacity, stroke=( 0, 0, 0 ) ):
+        return { 'kind': 'polygon', 'points': points, 'fill': f, 'opacity': o, 'stroke': stroke, 'dashed': False }
+
+    out = []
+    east = 0.
+    for i, x in enumerate( widths( layer, p ) ):
+        west, east = east, east + x
+        a, b, c, d, e, f, g, h = ( at( *q ) for q in corners( west, east, y, z ) )
+        out += [ face( [ d, a, b, c ] ), face( [ d, a, h, e ] ) ]
+        out.append( { 'kind': 'line', 'points': [ f, g, b ], 'stroke': ( 0, 0, 0 ), 'opacity': .7, 'width': LINE_WIDTH, 'dashed': True, 'arrows': None } )
+        out.append( { 'kind': 'line', 'points': [ h, g ], 'stroke': ( 0, 0, 0 ), 'opacity': .7, 'width': LINE_WIDTH, 'dashed': True, 'arrows': None } )
+        if banded:
+            art, brt, hrt = ( at( *q ) for q in band_corners( east, x, y, z ) )
+            out += [ face( [ d, art, brt, c ], *band, stroke=band[0] ), face( [ d, art, hrt, e ], *band, stroke=band[0] ) ]
+            out += [ face( [ d, a, b, c ], None, 0 ), face( [ d, a, h, e ], None, 0 ) ]
+        if i < len( labels ):
+            out += _label( at( ( west + east ) / 2, -y/2, z/2 ), labels[i], dy=-8 )
+    # east face of the last box
+    out.append( face( [ d, e, f, c ] ) )
+    if banded:
+        out.append( face( [ d, e, f, c ], *band ) )
+
+    out += _label( c, p['zlabel'], dx=4, dy=-4, size=8 )
+    out += _label( at( 0, 0, z/2 ), p['ylabel'], dx=-8 )
+    out += _label( at( east / 2, -y/2, z/2 ), p['caption'], dy=-25, bold=True )
+    anchors = { '{}-{}'.format( layer.name, k ): at( *v ) for k, v in anchor_points( east, y, z ) }
+    return out, anchors
+
+
+def ball( layer, origin, defs ):
+    p = params( layer, BALL_DEFAULTS )
+    r = float( p['radius'] ) * SCALE
+    out = [ { 'kind': 'circle', 'at': origin, 'r': r, 'fill': color( p['fill'], defs ), 'opacity': float( p['opacity'] ), 'shaded': True } ]
+    out += _label( origin, p['logo'], size=10 * 4 * r )
+    out += _label( _add( origin, ( 0, -r, 0 ) ), p['caption'], dy=-20, bold=True )
+    points = { 'anchor': ( 0, 0, 0 ), 'east': ( r, 0, 0 ), 'west': ( -r, 0, 0 ), 'north': ( 0, r, 0 ), 'south': ( 0, -r, 0 ) }
+    return out, { '{}-{}'.format( layer.name, k ): _add( origin, v ) for k, v in points.items() }
+
+
+def image( layer, origin ):
+    w, h = float( layer.dims['width'] ), float( layer.dims['height'] )
+    out = [ { 'kind': 'image', 'at': origin, 'width': w, 'height': h, 'href': layer.style['image'] } ]
+    points = { 'center': ( 0, 0, 0 ), 'anchor': ( 0, 0, 0 ), 'east': ( 0, 0, w/2 ), 'west': ( 0, 0, -w/2 ), 'north': ( 0, h/2, 0 ), 'south': ( 0, -h/2, 0 ) }
+    return out, { '{}-{}'.format( layer.name, k ): _add( origin, v ) for k, v in points.items() }
+
+
+def edge( e, anchors ):
+    def a( name, anchor ):
+        return anchors.get( '{}-{}'.format( name, anchor ), ( 0., 0., 0. ) )
+    def top( south, north, pos ):
+        return tuple( u + float( pos ) * ( v - u ) for u, v in zip( south, north ) )
+    if e.kind == 'skip':
+        pa, pb = ir._ends( e.pos )
+        points = [ a( e.of, 'northeast' ), top( a( e.of, 'southeast' ), a( e.of, 'northeast' ), pa ),
+                   top( a( e.to, 'south' ), a( e.to, 'north' ), pb ), a( e.to, 'north' ) ]
+        stroke = COPY_COLOR
+    elif e.pos is not None:
+        # connection routed over a lane (pycore.route)
+        pa, pb = ir._ends( e.pos )
+        points = [ a( e.of, 'east' ), top( a( e.of, 'southeast' ), a( e.of, 'northeast' ), pa ),
+                   top( a( e.to, 'southwest' ), a( e.to, 'northwest' ), pb ), a( e.to, 'west' ) ]
+        stroke = EDGE_COLOR
+    else:
+        points = [ a( e.of, 'east' ), a( e.to, 'west' ) ]
+        stroke = EDGE_COLOR
+    return { 'kind': 'line', 'points': points, 'stroke': color( stroke ), 'opacity': .7, 'width': EDGE_WIDTH, 'dashed': False, 'arrows': 'mid' }
+
+
+_SHAPES = {
+    'Box': lambda l, o, d: box( l, o, d ),
+    'RightBandedBox': lambda l, o, d: box( l, o, d, banded=True ),
+    'Ball': ball,
+}
+
+
+def build( arch, anchors=None ):
+    # primitives of an arch in drawing order; `anchors` (a dict) receives the name-anchor points
+    defs = dict( DEFAULT_COLORS )
+    anchors = {} if anchors is None else anchors
+    out = []
+    for node in ir.nodes( arch ):
+        if isinstance( node, ir.Edge ):
+            out.append( edge( node, anchors ) )
+        elif isinstance( node, ir.Layer ):
+            origin = _add( point( node.to, anchors ), point( node.offset, anchors ) )
+            t = ir.LAYER_TYPES.get( node.kind )
+            if node.kind == 'Input':
+                prims, points = image( node, origin )
+            elif t is not None and t.pic in _SHAPES:
+                prims, points = _SHAPES[t.pic]( node, origin, defs )
+            else:
+                continue
+            out += prims
+            anchors.update( points )
+        else:
+            defs.update( definitions( node ) )
+    return out
+
+
+def bounds( primitives, margin=.5 ):
+    # ( xmin, ymin, xmax, ymax ) in cm of the projected primitives
+    xs, ys = [], []
+    for p in primitives:
+        if p['kind'] == 'circle':
+            x, y = project( p['at'] )
+            xs += [ x - p['r'], x + p['r'] ]
+            ys += [ y - p['r'], y + p['r'] ]
+        elif p['kind'] == 'image':
+            for dz in ( -p['width'] / 2, p['width'] / 2 ):
+                for dy in ( -p['height'] / 2, p['height'] / 2 ):
+                    x, y = project( _add( p['at'], ( 0, dy, dz ) ) )
+                    xs.append( x )
+                    ys.append( y )
+        elif p['kind'] == 'text':
+            x, y = project( p['at'] )
+            xs.append( x + p['dx'] / PT )
+            ys.append( y + p['dy'] / PT )
+        else:
+            for q in p['points']:
+                x, y = project( q )
+                xs.append( x )
+                ys.append( y )
+    if not xs:
+        return ( 0., 0., 1., 1. )
+    return ( min( xs ) - margin, min( ys ) - margin, max( xs ) + margin, max( ys ) + margin )
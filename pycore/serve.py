@@ -0,0 +1,266 @@
+import os
+import sys
+import json
+import time
+import asyncio
+import hashlib
+import multiprocessing
+import argparse
+import tempfile
+import shutil
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from urllib.parse import urlsplit, parse_qs
+
+from .tikzeng import to_generate
+from .cache import CACHE_DIR, RenderCache
+from .validate import check
+from .fmt import FORMAT_DIR
+from .render import ENGINE, compile_cached
+from .spec import ROOT, EXTENSIONS as SPEC_EXTENSIONS, build, parse
+from .svg import to_svg
+
+# Rendering service: python -m pycore.serve [--port 8470 | --unix /tmp/pnn.sock]
+#   POST /render?format=pdf|svg&type=json|jsonl|yaml   body: an arch spec (pycore/spec.py)
+#   GET  /metrics                                      queue depth, counters, latencies (JSON)
+#   GET  /health
+# Requests wait in a bounded queue for one of `workers` compile slots, each backed
+# by a process of the pool; when the queue is full the request is rejected with
+# 503 and Retry-After instead of piling up TeX processes. Identical requests
+# (same format and spec) that arrive while one is in flight share its result.
+# Image paths in specs are relative to the repository root. A worker that dies
+# (e.g. killed for memory) fails its render and the pool is started again.
+
+MAX_BODY = 4 * 2**20
+READ_TIMEOUT = 30  # seconds a client gets to send its request
+FORMATS = { 'pdf': 'application/pdf', 'svg': 'image/svg+xml' }
+
+_REASONS = { 200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed', 408: 'Request Timeout', 413: 'Payload Too Large',
+             500: 'Internal Server Error', 503: 'Service Unavailable' }
+
+
+def render_spec( text, fmt='pdf', ext='.json', engine=ENGINE, timeout=None, cache=None, formats=None ):
+    # bytes of a spec drawn as PDF or SVG; runs in a worker process. Spec problems are
+    # raised as plain ValueError so they cross the process boundary intact
+    try:
+        arch = build( parse( text, ext ), ROOT, source='<request>' )
+        check( arch )
+    except ( ValueError, KeyError, TypeError ) as e:
+        raise ValueError( '{}: {}'.format( type( e ).__name__, e ) ) from None
+    if fmt == 'svg':
+        return to_svg( arch, ROOT ).encode( 'utf-8' )
+    tmpdir = tempfile.mkdtemp( prefix='pnn_serve_' )
+    try:
+        texpath = os.path.join( tmpdir, 'diagram.tex' )
+        to_generate( arch, texpath, echo=False )
+        pdfpath, _ = compile_cached( texpath, ROOT, tmpdir, engine, timeout, RenderCache( cache ) if cache else None, formats )
+        with open( pdfpath, 'rb' ) as f:
+            return f.read()
+    finally:
+        shutil.rmtree( tmpdir, ignore_errors=True )
+
+
+class Overloaded( Exception ):
+    pass
+
+
+class Service:
+
+    def __init__( self, workers=None, queue_size=32, engine=ENGINE, timeout=None, cache=CACHE_DIR, formats=None ):
+        self.workers = workers or os.cpu_count() or 1
+        self.queue_size = queue_size
+        self.options = { 'engine': engine, 'timeout': timeout, 'cache': cache, 'formats': formats }
+        self.pool = None
+        self.queue = None
+        self.tasks = []
+        self.inflight = {}
+        self.busy = 0
+        self.counts = { 'requests': 0, 'completed': 0, 'failed': 0, 'rejected': 0, 'coalesced': 0 }
+        self.latencies = deque( maxlen=1000 )
+
+    def _pool( self ):
+        # spawned, not forked: a forked worker would inherit the open client sockets
+        # and keep connections from closing
+        return ProcessPoolExecutor( max_workers=self.workers, mp_context=multiprocessing.get_context( 'spawn' ) )
+
+    async def start( self ):
+        self.pool = self._pool()
+        self.queue = asyncio.Queue( self.queue_size )
+        self.tasks = [ asyncio.ensure_future( self._work() ) for _ in range( self.workers ) ]
+
+    async def stop( self ):
+        for t in self.tasks:
+            t.cancel()
+        await asyncio.gather( *self.tasks, return_exceptions=True )
+        self.pool.shutdown( wait=False )
+
+    async def _work( self ):
+        loop = asyncio.get_running_loop()
+        while True:
+            key, args, future = await self.queue.get()
+            self.busy += 1
+            pool = self.pool
+            try:
+                result = await loop.run_in_executor( pool, render_spec, *args )
+                future.set_result( result )
+            except Exception as e:
+                # counted once per render, however many requests wait for it
+                self.counts['failed'] += 1
+                if isinstance( e, BrokenProcessPool ) and self.pool is pool:
+                    self.pool = self._pool()
+                    pool.shutdown( wait=False )
+                future.set_exception( e )
+            finally:
+                self.busy -= 1
+                del self.inflight[key]
+                self.queue.task_done()
+
+    async def render( self, text, fmt='pdf', ext='.json' ):
+        # bytes of the diagram; raises Overloaded when the queue is full
+        self.counts['requests'] += 1
+        start = time.perf_counter()
+        key = hashlib.sha256( '{}\0{}\0{}'.format( fmt, ext, text ).encode( 'utf-8' ) ).hexdigest()
+        future = self.inflight.get( key )
+        if future is not None:
+            self.counts['coalesced'] += 1
+        else:
+            future = asyncio.get_running_loop().create_future()
+            try:
+                args = ( text, fmt, ext, self.options['engine'], self.options['timeout'], self.options['cache'], self.options['formats'] )
+                self.queue.put_nowait( ( key, args, future ) )
+            except asyncio.QueueFull:
+                self.counts['rejected'] += 1
+                raise Overloaded( "{} requests queued".format( self.queue.qsize() ) )
+            self.inflight[key] = future
+        # shielded: a client that goes away does not cancel the render others wait for
+        result = await asyncio.shield( future )
+        self.counts['completed'] += 1
+        self.latencies.append( time.perf_counter() - start )
+        return result
+
+    def metrics( self ):
+        lat = sorted( self.latencies )
+        def pct( p ):
+            return lat[min( len( lat ) - 1, int( p * len( lat ) ) )] if lat else None
+        return dict( self.counts, queue_depth=self.queue.qsize() if self.queue else 0, queue_size=self.queue_size,
+                     busy=self.busy, workers=self.workers, inflight=len( self.inflight ),
+                     latency={ 'count': len( lat ), 'mean': sum( lat ) / len( lat ) if lat else None,
+                               'p50': pct( .5 ), 'p95': pct( .95 ), 'max': lat[-1] if lat else None } )
+
+    async def handle( self, reader, writer ):
+        try:
+            status, headers, body = await self._respond( reader )
+        except Exception as e:
+            status, headers, body = 500, {}, '{}: {}'.format( type( e ).__name__, e ).encode()
+        headers.setdefault( 'Content-Type', 'text/plain; charset=utf-8' )
+        head = 'HTTP/1.1 {} {}\r\n'.format( status, _REASONS.get( status, '' ) )
+        head += ''.join( '{}: {}\r\n'.format( k, v ) for k, v in dict( headers, **{ 'Content-Length': len( body ), 'Connection': 'close' } ).items() )
+        try:
+            writer.write( head.encode( 'latin-1' ) + b'\r\n' + body )
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def _respond( self, reader ):
+        try:
+            request = await asyncio.wait_for( self._read( reader ), READ_TIMEOUT )
+        except asyncio.TimeoutError:
+            return 408, {}, b'request not received in time\n'
+        except asyncio.IncompleteReadError:
+            return 400, {}, b'request body shorter than its Content-Length\n'
+        if isinstance( request[0], int ):
+            return request
+        method, target, text = request
+
+        if target.path == '/health':
+            return 200, {}, b'ok\n'
+        if target.path == '/metrics':
+            return 200, { 'Content-Type': 'application/json' }, json.dumps( self.metrics(), indent=2 ).encode() + b'\n'
+        if target.path != '/render':
+            return 404, {}, b'not found\n'
+        if method != 'POST':
+            return 405, { 'Allow': 'POST' }, b'POST a spec to /render\n'
+        query = { k: v[-1] for k, v in parse_qs( target.query ).items() }
+        fmt = query.get( 'format', 'pdf' )
+        ext = '.' + query.get( 'type', 'json' ).lstrip( '.' )
+        if fmt not in FORMATS or ext not in SPEC_EXTENSIONS:
+            return 400, {}, 'format is one of {}, type one of {}\n'.format( ', '.join( FORMATS ), ', '.join( e[1:] for e in SPEC_EXTENSIONS ) ).encode()
+        try:
+            data = await self.render( text, fmt, ext )
+        except Overloaded as e:
+            return 503, { 'Retry-After': '1' }, 'overloaded: {}\n'.format( e ).encode()
+        except ( ValueError, ImportError ) as e:
+            return 400, {}, '{}\n'.format( e ).encode()
+        except Exception as e:
+            return 500, {}, '{}: {}\n'.format( type( e ).__name__, e ).encode()
+        return 200, { 'Content-Type': FORMATS[fmt] }, data
+
+    async def _read( self, reader ):
+        # ( method, target, body ) of a request, or a ( status, headers, body ) answer to a bad one
+        parts = ( await reader.readline() ).decode( 'latin-1' ).split()
+        if len( parts ) < 2:
+            return 400, {}, b'bad request line\n'
+        method, target = parts[0], urlsplit( parts[1] )
+        headers = {}
+        while True:
+            h = await reader.readline()
+            if h in ( b'\r\n', b'\n', b'' ):
+                break
+            k, _, v = h.decode( 'latin-1' ).partition( ':' )
+            headers[k.strip().lower()] = v.strip()
+        if method != 'POST' or target.path != '/render':
+            return method, target, None
+        length = headers.get( 'content-length', '0' )
+        if not length.isdigit():
+            return 400, {}, b'bad Content-Length\n'
+        if int( length ) > MAX_BODY:
+            return 413, {}, b'spec too large\n'
+        try:
+            return method, target, ( await reader.readexactly( int( length ) ) ).decode( 'utf-8' )
+        except UnicodeDecodeError:
+            return 400, {}, b'spec is not UTF-8\n'
+
+
+async def serve( service, host='127.0.0.1', port=8470, unix=None ):
+    await service.start()
+    if unix:
+        server = await asyncio.start_unix_server( service.handle, path=unix )
+    else:
+        server = await asyncio.start_server( service.handle, host, port )
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await service.stop()
+
+
+def main( argv=None ):
+    parser = argparse.ArgumentParser( prog='python -m pycore.serve', description='Serve PDF/SVG renderings of arch specs over local HTTP.' )
+    parser.add_argument( '--host', default='127.0.0.1' )
+    parser.add_argument( '--port', type=int, default=8470 )
+    parser.add_argument( '--unix', metavar='PATH', default=None, help='listen on a Unix socket instead of TCP' )
+    parser.add_argument( '-j', '--workers', type=int, default=None, help='concurrent renders (default: number of cores)' )
+    parser.add_argument( '--queue', type=int, default=32, help='requests that may wait for a worker before 503 (default: 32)' )
+    parser.add_argument( '--engine', default=ENGINE )
+    parser.add_argument( '--timeout', type=float, default=60, help='per-compile timeout in seconds' )
+    parser.add_argument( '--cache', metavar='DIR', default=CACHE_DIR, help='PDF cache directory' )
+    parser.add_argument( '--no-cache', action='store_true' )
+    parser.add_argument( '--formats', metavar='DIR', nargs='?', const=FORMAT_DIR, default=None,
+                         help='compile against a precompiled preamble kept in DIR (default DIR: {})'.format( FORMAT_DIR ) )
+    args = parser.parse_args( argv )
+
+    service = Service( args.workers, args.queue, args.engine, args.timeout, None if args.no_cache else args.cache,
+                       args.formats )
+    print( 'serving on {}'.format( args.unix or 'http://{}:{}'.format( args.host, args.port ) ), file=sys.stderr )
+    try:
+        asyncio.run( serve( service, args.host, args.port, args.unix ) )
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit( main() )
@@ -0,0 +1,184 @@
+import io
+import os
+import sys
+import json
+import math
+import argparse
+
+from . import blocks, ir, registry, tikzeng
+from .layout import layout as auto_layout
+
+try:
+    import yaml
+except ImportError:
+    yaml = None
+
+# Architectures from declarative specs (.json, .jsonl, .yaml). A spec is a list
+# of records:
+#   { "name": "unet", "head": "..", "colors": { "Quantum": "rgb:cyan,5;white,2" } }
+#   { "types": { "Quantum": { "pic": "Box", "keys": [ ... ], "defaults": { ... } } } }
+#   { "type": "Conv", "name": "conv1", "shape": [ 64, 256, 256 ], "inputs": [ "input" ], ... }
+#   { "block": "2ConvPool", "name": "b2", "top": "pool_b2", "shape": [ 128, 128, 128 ] }
+#   { "of": "conv1", "to": "ccr_b9", "type": "skip", "pos": 1.25 }
+# A .json file holds one object with the header keys plus "layers" and "edges"
+# lists (or just a list of records); .jsonl has one record per line and is read
+# as a stream. Layers without "inputs" follow the previous layer; any other keys
+# are passed on to the to_*/block_* function. "types" are only seen by the spec
+# declaring them and cannot redeclare a built-in kind.
+
+ROOT = os.path.dirname( os.path.dirname( os.path.abspath( __file__ ) ) )
+EXTENSIONS = ( '.json', '.jsonl', '.yaml', '.yml' )
+
+_LAYER_KEYS = ( 'type', 'name', 'shape', 'inputs' )
+
+
+def _octaves( v, ref, at, per, lo, hi ):
+    # size on a log2 scale: `at` for a value of `ref`, `per` more per doubling
+    return round( min( hi, max( lo, at + per * math.log2( max( float( v ), 1. ) / ref ) ) ), 2 )
+
+
+def shape_dims( shape ):
+    # (channels, height, width), (channels, length) or (features,) -> Box width, height, depth;
+    # a leading batch dimension is dropped. Matches the hand-tuned sizes of pyexamples/unet.py.
+    shape = [ int( x ) for x in shape if x is not None ]
+    if len( shape ) > 3:
+        shape = shape[-3:]
+    if len( shape ) == 1:
+        return { 'width': 1, 'height': 3, 'depth': _octaves( shape[0], 512, 40, 8, 4, 64 ) }, shape[0], shape[0]
+    c, h = shape[0], shape[1]
+    w = shape[2] if len( shape ) > 2 else h
+    dims = { 'width': _octaves( c, 64, 2, 1, .5, 12 ), 'height': _octaves( h, 512, 40, 8, 2, 64 ), 'depth': _octaves( w, 512, 40, 8, 2, 64 ) }
+    return dims, c, h
+
+
+def read( path ):
+    # records of a spec file; .jsonl and multi-document YAML are streamed
+    ext = os.path.splitext( path )[1].lower()
+    with open( path, encoding='utf-8' ) as f:
+        yield from _read( f, ext, path )
+
+
+def parse( text, ext='.json' ):
+    # records of a spec given as a string, `ext` names its format as a file extension would
+    yield from _read( io.StringIO( text ), ext.lower(), '<{} spec>'.format( ext.lstrip( '.' ) ) )
+
+
+def _read( f, ext, path ):
+    if ext == '.jsonl':
+        for line in f:
+            if line.strip():
+                yield json.loads( line )
+        return
+    if ext in ( '.yaml', '.yml' ):
+        if yaml is None:
+            raise ImportError( "reading {} needs PyYAML (pip install pyyaml)".format( path ) )
+        docs = yaml.safe_load_all( f )
+    else:
+        docs = [ json.load( f ) ]
+    for doc in docs:
+        yield from _records( doc )
+
+
+def _records( doc ):
+    if isinstance( doc, list ):
+        yield from doc
+        return
+    doc = dict( doc )
+    layers, edges = doc.pop( 'layers', [] ), doc.pop( 'edges', [] )
+    yield doc
+    yield from layers
+    for e in edges:
+        yield e if isinstance( e, dict ) else { 'of': e[0], 'to': e[1] }
+
+
+def _layer( r, prev, types ):
+    kind = r['type']
+    kwargs = { k: v for k, v in r.items() if k not in _LAYER_KEYS }
+    inputs = r.get( 'inputs', [ prev ] if prev else [] )
+    if kind == 'input':
+        return [ tikzeng.to_input( name=r.get( 'name', 'temp' ), **kwargs ) ], []
+    t = types.get( kind ) or ( ir.LAYER_TYPES.get( kind ) if kind in registry.BUILTIN else None )
+    if t is None:
+        raise ValueError( "unknown layer type '{}' for layer '{}'".format( kind, r['name'] ) )
+    if 'shape' in r and t.pic != 'Ball':
+        dims, c, h = shape_dims( r['shape'] )
+        banded = isinstance( t.defaults[0].get( 'width' ), tuple )
+        for k, v in dims.items():
+            kwargs.setdefault( k, ( v, v ) if banded and k == 'width' else v )
+        if 's_filer' in t.args:
+            kwargs.setdefault( 's_filer', h )
+        if 'n_filer' in t.args:
+            kwargs.setdefault( 'n_filer', ( c, c ) if banded else c )
+    if inputs:
+        kwargs.setdefault( 'to', '({}-east)'.format( inputs[0] ) )
+        kwargs.setdefault( 'offset', '(1,0,0)' )
+    return [ ir.Fragment( t.layer( r['name'], **kwargs ) ) ], [ tikzeng.to_connection( i, r['name'] ) for i in inputs ]
+
+
+def _block( r, prev ):
+    kwargs = { k: v for k, v in r.items() if k not in ( 'block', 'shape' ) }
+    kwargs.setdefault( 'botton', prev )
+    if 'shape' in r:
+        dims, c, h = shape_dims( r['shape'] )
+        kwargs.setdefault( 'size', ( dims['height'], dims['depth'], dims['width'] ) )
+        kwargs.setdefault( 's_filer', h )
+        kwargs.setdefault( 'n_filer', c )
+    fn = getattr( blocks, 'block_' + r['block'], None )
+    if fn is None:
+        raise ValueError( "unknown block '{}'".format( r['block'] ) )
+    return fn( **kwargs )
+
+
+def build( records, cwd='.', layout=True, source='<spec>' ):
+    # arch list for a stream of spec records
+    meta = {}
+    types = {}  # kinds declared by this spec, seen by no other build
+    body = []
+    prev = None
+    for n, r in enumerate( records, 1 ):
+        items = []
+        if 'of' in r:
+            edge = tikzeng.to_skip( r['of'], r['to'], r.get( 'pos', 1.25 ) ) if r.get( 'type' ) == 'skip' else tikzeng.to_connection( r['of'], r['to'] )
+            items = [ edge ]
+        elif 'type' in r:
+            layer, edges = _layer( r, prev, types )
+            items = layer + edges
+            if r['type'] != 'input':
+                prev = r['name']
+        elif 'block' in r:
+            items = [ _block( r, prev ) ]
+            prev = r['top']
+        else:
+            for kind, t in r.get( 'types', {} ).items():
+                types[kind] = registry.scoped_layer( kind, t['pic'], t['keys'], t.get( 'args', () ), t.get( 'aliases' ),
+                                                    t.get( 'pad_xlabel', True ), **t.get( 'defaults', {} ) )
+            meta.update( ( k, v ) for k, v in r.items() if k != 'types' )
+        # problems found by validate point at the spec record
+        for node in ir.nodes( items ):
+            node.site = '{}: record {}'.format( source, n )
+        body += items
+    head = meta.get( 'head' ) or os.path.relpath( ROOT, os.path.abspath( cwd ) ).replace( os.sep, '/' )
+    colors = ''.join( '\\def\\{}Color{{{}}}\n'.format( k, v ) for k, v in meta.get( 'colors', {} ).items() )
+    arch = [ tikzeng.to_head( head ), tikzeng.to_cor() ] + ( [ '\n' + colors ] if colors else [] ) + [ tikzeng.to_begin() ]
+    arch += auto_layout( body ) if layout else body
+    arch.append( tikzeng.to_end() )
+    return arch
+
+
+def load_spec( path, layout=True ):
+    return build( read( path ), os.path.dirname( os.path.abspath( path ) ), layout, path )
+
+
+def main( argv=None ):
+    parser = argparse.ArgumentParser( prog='python -m pycore.spec', description='Generate the TeX of an architecture spec (.json, .jsonl, .yaml).' )
+    parser.add_argument( 'spec' )
+    parser.add_argument( '-o', '--output', default=None, help='.tex file to write (default: next to the spec)' )
+    parser.add_argument( '--no-layout', action='store_true', help='keep the to=/offset= positions instead of the automatic layout' )
+    args = parser.parse_args( argv )
+    output = args.output or os.path.splitext( args.spec )[0] + '.tex'
+    tikzeng.to_generate( load_spec( args.spec, not args.no_layout ), output, echo=False )
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit( main() )
@@ -0,0 +1,99 @@
+import re
+
+from . import ir
+
+# Style deduplication: every layer repeats its whole pic body (caption, xlabels,
+# fill, sizes, ...). Bodies used by several layers are defined once as a pgfkeys
+# style in the key family of their pic and the layers only name the style, e.g.
+#   \tikzset{/boxblock/pnnstyle1/.style={caption= , fill=\ConvColor, ...}}
+#   \pic[shift={(0,0,0)}] at (0,0,0) {Box={name=conv1, pnnstyle1}};
+# Layers whose body is not repeated still share the style of their appearance
+# (fill, opacity, ...) and give the remaining keys inline.
+# Color definitions made again later in the preamble (a to_custom_colors after
+# to_cor) are dropped, the last definition is the one TeX would use anyway.
+
+# key family each pic reads its options from (\tikzset{/boxblock/.cd,#1} in layers/*.sty)
+FAMILIES = { 'Box': '/boxblock', 'RightBandedBox': '/block', 'Ball': '/sphere' }
+
+_DEF = re.compile( r'^[ \t]*\\def\\([A-Za-z]+)\{.*\}[ \t]*(?:%.*)?\n?', re.M )
+
+
+def options( layer ):
+    # ( section, key=value ) pairs of the pic options of a layer except its name
+    t = ir.LAYER_TYPES[layer.kind]
+    sections = ( layer.dims, layer.labels, layer.style )
+    return tuple( ( i, '{}={}'.format( k, f( sections[i].get( k, '' ) ) ) ) for ( i, k ), f in zip( t.getters, t.formats ) )
+
+
+def _candidates( layer ):
+    # the whole body and its appearance keys (fill, opacity, ...), each as ( pic, options )
+    t = ir.LAYER_TYPES.get( layer.kind ) if isinstance( layer, ir.Layer ) else None
+    if t is None or t.pic not in FAMILIES:
+        return ()
+    opts = options( layer )
+    look = tuple( o for o in opts if o[0] == 2 )
+    return ( ( t.pic, opts ), ( t.pic, look ) ) if look and look != opts else ( ( t.pic, opts ), )
+
+
+def define( name, pic, opts ):
+    # `#` would be read as a style parameter
+    body = ', '.join( kv for _, kv in opts ).replace( '#', '##' )
+    return '\\tikzset{{{}/{}/.style={{{}}}}}\n'.format( FAMILIES[pic], name, body )
+
+
+def use( layer, name, rest=() ):
+    t = ir.LAYER_TYPES[layer.kind]
+    keys = ', '.join( [ 'name=' + layer.name, name ] + [ kv for _, kv in rest ] )
+    return '\n\\pic[shift={{{}}}] at {} {{{}={{{}}}}};\n'.format( layer.offset, layer.to, t.pic, keys )
+
+
+def _colors( preamble ):
+    # fragments before \begin{document} without the \defs made again later on
+    last = {}
+    for i, c in enumerate( preamble ):
+        for m in _DEF.finditer( c ):
+            last[m.group( 1 )] = ( i, m.start() )
+    def keep( i ):
+        def sub( m ):
+            return m.group( 0 ) if last[m.group( 1 )] == ( i, m.start() ) else ''
+        return sub
+    out = []
+    for i, c in enumerate( preamble ):
+        text = _DEF.sub( keep( i ), c )
+        out.append( c if text == c else ir.Fragment( c.node, text ) if isinstance( c, ir.Fragment ) else text )
+    return out
+
+
+def dedup( arch, min_count=2 ):
+    items = list( ir.flatten( arch ) )
+    doc = next( ( i for i, c in enumerate( items ) if isinstance( c, str ) and '\\begin{document}' in c ), 0 )
+    items = _colors( items[:doc] ) + items[doc:]
+
+    layers = [ None if isinstance( c, ir.Block ) else next( ir.nodes( [ c ] ), None ) for c in items ]
+    counts = {}
+    for node in layers:
+        for s in _candidates( node ):
+            counts[s] = counts.get( s, 0 ) + 1
+    # a layer takes the style of its whole body if that repeats, else of its appearance keys
+    chosen = []
+    for node in layers:
+        chosen.append( next( ( s for s in _candidates( node ) if counts[s] >= min_count ), None ) )
+    names = {}
+    for s in chosen:
+        if s is not None and s not in names:
+            names[s] = 'pnnstyle{}'.format( len( names ) + 1 )
+    if not names:
+        return items
+
+    out = []
+    first = True
+    for c, node, s in zip( items, layers, chosen ):
+        if s is not None:
+            if first:
+                # defined right before the first styled layer, inside the picture like the layers
+                out.append( ''.join( define( name, pic, opts ) for ( pic, opts ), name in names.items() ) )
+                first = False
+            rest = [ o for o in options( node ) if o not in s[1] ]
+            c = ir.Fragment( node, use( node, names[s], rest ) )
+        out.append( c )
+    return out
@@ -0,0 +1,131 @@
+import os
+import sys
+import math
+import time
+import argparse
+from xml.sax.saxutils import escape, quoteattr
+
+from . import scene
+from .render import to_job, load_arch, expand_sources
+from .spec import load_spec
+
+# SVG backend: python -m pycore.svg arch.py ... -o out/
+# The scene of pycore/scene.py written as SVG, for previews and dashboards that
+# do not need the PDF. No TeX is involved; labels are plain text without TeX
+# typesetting and balls are shaded with a radial gradient.
+
+PT = scene.PT
+
+
+def _rgb( c ):
+    return '#{:02x}{:02x}{:02x}'.format( *( max( 0, min( 255, int( round( v * 255 ) ) ) ) for v in c ) )
+
+
+def _num( v ):
+    return '{:.2f}'.format( v ).rstrip( '0' ).rstrip( '.' )
+
+
+def _arrow( p, q, stroke, opacity, size=5. ):
+    # \midarrow: a stealth arrow at the middle of p -> q
+    angle = math.atan2( q[1] - p[1], q[0] - p[0] )
+    mx, my = ( p[0] + q[0] ) / 2, ( p[1] + q[1] ) / 2
+    def rot( dx, dy ):
+        return mx + dx * math.cos( angle ) - dy * math.sin( angle ), my + dx * math.sin( angle ) + dy * math.cos( angle )
+    points = [ rot( size, 0 ), rot( -size, size * .7 ), rot( -size * .4, 0 ), rot( -size, -size * .7 ) ]
+    return '<polygon points="{}" fill="{}" fill-opacity="{}"/>\n'.format(
+        ' '.join( '{},{}'.format( _num( x ), _num( y ) ) for x, y in points ), _rgb( stroke ), opacity )
+
+
+def to_svg( arch, cwd=None, outdir=None ):
+    # image paths are relative to cwd in the arch (as for pdflatex) and to outdir in the SVG
+    prims = scene.build( arch )
+    xmin, ymin, xmax, ymax = scene.bounds( prims )
+
+    def xy( p ):
+        # page cm -> SVG pt, y pointing down
+        x, y = scene.project( p )
+        return ( x - xmin ) * PT, ( ymax - y ) * PT
+    def points( ps ):
+        return ' '.join( '{},{}'.format( *map( _num, xy( p ) ) ) for p in ps )
+
+    width, height = ( xmax - xmin ) * PT, ( ymax - ymin ) * PT
+    out = [ '<svg xmlns="http://www.w3.org/2000/svg" xmlns:xlink="http://www.w3.org/1999/xlink" '
+            'width="{0}pt" height="{1}pt" viewBox="0 0 {0} {1}" font-family="serif">\n'.format( _num( width ), _num( height ) ) ]
+    gradients = {}
+    for p in prims:
+        kind = p['kind']
+        if kind == 'polygon':
+            fill = 'none' if p['fill'] is None else _rgb( p['fill'] )
+            out.append( '<polygon points="{}" fill="{}" fill-opacity="{}" stroke="{}" stroke-width="{}" stroke-linejoin="round"/>\n'.format(
+                points( p['points'] ), fill, p['opacity'], _rgb( p['stroke'] ), scene.LINE_WIDTH ) )
+        elif kind == 'line':
+            out.append( '<polyline points="{}" fill="none" stroke="{}" stroke-opacity="{}" stroke-width="{}"{}/>\n'.format(
+                points( p['points'] ), _rgb( p['stroke'] ), p['opacity'], p['width'], ' stroke-dasharray="3,2"' if p['dashed'] else '' ) )
+            if p['arrows'] == 'mid':
+                for a, b in zip( p['points'], p['points'][1:] ):
+                    out.append( _arrow( xy( a ), xy( b ), p['stroke'], p['opacity'] ) )
+        elif kind == 'circle':
+            x, y = xy( p['at'] )
+            fill = _rgb( p['fill'] )
+            if p['shaded']:
+                # ball color=: white highlight at the upper left, the color, dark at the rim
+                if fill not in gradients:
+                    gradients[fill] = 'ball{}'.format( len( gradients ) )
+                    out.append( '<defs><radialGradient id="{}" cx="40%" cy="35%" r="65%"><stop offset="0" stop-color="#ffffff"/>'
+                                '<stop offset=".55" stop-color="{}"/><stop offset="1" stop-color="#000000"/></radialGradient></defs>\n'.format( gradients[fill], fill ) )
+                fill = 'url(#{})'.format( gradients[fill] )
+            out.append( '<circle cx="{}" cy="{}" r="{}" fill="{}" fill-opacity="{}"/>\n'.format( _num( x ), _num( y ), _num( p['r'] * PT ), fill, p['opacity'] ) )
+            out.append( '<circle cx="{}" cy="{}" r="{}" fill="none" stroke="#000000" stroke-width="{}"/>\n'.format( _num( x ), _num( y ), _num( p['r'] * PT ), scene.LINE_WIDTH ) )
+        elif kind == 'text':
+            x, y = xy( p['at'] )
+            x, y = x + p['dx'], y - p['dy']
+            lines = p['text'].split( '\n' )
+            out.append( '<text x="{}" y="{}" font-size="{}" text-anchor="middle"{}>'.format(
+                _num( x ), _num( y ), _num( p['size'] ), ' font-weight="bold"' if p['bold'] else '' ) )
+            out.append( ''.join( '<tspan x="{}" dy="{}">{}</tspan>'.format( _num( x ), _num( p['size'] * 1.2 if i else 0 ), escape( l ) )
+                                 for i, l in enumerate( lines ) ) )
+            out.append( '</text>\n' )
+        elif kind == 'image':
+            # the image lies in the zy plane: its x axis along z, its y axis down along -y
+            x, y = xy( p['at'] )
+            ux, uy = -scene.DEPTH, scene.DEPTH
+            w, h = p['width'] * PT, p['height'] * PT
+            href = p['href']
+            if cwd is not None and not os.path.isabs( href ):
+                href = os.path.relpath( os.path.join( cwd, href ), outdir or os.getcwd() ).replace( '\\', '/' )
+            out.append( '<image xlink:href={} width="{}" height="{}" preserveAspectRatio="none" transform="matrix({:g} {:g} 0 1 {} {})"/>\n'.format(
+                quoteattr( href ), _num( w ), _num( h ), ux, uy,
+                _num( x - ux * w / 2 ), _num( y - uy * w / 2 - h / 2 ) ) )
+    out.append( '</svg>\n' )
+    return ''.join( out )
+
+
+def write_svg( arch, pathname='file.svg', cwd=None ):
+    with open( pathname, 'w', encoding='utf-8' ) as f:
+        f.write( to_svg( arch, cwd, os.path.dirname( os.path.abspath( pathname ) ) ) )
+    return pathname
+
+
+def main( argv=None ):
+    parser = argparse.ArgumentParser( prog='python -m pycore.svg', description='Draw arch scripts and specs as SVG without LaTeX.' )
+    parser.add_argument( 'sources', nargs='+', help='arch scripts (*.py), specs (*.json, *.jsonl, *.yaml) or directories of specs' )
+    parser.add_argument( '-o', '--outdir', default='.', help='directory for the SVGs' )
+    args = parser.parse_args( argv )
+
+    os.makedirs( args.outdir, exist_ok=True )
+    status = 0
+    for src in expand_sources( args.sources ):
+        job = to_job( src )
+        start = time.perf_counter()
+        try:
+            arch = load_spec( job['spec'] ) if 'spec' in job else load_arch( job['script'] )
+            path = write_svg( arch, os.path.join( args.outdir, job['name'] + '.svg' ), job['cwd'] )
+            print( 'ok    {:6.3f}s  {}  {}'.format( time.perf_counter() - start, job['name'], path ) )
+        except Exception as e:
+            print( 'error {:6.3f}s  {}  {}: {}'.format( time.perf_counter() - start, job['name'], type( e ).__name__, e ) )
+            status = 1
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit( main() )
@@ -0,0 +1,220 @@
+import os
+import sys
+import time
+import zlib
+import struct
+import argparse
+
+try:
+    import numpy as np
+except ImportError:  # optional, only needed for thumbnails
+    np = None
+
+from . import scene
+from .render import to_job, load_arch, expand_sources
+from .spec import load_spec
+
+# Raster thumbnails: python -m pycore.thumbnail specs/ -o thumbs/ --size 128
+# The scene of pycore/scene.py is filled straight into a NumPy image: every
+# polygon, line and ball is a mask over its bounding box, blended with its
+# opacity, on a grid supersampled `aa` times for antialiasing. Labels are left
+# out (they are unreadable at thumbnail sizes) and to_input images are drawn as
+# a gray frame. Many archs are rendered in one process without TeX.
+
+IMAGE_COLOR = ( .85, .85, .85 )
+
+
+def _need_numpy():
+    if np is None:
+        raise ImportError( "thumbnails need NumPy (pip install numpy)" )
+
+
+class _Canvas:
+    # float RGB image and the cm -> pixel transform of the scene bounds
+
+    def __init__( self, bounds, width, height, aa ):
+        xmin, ymin, xmax, ymax = bounds
+        self.scale = min( width / ( xmax - xmin ), height / ( ymax - ymin ) ) * aa
+        self.w = max( 1, int( round( ( xmax - xmin ) * self.scale ) ) )
+        self.h = max( 1, int( round( ( ymax - ymin ) * self.scale ) ) )
+        self.xmin, self.ymax = xmin, ymax
+        self.img = np.ones( ( self.h, self.w, 3 ) )
+
+    def xy( self, p ):
+        x, y = scene.project( p )
+        return ( x - self.xmin ) * self.scale, ( self.ymax - y ) * self.scale
+
+    def px( self, pt ):
+        # a width in pt as pixels, at least one
+        return max( 1., pt / scene.PT * self.scale )
+
+    def window( self, xs, ys, pad=0. ):
+        # pixel centers of the bounding box (clipped to the image) as 2D arrays
+        x0, x1 = max( 0, int( np.floor( min( xs ) - pad ) ) ), min( self.w, int( np.ceil( max( xs ) + pad ) ) + 1 )
+        y0, y1 = max( 0, int( np.floor( min( ys ) - pad ) ) ), min( self.h, int( np.ceil( max( ys ) + pad ) ) + 1 )
+        if x0 >= x1 or y0 >= y1:
+            return None
+        gy, gx = np.mgrid[y0:y1, x0:x1] + .5
+        return ( slice( y0, y1 ), slice( x0, x1 ) ), gx, gy
+
+    def blend( self, where, mask, color, alpha ):
+        region = self.img[where]
+        region[mask] = region[mask] * ( 1 - alpha ) + np.asarray( color ) * alpha
+
+    def polygon( self, points, color, alpha ):
+        # convex polygon: inside all edges, either orientation
+        pts = [ self.xy( p ) for p in points ]
+        win = self.window( [ x for x, _ in pts ], [ y for _, y in pts ] )
+        if win is None or alpha <= 0:
+            return
+        where, gx, gy = win
+        pos = np.ones( gx.shape, bool )
+        neg = np.ones( gx.shape, bool )
+        for ( ax, ay ), ( bx, by ) in zip( pts, pts[1:] + pts[:1] ):
+            cross = ( bx - ax ) * ( gy - ay ) - ( by - ay ) * ( gx - ax )
+            pos &= cross >= 0
+            neg &= cross <= 0
+        self.blend( where, pos | neg, color, alpha )
+
+    def line( self, points, color, alpha, width, dashed=False ):
+        r = self.px( width ) / 2
+        pts = [ self.xy( p ) for p in points ]
+        for ( ax, ay ), ( bx, by ) in zip( pts, pts[1:] ):
+            win = self.window( [ ax, bx ], [ ay, by ], r + 1 )
+            if win is None:
+                continue
+            where, gx, gy = win
+            dx, dy = bx - ax, by - ay
+            length2 = dx * dx + dy * dy or 1.
+            t = np.clip( ( ( gx - ax ) * dx + ( gy - ay ) * dy ) / length2, 0, 1 )
+            mask = np.hypot( gx - ax - t * dx, gy - ay - t * dy ) <= r
+            if dashed:
+                mask &= ( t * np.sqrt( length2 ) / ( 4 * r + 2 ) ) % 2 < 1.2
+            self.blend( where, mask, color, alpha )
+
+    def arrow( self, a, b, color, alpha, size ):
+        # \midarrow as a filled triangle at the middle of a -> b
+        ( ax, ay ), ( bx, by ) = self.xy( a ), self.xy( b )
+        length = np.hypot( bx - ax, by - ay )
+        if length == 0:
+            return
+        ux, uy = ( bx - ax ) / length, ( by - ay ) / length
+        mx, my = ( ax + bx ) / 2, ( ay + by ) / 2
+        tip = ( mx + ux * size, my + uy * size )
+        left = ( mx - ux * size - uy * size * .7, my - uy * size + ux * size * .7 )
+        right = ( mx - ux * size + uy * size * .7, my - uy * size - ux * size * .7 )
+        win = self.window( [ tip[0], left[0], right[0] ], [ tip[1], left[1], right[1] ] )
+        if win is None:
+            return
+        where, gx, gy = win
+        inside = np.ones( gx.shape, bool )
+        for ( px, py ), ( qx, qy ) in ( ( tip, left ), ( left, right ), ( right, tip ) ):
+            inside &= ( qx - px ) * ( gy - py ) - ( qy - py ) * ( gx - px ) <= 0
+        self.blend( where, inside, color, alpha )
+
+    def circle( self, at, r, color, alpha, shaded ):
+        cx, cy = self.xy( at )
+        r = r * self.scale
+        win = self.window( [ cx - r, cx + r ], [ cy - r, cy + r ] )
+        if win is None:
+            return
+        where, gx, gy = win
+        mask = np.hypot( gx - cx, gy - cy ) <= r
+        if not shaded:
+            self.blend( where, mask, color, alpha )
+            return
+        # ball color=: white at the upper left highlight, the color, dark at the rim
+        t = np.clip( np.hypot( gx - ( cx - .3 * r ), gy - ( cy - .3 * r ) ) / ( 1.3 * r ), 0, 1 )[..., None]
+        c = np.asarray( color )
+        shade = np.where( t < .55, 1 + ( c - 1 ) * ( t / .55 ), c * ( 1 - ( t - .55 ) / .45 ) )
+        region = self.img[where]
+        region[mask] = region[mask] * ( 1 - alpha ) + shade[mask] * alpha
+        self.line( [ ( at[0] + r / self.scale * np.cos( a ), at[1] + r / self.scale * np.sin( a ), at[2] ) for a in np.linspace( 0, 2 * np.pi, 33 ) ],
+                   ( 0, 0, 0 ), 1., scene.LINE_WIDTH )
+
+
+def rasterize( arch, width=256, height=None, aa=2 ):
+    # (h, w, 3) uint8 image of the arch fitted into width x height pixels
+    _need_numpy()
+    prims = scene.build( arch )
+    canvas = _Canvas( scene.bounds( prims ), width, height or width, aa )
+    for p in prims:
+        kind = p['kind']
+        if kind == 'polygon':
+            if p['fill'] is not None:
+                canvas.polygon( p['points'], p['fill'], p['opacity'] )
+            canvas.line( p['points'] + p['points'][:1], p['stroke'], 1., scene.LINE_WIDTH )
+        elif kind == 'line':
+            canvas.line( p['points'], p['stroke'], p['opacity'], p['width'], p['dashed'] )
+            if p['arrows'] == 'mid':
+                for a, b in zip( p['points'], p['points'][1:] ):
+                    canvas.arrow( a, b, p['stroke'], p['opacity'], canvas.px( 5. ) )
+        elif kind == 'circle':
+            canvas.circle( p['at'], p['r'], p['fill'], p['opacity'], p['shaded'] )
+        elif kind == 'image':
+            x, y, z = p['at']
+            w, h = p['width'] / 2, p['height'] / 2
+            corners = [ ( x, y + dy, z + dz ) for dy, dz in ( ( h, -w ), ( h, w ), ( -h, w ), ( -h, -w ) ) ]
+            canvas.polygon( corners, IMAGE_COLOR, 1. )
+            canvas.line( corners + corners[:1], ( .5, .5, .5 ), 1., scene.LINE_WIDTH )
+    img = canvas.img
+    if aa > 1:
+        h, w = img.shape[0] // aa * aa, img.shape[1] // aa * aa
+        img = img[:h, :w].reshape( h // aa, aa, w // aa, aa, 3 ).mean( axis=( 1, 3 ) )
+    return ( np.clip( img, 0, 1 ) * 255 + .5 ).astype( np.uint8 )
+
+
+def _chunk( kind, data ):
+    return struct.pack( '>I', len( data ) ) + kind + data + struct.pack( '>I', zlib.crc32( kind + data ) & 0xffffffff )
+
+
+def png( img ):
+    # 8-bit RGB PNG of an (h, w, 3) uint8 array; every row uses filter 0
+    h, w, _ = img.shape
+    raw = np.concatenate( [ np.zeros( ( h, 1 ), np.uint8 ), img.reshape( h, w * 3 ) ], axis=1 ).tobytes()
+    return ( b'\x89PNG\r\n\x1a\n' + _chunk( b'IHDR', struct.pack( '>IIBBBBB', w, h, 8, 2, 0, 0, 0 ) )
+             + _chunk( b'IDAT', zlib.compress( raw, 6 ) ) + _chunk( b'IEND', b'' ) )
+
+
+def write_thumbnail( arch, pathname='file.png', width=256, height=None, aa=2 ):
+    with open( pathname, 'wb' ) as f:
+        f.write( png( rasterize( arch, width, height, aa ) ) )
+    return pathname
+
+
+def thumbnails( sources, outdir='.', width=256, height=None, aa=2 ):
+    # render many archs in this process; yields a status dict per source
+    os.makedirs( outdir, exist_ok=True )
+    for src in sources:
+        job = to_job( src )
+        status = { 'name': job['name'], 'status': 'error', 'png': None, 'error': None }
+        start = time.perf_counter()
+        try:
+            arch = load_spec( job['spec'] ) if 'spec' in job else load_arch( job['script'] )
+            status['png'] = write_thumbnail( arch, os.path.join( outdir, job['name'] + '.png' ), width, height, aa )
+            status['status'] = 'ok'
+        except Exception as e:
+            status['error'] = '{}: {}'.format( type( e ).__name__, e )
+        status['seconds'] = time.perf_counter() - start
+        yield status
+
+
+def main( argv=None ):
+    parser = argparse.ArgumentParser( prog='python -m pycore.thumbnail', description='Rasterize arch scripts and specs to small PNGs without LaTeX.' )
+    parser.add_argument( 'sources', nargs='+', help='arch scripts (*.py), specs (*.json, *.jsonl, *.yaml) or directories of specs' )
+    parser.add_argument( '-o', '--outdir', default='.', help='directory for the PNGs' )
+    parser.add_argument( '--size', type=int, default=256, help='width (and height) to fit the picture into, in pixels' )
+    parser.add_argument( '--height', type=int, default=None, help='height to fit into, if not --size' )
+    parser.add_argument( '--aa', type=int, default=2, help='supersampling factor for antialiasing (1 turns it off)' )
+    args = parser.parse_args( argv )
+
+    _need_numpy()
+    status = 0
+    for r in thumbnails( expand_sources( args.sources ), args.outdir, args.size, args.height, args.aa ):
+        print( '{:5} {:6.3f}s  {}  {}'.format( r['status'], r['seconds'], r['name'], r['png'] or r['error'] ) )
+        status |= r['status'] != 'ok'
+    return int( status )
+
+
+if __name__ == '__main__':
+    sys.exit( main() )
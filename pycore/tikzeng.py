@@ -1,5 +1,9 @@
 
+import io
 import os
+import sys
+
+from . import assets, ir, registry
 
 def to_head( projectpath ):
     pathlayers = os.path.join( projectpath, 'layers/' ).replace('\\', '/')
@@ -34,165 +38,46 @@ def to_begin():
 """
 
 # layers definition
-
-def to_input( pathfile, to='(-3,0,0)', width=8, height=8, name="temp" ):
-    return r"""
-\node[canvas is zy plane at x=0] (""" + name + """) at """+ to +""" {\includegraphics[width="""+ str(width)+"cm"+""",height="""+ str(height)+"cm"+"""]{"""+ pathfile +"""}};
-"""
+# each to_* builds an IR node (pycore/ir.py) and returns its TeX with the node attached,
+# the layer kinds themselves are declared in pycore/registry.py
+
+def to_input( pathfile, to='(-3,0,0)', width=8, height=8, name="temp", dpi=None ):
+    # with a dpi (or assets.INPUT_DPI) the image is included resized to its printed size
+    dpi = dpi or assets.INPUT_DPI
+    node = ir.Input( pathfile, to, width, height, name )
+    if dpi:
+        # relative to the calling script, as when its TeX is compiled next to it
+        image = assets.downsample( pathfile, width, height, dpi, assets.site_dir( node ) )
+        node = node.replace( style=dict( node.style, image=image ) )
+    return ir.Fragment( node )
 
 # Conv
-def to_Conv( name, s_filer=256, n_filer=64, offset="(0,0,0)", to="(0,0,0)", width=1, height=40, depth=40, caption=" " ):
-    return r"""
-\pic[shift={"""+ offset +"""}] at """+ to +""" 
-    {Box={
-        name=""" + name +""",
-        caption="""+ caption +r""",
-        xlabel={{"""+ str(n_filer) +""", }},
-        zlabel="""+ str(s_filer) +""",
-        fill=\ConvColor,
-        height="""+ str(height) +""",
-        width="""+ str(width) +""",
-        depth="""+ str(depth) +"""
-        }
-    };
-"""
+to_Conv = ir.fragment( registry.Conv )
 
 # Conv,Conv,relu
 # Bottleneck
-def to_ConvConvRelu( name, s_filer=256, n_filer=(64,64), offset="(0,0,0)", to="(0,0,0)", width=(2,2), height=40, depth=40, caption=" " ):
-    return r"""
-\pic[shift={ """+ offset +""" }] at """+ to +""" 
-    {RightBandedBox={
-        name="""+ name +""",
-        caption="""+ caption +""",
-        xlabel={{ """+ str(n_filer[0]) +""", """+ str(n_filer[1]) +""" }},
-        zlabel="""+ str(s_filer) +""",
-        fill=\ConvColor,
-        bandfill=\ConvReluColor,
-        height="""+ str(height) +""",
-        width={ """+ str(width[0]) +""" , """+ str(width[1]) +""" },
-        depth="""+ str(depth) +"""
-        }
-    };
-"""
-
-
+to_ConvConvRelu = ir.fragment( registry.ConvConvRelu )
 
 # Pool
-def to_Pool(name, offset="(0,0,0)", to="(0,0,0)", width=1, height=32, depth=32, opacity=0.5, caption=" "):
-    return r"""
-\pic[shift={ """+ offset +""" }] at """+ to +""" 
-    {Box={
-        name="""+name+""",
-        caption="""+ caption +r""",
-        fill=\PoolColor,
-        opacity="""+ str(opacity) +""",
-        height="""+ str(height) +""",
-        width="""+ str(width) +""",
-        depth="""+ str(depth) +"""
-        }
-    };
-"""
+to_Pool = ir.fragment( registry.Pool )
 
 # unpool4, 
-def to_UnPool(name, offset="(0,0,0)", to="(0,0,0)", width=1, height=32, depth=32, opacity=0.5, caption=" "):
-    return r"""
-\pic[shift={ """+ offset +""" }] at """+ to +""" 
-    {Box={
-        name="""+ name +r""",
-        caption="""+ caption +r""",
-        fill=\UnpoolColor,
-        opacity="""+ str(opacity) +""",
-        height="""+ str(height) +""",
-        width="""+ str(width) +""",
-        depth="""+ str(depth) +"""
-        }
-    };
-"""
-
-
-
-def to_ConvRes( name, s_filer=256, n_filer=64, offset="(0,0,0)", to="(0,0,0)", width=6, height=40, depth=40, opacity=0.2, caption=" " ):
-    return r"""
-\pic[shift={ """+ offset +""" }] at """+ to +""" 
-    {RightBandedBox={
-        name="""+ name + """,
-        caption="""+ caption + """,
-        xlabel={{ """+ str(n_filer) + """, }},
-        zlabel="""+ str(s_filer) +r""",
-        fill={rgb:white,1;black,3},
-        bandfill={rgb:white,1;black,2},
-        opacity="""+ str(opacity) +""",
-        height="""+ str(height) +""",
-        width="""+ str(width) +""",
-        depth="""+ str(depth) +"""
-        }
-    };
-"""
+to_UnPool = ir.fragment( registry.UnPool )
 
+to_ConvRes = ir.fragment( registry.ConvRes )
 
 # ConvSoftMax
-def to_ConvSoftMax( name, s_filer=40, offset="(0,0,0)", to="(0,0,0)", width=1, height=40, depth=40, caption=" " ):
-    return r"""
-\pic[shift={"""+ offset +"""}] at """+ to +""" 
-    {Box={
-        name=""" + name +""",
-        caption="""+ caption +""",
-        zlabel="""+ str(s_filer) +""",
-        fill=\SoftmaxColor,
-        height="""+ str(height) +""",
-        width="""+ str(width) +""",
-        depth="""+ str(depth) +"""
-        }
-    };
-"""
+to_ConvSoftMax = ir.fragment( registry.ConvSoftMax )
 
 # SoftMax
-def to_SoftMax( name, s_filer=10, offset="(0,0,0)", to="(0,0,0)", width=1.5, height=3, depth=25, opacity=0.8, caption=" " ):
-    return r"""
-\pic[shift={"""+ offset +"""}] at """+ to +""" 
-    {Box={
-        name=""" + name +""",
-        caption="""+ caption +""",
-        xlabel={{" ","dummy"}},
-        zlabel="""+ str(s_filer) +""",
-        fill=\SoftmaxColor,
-        opacity="""+ str(opacity) +""",
-        height="""+ str(height) +""",
-        width="""+ str(width) +""",
-        depth="""+ str(depth) +"""
-        }
-    };
-"""
+to_SoftMax = ir.fragment( registry.SoftMax )
 
-def to_Sum( name, offset="(0,0,0)", to="(0,0,0)", radius=2.5, opacity=0.6):
-    return r"""
-\pic[shift={"""+ offset +"""}] at """+ to +""" 
-    {Ball={
-        name=""" + name +""",
-        fill=\SumColor,
-        opacity="""+ str(opacity) +""",
-        radius="""+ str(radius) +""",
-        logo=$+$
-        }
-    };
-"""
+to_Sum = ir.fragment( registry.Sum )
 
 
-def to_connection( of, to):
-    return r"""
-\draw [connection]  ("""+of+"""-east)    -- node {\midarrow} ("""+to+"""-west);
-"""
+to_connection = ir.fragment( ir.Connection )
 
-def to_skip( of, to, pos=1.25):
-    return r"""
-\path ("""+ of +"""-southeast) -- ("""+ of +"""-northeast) coordinate[pos="""+ str(pos) +"""] ("""+ of +"""-top) ;
-\path ("""+ to +"""-south)  -- ("""+ to +"""-north)  coordinate[pos="""+ str(pos) +"""] ("""+ to +"""-top) ;
-\draw [copyconnection]  ("""+of+"""-northeast)  
--- node {\copymidarrow}("""+of+"""-top)
--- node {\copymidarrow}("""+to+"""-top)
--- node {\copymidarrow} ("""+to+"""-north);
-"""
+to_skip = ir.fragment( ir.Skip )
 
 def to_end():
     return r"""
@@ -201,11 +86,29 @@ def to_end():
 """
 
 
-def to_generate( arch, pathname="file.tex" ):
-    with open(pathname, "w") as f: 
-        for c in arch:
-            print(c)
-            f.write( c )
-     
+def to_stream( arch, out, echo=False ):
+    # arch may be any iterable/generator of fragments, out any writable file-like object
+    if isinstance( out, ( io.RawIOBase, io.BufferedIOBase ) ) or 'b' in getattr( out, 'mode', '' ):
+        writer = io.TextIOWrapper( out, encoding='utf-8', newline='' )
+        try:
+            to_stream( arch, writer, echo )
+        finally:
+            writer.flush()
+            writer.detach()
+        return
+    for c in arch:
+        if not isinstance( c, str ):
+            c = c.tex()  # IR nodes and blocks are only turned into TeX here
+        out.write( c )
+        if echo:
+            sys.stdout.write( c + '\n' )
+
+
+def to_generate( arch, pathname="file.tex", echo=True ):
+    if hasattr( pathname, 'write' ):
+        return to_stream( arch, pathname, echo )
+    with open( pathname, "w", buffering=io.DEFAULT_BUFFER_SIZE * 16 ) as f:
+        to_stream( arch, f, echo )
+
 
 
@@ -0,0 +1,115 @@
+import re
+import sys
+import difflib
+import argparse
+
+from . import ir
+
+# Pre-flight checks of an arch before it is handed to LaTeX: every name used in
+# to=, to_connection, to_skip or a block's botton must be declared earlier in
+# the picture, exactly once, and the anchor must exist on that kind of pic.
+
+BOX_ANCHORS = frozenset( (
+    'west', 'east', 'north', 'south', 'anchor', 'near', 'far',
+    'nearwest', 'neareast', 'farwest', 'fareast', 'northeast', 'northwest', 'southeast', 'southwest',
+    'nearnortheast', 'farnortheast', 'nearsoutheast', 'farsoutheast',
+    'nearnorthwest', 'farnorthwest', 'nearsouthwest', 'farsouthwest',
+) )
+BALL_ANCHORS = frozenset( ( 'anchor', 'east', 'west', 'north', 'south' ) )
+
+# coordinate[pos=..] (name-top) as written by to_skip or by hand adds an anchor-like name
+_COORDINATE = re.compile( r'\bcoordinate\s*(?:\[[^\]]*\])?\s*\(\s*([^(),\s]+)-([A-Za-z]+)\s*\)' )
+
+
+class ArchError( ValueError ):
+
+    def __init__( self, problems ):
+        self.problems = problems
+        super().__init__( '\n'.join( p['message'] for p in problems ) )
+
+
+def anchors( node ):
+    # anchors a declaration provides, None when unknown (hand-written TeX)
+    if isinstance( node, ir.Layer ):
+        t = ir.LAYER_TYPES.get( node.kind )
+        if t is None:
+            return frozenset()  # \node based (to_input): no name-anchor coordinates
+        return BALL_ANCHORS if t.pic == 'Ball' else BOX_ANCHORS
+    return None
+
+
+def describe( node ):
+    if isinstance( node, ir.Layer ):
+        return "to_{}( '{}' )".format( node.kind if node.kind != 'Input' else 'input', node.name )
+    if isinstance( node, ir.Edge ):
+        return "to_{}( '{}', '{}' )".format( node.kind, node.of, node.to )
+    return 'hand-written TeX'
+
+
+def validate( arch ):
+    # list of problems, each a dict with kind, name, site and message; O(n) in the arch size
+    flat = []
+    for i, item in enumerate( arch ):
+        for node in ir.nodes( [ item ] ):
+            site = getattr( node, 'site', None ) or 'arch[{}]'.format( i )
+            if getattr( node, 'block', None ):
+                site = '{} (block {})'.format( site, node.block )
+            flat.append( ( node, site ) )
+
+    problems = []
+    def problem( kind, name, site, message ):
+        problems.append( { 'kind': kind, 'name': name, 'site': site, 'message': '{}: {}'.format( site, message ) } )
+
+    declared = {}
+    for pos, ( node, site ) in enumerate( flat ):
+        if isinstance( node, str ) and not ( '\\pic' in node or '\\node' in node or '\\coordinate' in node ):
+            continue
+        for name in ir.declares( node ):
+            if name in declared:
+                first = flat[declared[name][0]][1]
+                problem( 'duplicate', name, site, "{}: '{}' is already declared at {}".format( describe( node ), name, first ) )
+            else:
+                declared[name] = ( pos, anchors( node ) )
+
+    extra = set()
+    for pos, ( node, site ) in enumerate( flat ):
+        if isinstance( node, str ):
+            extra.update( _COORDINATE.findall( node ) )
+        for name, anchor in ir.references( node ):
+            if name not in declared:
+                close = difflib.get_close_matches( name, declared, n=1 )
+                hint = " (did you mean '{}'?)".format( close[0] ) if close else ''
+                problem( 'undefined', name, site, "{}: '{}' is not declared{}".format( describe( node ), name, hint ) )
+                continue
+            where, provided = declared[name]
+            if where > pos:
+                problem( 'order', name, site, "{}: '{}' is used before it is declared at {}".format( describe( node ), name, flat[where][1] ) )
+            elif provided is not None and anchor not in provided and ( name, anchor ) not in extra:
+                problem( 'anchor', name, site, "{}: '{}' has no anchor '{}'".format( describe( node ), name, anchor ) )
+        if isinstance( node, ir.Edge ) and node.kind == 'skip':
+            extra.update( ( ( node.of, 'top' ), ( node.to, 'top' ) ) )
+    return problems
+
+
+def check( arch ):
+    problems = validate( arch )
+    if problems:
+        raise ArchError( problems )
+
+
+def main( argv=None ):
+    from .render import load_arch
+    parser = argparse.ArgumentParser( prog='python -m pycore.validate', description='Check arch scripts for undefined, duplicate and misordered layer names.' )
+    parser.add_argument( 'scripts', nargs='+' )
+    args = parser.parse_args( argv )
+    failed = 0
+    for script in args.scripts:
+        problems = validate( load_arch( script ) )
+        for p in problems:
+            print( p['message'] )
+        failed += bool( problems )
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit( main() )
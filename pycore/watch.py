@@ -0,0 +1,155 @@
+import io
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+
+from .tikzeng import to_generate
+from .cache import dependencies, tex_digest
+from .validate import ArchError, check
+from .fmt import FORMAT_DIR, preamble_format
+from .render import ENGINE, to_job, load_arch, compile_tex
+from .spec import ROOT, load_spec
+from .incremental import render_incremental
+
+# Watch mode: python -m pycore.watch pyexamples/unet.py [-o unet.pdf]
+# Polls the arch script (or spec), layers/ and the files the generated TeX
+# depends on, waits until a burst of saves has settled and rebuilds in this
+# process, so pycore is imported once. A rebuild whose TeX (and dependencies)
+# hash to the same digest as the last one is skipped without compiling; the PDF
+# is replaced atomically, so viewers that reload on change never see half a file.
+
+LAYERS = os.path.join( ROOT, 'layers' )
+
+
+def snapshot( paths ):
+    # path -> ( mtime, size ), None for missing files
+    state = {}
+    for path in paths:
+        try:
+            st = os.stat( path )
+            state[path] = ( st.st_mtime_ns, st.st_size )
+        except OSError:
+            state[path] = None
+    return state
+
+
+def _layer_files():
+    try:
+        return [ os.path.join( LAYERS, f ) for f in sorted( os.listdir( LAYERS ) ) if f.endswith( ( '.sty', '.tex' ) ) ]
+    except OSError:
+        return []
+
+
+class Watcher:
+
+    def __init__( self, source, output=None, engine=ENGINE, timeout=None, formats=None, incremental=False, validate=True, log=print ):
+        self.job = to_job( source )
+        self.source = self.job.get( 'spec' ) or self.job['script']
+        self.output = os.path.abspath( output or os.path.splitext( self.source )[0] + '.pdf' )
+        self.engine, self.timeout, self.formats = engine, timeout, formats
+        self.incremental, self.validate = incremental, validate
+        self.log = log
+        self.digest = None
+        self.deps = []
+
+    def paths( self ):
+        return [ self.source ] + _layer_files() + self.deps
+
+    def build( self ):
+        # one rebuild; returns 'built', 'unchanged' or 'error'
+        start = time.perf_counter()
+        cwd = self.job['cwd']
+        try:
+            arch = load_spec( self.source ) if 'spec' in self.job else load_arch( self.source )
+            arch = list( arch )
+            if self.validate:
+                check( arch )
+            buf = io.StringIO()
+            to_generate( arch, buf, echo=False )
+            tex = buf.getvalue()
+            self.deps = [ os.path.abspath( p ) for p in dependencies( tex, cwd ) ]
+            digest = tex_digest( tex, cwd, self.engine )
+            if digest == self.digest and os.path.exists( self.output ):
+                self.log( 'unchanged {:6.3f}s  {}'.format( time.perf_counter() - start, self.output ) )
+                return 'unchanged'
+            self._compile( arch, tex, cwd )
+            self.digest = digest
+        except ArchError as e:
+            self.log( 'error: {}'.format( e ) )
+            return 'error'
+        except Exception as e:
+            self.log( 'error: {}: {}'.format( type( e ).__name__, e ) )
+            return 'error'
+        self.log( 'built     {:6.3f}s  {}'.format( time.perf_counter() - start, self.output ) )
+        return 'built'
+
+    def _compile( self, arch, tex, cwd ):
+        # compile next to the output and move it over the old PDF in one step
+        outdir = os.path.dirname( self.output )
+        os.makedirs( outdir, exist_ok=True )
+        tmp = '{}.{}.tmp'.format( self.output, os.getpid() )
+        if self.incremental:
+            render_incremental( arch, tmp, cwd, engine=self.engine, timeout=self.timeout, formats=self.formats )
+        else:
+            tmpdir = tempfile.mkdtemp( prefix='pnn_watch_' )
+            try:
+                texpath = os.path.join( tmpdir, os.path.splitext( os.path.basename( self.output ) )[0] + '.tex' )
+                with open( texpath, 'w', encoding='utf-8' ) as f:
+                    f.write( tex )
+                fmt = preamble_format( tex, cwd, self.engine, self.formats, self.timeout ) if self.formats is not None else None
+                shutil.copyfile( compile_tex( texpath, cwd, tmpdir, self.engine, self.timeout, fmt ), tmp )
+            finally:
+                shutil.rmtree( tmpdir, ignore_errors=True )
+        os.replace( tmp, self.output )
+
+    def run( self, interval=.25, debounce=.3 ):
+        self.build()
+        state = snapshot( self.paths() )
+        while True:
+            time.sleep( interval )
+            current = snapshot( self.paths() )
+            if current == state:
+                continue
+            # a burst of saves: wait until nothing changed for `debounce` seconds
+            while True:
+                time.sleep( debounce )
+                settled = snapshot( self.paths() )
+                if settled == current:
+                    break
+                current = settled
+            self.build()
+            state = snapshot( self.paths() )
+
+
+def main( argv=None ):
+    parser = argparse.ArgumentParser( prog='python -m pycore.watch', description='Rebuild the PDF of an arch script whenever it or the layer library changes.' )
+    parser.add_argument( 'source', help='arch script (*.py) or spec (*.json, *.jsonl, *.yaml)' )
+    parser.add_argument( '-o', '--output', default=None, help='PDF path (default: next to the source)' )
+    parser.add_argument( '--engine', default=ENGINE )
+    parser.add_argument( '--timeout', type=float, default=None, help='per-compile timeout in seconds' )
+    parser.add_argument( '--interval', type=float, default=.25, help='seconds between checks for changes' )
+    parser.add_argument( '--debounce', type=float, default=.3, help='seconds without changes before rebuilding' )
+    parser.add_argument( '--incremental', action='store_true', help='recompile only the layers that changed (pycore.incremental)' )
+    parser.add_argument( '--formats', metavar='DIR', nargs='?', const=FORMAT_DIR, default=None,
+                         help='compile against a precompiled preamble kept in DIR (default DIR: {})'.format( FORMAT_DIR ) )
+    parser.add_argument( '--no-validate', action='store_true', help='skip the layer name checks before compiling' )
+    parser.add_argument( '--once', action='store_true', help='build once and exit' )
+    args = parser.parse_args( argv )
+
+    watcher = Watcher( args.source, args.output, args.engine, args.timeout, args.formats,
+                       args.incremental, not args.no_validate )
+    if args.once:
+        return 0 if watcher.build() != 'error' else 1
+    print( 'watching {} (Ctrl-C to stop)'.format( watcher.source ) )
+    try:
+        watcher.run( args.interval, args.debounce )
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit( main() )
@@ -0,0 +1,82 @@
+import os
+import sys
+import json
+import stat
+
+import pytest
+
+ROOT = os.path.dirname( os.path.dirname( os.path.abspath( __file__ ) ) )
+sys.path.insert( 0, ROOT )
+
+BUDGETS = os.path.join( os.path.dirname( os.path.abspath( __file__ ) ), 'budgets.json' )
+
+# stands in for pdflatex: logs its arguments to <bin>/calls, fails like TeX on a layer named
+# `broken` and otherwise runs `body` with `out` (the output directory), `name` (the job name),
+# `tex` (the source) and `mode` (set by FakeEngine.mode) defined; the default body writes a PDF
+FAKE_ENGINE = '''#!{python}
+import os, sys, json
+here = os.path.dirname( sys.argv[0] )
+with open( os.path.join( here, 'calls' ), 'a' ) as f:
+    f.write( json.dumps( sys.argv[1:] ) + '\\n' )
+mode = open( os.path.join( here, 'mode' ) ).read().strip() if os.path.exists( os.path.join( here, 'mode' ) ) else 'ok'
+out = sys.argv[sys.argv.index( '-output-directory' ) + 1]
+name = os.path.splitext( os.path.basename( sys.argv[-1] ) )[0]
+tex = open( sys.argv[-1], encoding='utf-8' ).read()
+if 'name=broken' in tex:
+    print( '! Undefined control sequence.' )
+    sys.exit( 1 )
+{body}
+'''
+
+PDF = "open( os.path.join( out, name + '.pdf' ), 'w' ).write( '%PDF' )"
+
+
+class FakeEngine( str ):
+    # the path of a fake pdflatex, usable wherever an engine command is expected
+
+    def __new__( cls, bindir, body=PDF ):
+        path = bindir / 'pdflatex'
+        path.write_text( FAKE_ENGINE.format( python=sys.executable, body=body ) )
+        path.chmod( path.stat().st_mode | stat.S_IEXEC )
+        self = str.__new__( cls, str( path ) )
+        self.bindir = bindir
+        return self
+
+    def mode( self, mode ):
+        ( self.bindir / 'mode' ).write_text( mode )
+
+    def calls( self ):
+        log = self.bindir / 'calls'
+        return [ json.loads( l ) for l in log.read_text().splitlines() ] if log.exists() else []
+
+
+def pytest_addoption( parser ):
+    parser.addoption( '--update-golden', action='store_true', help='write the generated TeX of the examples as their new golden copies' )
+    parser.addoption( '--record-budgets', action='store_true', help='record the measured compile time and memory as the new budgets' )
+
+
+@pytest.fixture
+def fake_engine( tmp_path ):
+    # fake_engine( body ) writes a FakeEngine into tmp_path/bin
+    def make( body=PDF ):
+        bindir = tmp_path / 'bin'
+        bindir.mkdir( exist_ok=True )
+        return FakeEngine( bindir, body )
+    return make
+
+
+@pytest.fixture
+def update_golden( request ):
+    return request.config.getoption( '--update-golden' )
+
+
+@pytest.fixture( scope='session' )
+def budgets( request ):
+    # tests/budgets.json, written back at the end of the session with --record-budgets
+    with open( BUDGETS ) as f:
+        data = json.load( f )
+    yield data
+    if request.config.getoption( '--record-budgets' ):
+        with open( BUDGETS, 'w' ) as f:
+            json.dump( data, f, indent=2, sort_keys=True )
+            f.write( '\n' )
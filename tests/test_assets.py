@@ -0,0 +1,50 @@
+import os
+
+import pytest
+
+from pycore import assets, ir
+from pycore.tikzeng import to_input
+
+Image = pytest.importorskip( 'PIL.Image' )
+
+
+@pytest.fixture
+def photo( tmp_path ):
+    # 2000 x 500 px, drawn at 8 x 8 cm
+    path = tmp_path / 'photo.jpg'
+    Image.new( 'RGB', ( 2000, 500 ), ( 200, 10, 10 ) ).save( str( path ) )
+    return path
+
+
+def test_one_scale_for_both_sides( photo, tmp_path ):
+    out = assets.downsample( 'photo.jpg', 8, 8, 150, str( tmp_path ), str( tmp_path / 'assets' ) )
+    # 8 cm at 150 dpi is 472 px: the short side sets the scale, the aspect ratio is kept
+    assert Image.open( out ).size == ( 1888, 472 )
+
+
+def test_small_images_are_kept_and_remembered( photo, tmp_path, monkeypatch ):
+    assetdir = str( tmp_path / 'assets' )
+    assert assets.downsample( 'photo.jpg', 8, 8, 600, str( tmp_path ), assetdir ) == 'photo.jpg'
+    def fail( *args ):
+        raise AssertionError( 'opened again' )
+    monkeypatch.setattr( assets.Image, 'open', fail )
+    assert assets.downsample( 'photo.jpg', 8, 8, 600, str( tmp_path ), assetdir ) == 'photo.jpg'
+
+
+def test_missing_image_is_left_to_validate( tmp_path ):
+    assert assets.downsample( 'nope.jpg', 8, 8, 150, str( tmp_path ), str( tmp_path / 'assets' ) ) == 'nope.jpg'
+
+
+def test_relative_to_the_script( photo, tmp_path, monkeypatch ):
+    monkeypatch.setattr( assets, 'ASSET_DIR', str( tmp_path / 'assets' ) )
+    script = tmp_path / 'arch.py'
+    script.write_text( 'from pycore.tikzeng import to_input\narch = [ to_input( "photo.jpg", dpi=150 ) ]\n' )
+    monkeypatch.chdir( os.path.dirname( os.path.dirname( os.path.abspath( __file__ ) ) ) )
+    scope = {}
+    exec( compile( script.read_text(), str( script ), 'exec' ), scope )
+    assert scope['arch'][0].node.style['image'].startswith( str( tmp_path / 'assets' ) )
+
+    node = ir.Input( 'photo.jpg' )
+    node.site = '{}:2'.format( script )
+    out = assets.downsample_inputs( [ node ], 150 )
+    assert out[0].style['image'].startswith( str( tmp_path / 'assets' ) )
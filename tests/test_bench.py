@@ -0,0 +1,13 @@
+from pycore import bench
+from pycore.validate import check
+
+
+def test_synthetic_arch_is_valid():
+    arch = list( bench.synthetic_arch( 50 ) )
+    check( arch )
+    assert sum( 1 for c in arch if 'name=l' in c ) == 50
+
+
+def test_compare():
+    assert bench.compare( { 'a': 1.2, 'b': 2., 'c': 1. }, { 'a': 1., 'b': 1. } ) == [ ( 'b', 1., 2., 2. ) ]
+
@@ -0,0 +1,59 @@
+import os
+
+from pycore.cache import RenderCache, tex_digest
+
+
+def pdf( tmp_path, name, size ):
+    path = tmp_path / name
+    path.write_bytes( b'%' * size )
+    return str( path )
+
+
+def test_hit_and_miss( tmp_path ):
+    cache = RenderCache( str( tmp_path / 'cache' ) )
+    assert cache.get( 'k' ) is None
+    cache.put( 'k', pdf( tmp_path, 'a.pdf', 10 ) )
+    assert open( cache.get( 'k' ), 'rb' ).read() == b'%' * 10
+    assert ( cache.hits, cache.misses, cache.bytes_saved ) == ( 1, 1, 10 )
+
+
+def test_evicts_least_recently_used( tmp_path ):
+    cache = RenderCache( str( tmp_path / 'cache' ), max_bytes=25 )
+    cache.put( 'a', pdf( tmp_path, 'a.pdf', 10 ) )
+    cache.put( 'b', pdf( tmp_path, 'b.pdf', 10 ) )
+    os.utime( cache._file( 'a' ), ns=( 1, 1 ) )
+    os.utime( cache._file( 'b' ), ns=( 2, 2 ) )
+    cache.put( 'c', pdf( tmp_path, 'c.pdf', 10 ) )
+    assert cache.get( 'a' ) is None and cache.get( 'b' ) and cache.get( 'c' )
+
+
+def test_never_evicts_what_it_just_stored( tmp_path ):
+    cache = RenderCache( str( tmp_path / 'cache' ), max_bytes=25 )
+    cache.put( 'a', pdf( tmp_path, 'a.pdf', 10 ) )
+    # newer than the PDF being stored, e.g. touched by another process
+    os.utime( cache._file( 'a' ), ns=( 2**62, 2**62 ) )
+    path = cache.put( 'b', pdf( tmp_path, 'b.pdf', 20 ) )
+    assert os.path.exists( path ) and cache.get( 'a' ) is None
+
+
+def test_pdf_larger_than_the_cache( tmp_path ):
+    cache = RenderCache( str( tmp_path / 'cache' ), max_bytes=5 )
+    source = pdf( tmp_path, 'big.pdf', 10 )
+    assert cache.put( 'big', source ) == source and os.path.exists( source )
+    assert cache.stats()['entries'] == 0
+
+
+def test_digest_covers_dependencies( tmp_path ):
+    ( tmp_path / 'img.png' ).write_bytes( b'1' )
+    tex = '\\includegraphics{img.png}'
+    before = tex_digest( tex, str( tmp_path ) )
+    ( tmp_path / 'img.png' ).write_bytes( b'22' )
+    assert tex_digest( tex, str( tmp_path ) ) != before
+
+
+def test_meta_lives_and_dies_with_its_pdf( tmp_path ):
+    cache = RenderCache( str( tmp_path / 'cache' ), max_bytes=15 )
+    cache.put( 'a', pdf( tmp_path, 'a.pdf', 10 ), meta='1,2' )
+    assert cache.meta( 'a' ) == '1,2' and cache.meta( 'b' ) is None
+    cache.put( 'b', pdf( tmp_path, 'b.pdf', 10 ) )
+    assert cache.meta( 'a' ) is None and os.listdir( cache.path ) == [ 'b.pdf' ]
@@ -0,0 +1,137 @@
+import io
+import os
+import sys
+import time
+import glob
+import shutil
+import tempfile
+import subprocess
+
+import pytest
+
+from conftest import ROOT
+import texdiff
+
+from pycore.render import ENGINE, load_arch
+from pycore.tikzeng import to_generate
+from pycore.validate import check
+
+# Golden-output and budget checks for the examples:
+#   every Python-driven example still generates and validates,
+#   its TeX matches tests/golden/<name>.tex statement by statement,
+#   it compiles, as do the hand-written examples/*/*.tex, and stays within the
+#   time and peak memory recorded for it in tests/budgets.json.
+# pytest tests/ --update-golden accepts changed TeX, --record-budgets measures
+# new budgets (times the slack in budgets.json). Examples without a recorded
+# budget are only compiled. Compiles are skipped without pdflatex.
+
+GOLDEN = os.path.join( ROOT, 'tests', 'golden' )
+
+SCRIPTS = [ 'pyexamples/test_simple.py', 'pyexamples/unet.py', 'examples/hybrid_model.py', 'examples/cnn_feature_extractor.py' ]
+TEX = sorted( os.path.relpath( p, ROOT ) for p in glob.glob( os.path.join( ROOT, 'examples', '*', '*.tex' ) ) )
+
+# hand-written examples that cannot compile from their directory as committed
+BROKEN = {
+    'examples/AlexNet/alexnet.tex': 'subimports ../layers/, which does not exist under examples/',
+    'examples/LeNet/lenet.tex': 'subimports ../layers/, which does not exist under examples/',
+}
+
+needs_tex = pytest.mark.skipif( shutil.which( ENGINE ) is None, reason='{} is not installed'.format( ENGINE ) )
+
+
+def _name( path ):
+    return os.path.splitext( os.path.basename( path ) )[0]
+
+
+def generate( script ):
+    arch = list( load_arch( os.path.join( ROOT, script ) ) )
+    out = io.StringIO()
+    to_generate( arch, out, echo=False )
+    return arch, out.getvalue()
+
+
+def measure( cmd, cwd ):
+    # ( seconds, peak resident MB or None, exit status, output ) of one process
+    start = time.perf_counter()
+    with tempfile.TemporaryFile() as f:
+        proc = subprocess.Popen( cmd, cwd=cwd, stdout=f, stderr=subprocess.STDOUT, stdin=subprocess.DEVNULL )
+        if hasattr( os, 'wait4' ):
+            _, status, usage = os.wait4( proc.pid, 0 )
+            proc.returncode = os.waitstatus_to_exitcode( status )
+            # ru_maxrss is in KB on Linux and in bytes on macOS
+            rss = usage.ru_maxrss / ( 2**20 if sys.platform == 'darwin' else 2**10 )
+        else:
+            proc.wait()
+            rss = None
+        seconds = time.perf_counter() - start
+        f.seek( 0 )
+        log = f.read().decode( 'utf-8', 'replace' )
+    return seconds, rss, proc.returncode, log
+
+
+def check_budget( name, seconds, rss, budgets, record ):
+    if record:
+        slack = budgets.get( 'slack', 1.5 )
+        budgets['examples'][name] = { 'seconds': round( seconds * slack, 2 ), 'rss_mb': round( ( rss or 0 ) * slack, 1 ) or None }
+        return
+    budget = budgets['examples'].get( name )
+    if budget is None:
+        return
+    problems = []
+    if seconds > budget['seconds']:
+        problems.append( 'compiled in {:.2f}s, budget {:.2f}s (+{:.2f}s)'.format( seconds, budget['seconds'], seconds - budget['seconds'] ) )
+    if rss is not None and budget.get( 'rss_mb' ) and rss > budget['rss_mb']:
+        problems.append( 'peak memory {:.0f} MB, budget {:.0f} MB (+{:.0f} MB)'.format( rss, budget['rss_mb'], rss - budget['rss_mb'] ) )
+    if problems:
+        pytest.fail( '{}: {}'.format( name, '; '.join( problems ) ), pytrace=False )
+
+
+def compile_tex( texpath, cwd, outdir ):
+    cmd = [ ENGINE, '-interaction=nonstopmode', '-halt-on-error', '-output-directory', str( outdir ), texpath ]
+    seconds, rss, status, log = measure( cmd, cwd )
+    if status != 0 or not os.path.exists( os.path.join( str( outdir ), _name( texpath ) + '.pdf' ) ):
+        pytest.fail( '{} exited with {}\n{}'.format( ENGINE, status, '\n'.join( log.splitlines()[-20:] ) ), pytrace=False )
+    return seconds, rss
+
+
+@pytest.mark.parametrize( 'script', SCRIPTS, ids=_name )
+def test_generates( script ):
+    arch, tex = generate( script )
+    check( arch )
+    assert '\\begin{document}' in tex and tex.rstrip().endswith( '\\end{document}' )
+
+
+@pytest.mark.parametrize( 'script', SCRIPTS, ids=_name )
+def test_matches_golden( script, update_golden ):
+    _, tex = generate( script )
+    path = os.path.join( GOLDEN, _name( script ) + '.tex' )
+    if update_golden:
+        with open( path, 'w', encoding='utf-8' ) as f:
+            f.write( tex )
+        return
+    if not os.path.exists( path ):
+        pytest.fail( '{} has no golden copy (pytest --update-golden writes {})'.format( script, os.path.relpath( path, ROOT ) ), pytrace=False )
+    with open( path, encoding='utf-8' ) as f:
+        golden = f.read()
+    delta = texdiff.diff( golden, tex, os.path.relpath( path, ROOT ) )
+    if delta:
+        pytest.fail( '{} no longer generates its golden TeX (pytest --update-golden accepts it):\n{}'.format( script, delta ), pytrace=False )
+
+
+@needs_tex
+@pytest.mark.parametrize( 'script', SCRIPTS, ids=_name )
+def test_script_compiles( script, tmp_path, budgets, request ):
+    _, tex = generate( script )
+    texpath = str( tmp_path / ( _name( script ) + '.tex' ) )
+    with open( texpath, 'w', encoding='utf-8' ) as f:
+        f.write( tex )
+    seconds, rss = compile_tex( texpath, os.path.dirname( os.path.join( ROOT, script ) ), tmp_path )
+    check_budget( script, seconds, rss, budgets, request.config.getoption( '--record-budgets' ) )
+
+
+@needs_tex
+@pytest.mark.parametrize( 'tex', [ pytest.param( t, marks=pytest.mark.xfail( reason=BROKEN[t] ) ) if t in BROKEN else t for t in TEX ], ids=_name )
+def test_example_compiles( tex, tmp_path, budgets, request ):
+    path = os.path.join( ROOT, tex )
+    seconds, rss = compile_tex( path, os.path.dirname( path ), tmp_path )
+    check_budget( tex, seconds, rss, budgets, request.config.getoption( '--record-budgets' ) )
@@ -0,0 +1,72 @@
+import os
+
+import pytest
+
+from pycore import fmt
+from pycore.render import compile_cached
+
+TEX = '\\documentclass{article}\n\\usepackage{tikz}\n\\begin{document}\nx\n\\end{document}\n'
+
+# -ini runs dump a format; mode fail rejects them, mode slow hangs in them
+FORMAT = '''if '-ini' in sys.argv:
+    if mode == 'slow':
+        import time
+        time.sleep( 5 )
+    if mode == 'fail':
+        sys.exit( 1 )
+    open( os.path.join( out, 'pnn.fmt' ), 'w' ).write( 'format' )
+else:
+    open( os.path.join( out, name + '.pdf' ), 'w' ).write( '%PDF' )
+'''
+
+
+@pytest.fixture
+def engine( fake_engine ):
+    return fake_engine( FORMAT )
+
+
+def test_split_preamble():
+    assert fmt.split_preamble( TEX )[0] == '\\documentclass{article}\n\\usepackage{tikz}\n'
+    assert fmt.split_preamble( 'no document' ) == ( None, 'no document' )
+
+
+def test_compiles_against_the_format( engine, tmp_path ):
+    texpath = tmp_path / 'd.tex'
+    texpath.write_text( TEX )
+    formats = str( tmp_path / 'formats' )
+    compile_cached( str( texpath ), str( tmp_path ), str( tmp_path ), str( engine ), formats=formats )
+    built, compiled = engine.calls()
+    assert '-ini' in built and 'mylatexformat.ltx' in built
+    path = fmt.preamble_format( TEX, str( tmp_path ), str( engine ), formats )
+    assert os.path.exists( path + '.fmt' ) and '-fmt=' + path in compiled
+    # built once
+    compile_cached( str( texpath ), str( tmp_path ), str( tmp_path ), str( engine ), formats=formats )
+    assert len( engine.calls() ) == 3
+
+
+def test_formats_are_opt_in( engine, tmp_path ):
+    texpath = tmp_path / 'd.tex'
+    texpath.write_text( TEX )
+    compile_cached( str( texpath ), str( tmp_path ), str( tmp_path ), str( engine ) )
+    assert [ a for c in engine.calls() for a in c if a.startswith( '-fmt' ) or a == '-ini' ] == []
+
+
+def test_rejected_preamble_is_remembered( engine, tmp_path, monkeypatch ):
+    engine.mode( 'fail' )
+    formats = str( tmp_path / 'formats' )
+    assert fmt.preamble_format( TEX, str( tmp_path ), str( engine ), formats ) is None
+    assert fmt.preamble_format( TEX, str( tmp_path ), str( engine ), formats ) is None
+    assert len( engine.calls() ) == 1
+    # until it expires
+    monkeypatch.setattr( fmt, 'RETRY_FAILED', 0 )
+    engine.mode( 'ok' )
+    assert fmt.preamble_format( TEX, str( tmp_path ), str( engine ), formats ) is not None
+
+
+def test_timeout_is_not_remembered( engine, tmp_path ):
+    engine.mode( 'slow' )
+    formats = str( tmp_path / 'formats' )
+    assert fmt.preamble_format( TEX, str( tmp_path ), str( engine ), formats, timeout=.5 ) is None
+    assert not any( f.endswith( '.failed' ) for f in os.listdir( formats ) )
+    engine.mode( 'ok' )
+    assert fmt.preamble_format( TEX, str( tmp_path ), str( engine ), formats ) is not None
@@ -0,0 +1,61 @@
+import os
+import sys
+import stat
+
+import pytest
+
+from pycore import frames
+from pycore.blocks import block_2ConvPool
+from pycore.tikzeng import to_head, to_cor, to_begin, to_end, to_Conv, to_skip
+
+# stands in for pdftoppm: the "PDF" holds its page count, pages are written as <root>-<n>.png
+PDFTOPPM = '''#!{python}
+import sys
+pdf, root = sys.argv[-2:]
+count = int( open( pdf ).read() )
+for n in range( 1, count + 1 ):
+    open( '{{}}-{{:0{{}}d}}.png'.format( root, n, len( str( count ) ) ), 'w' ).write( str( n ) )
+'''
+
+
+def arch():
+    return [ to_head( '.' ), to_cor(), to_begin(), to_Conv( 'a' ), block_2ConvPool( 'b', 'a', 'p' ),
+             to_Conv( 'c', offset='(1,0,0)', to='(p-east)' ), to_skip( 'a', 'c' ), to_end() ]
+
+
+def test_schedules():
+    assert frames.schedule( arch() ) == [ { 'a' }, { 'ccr_b' }, { 'p' }, { 'c' } ]
+    assert frames.schedule( arch(), by='blocks' ) == [ { 'a' }, { 'b' }, { 'c' } ]
+    assert frames.schedule( arch(), by='skips' ) == [ { 'a->c', 'a', 'c' } ]
+    assert frames.schedule( arch(), by='blocks', cumulative=True )[-1] == { 'a', 'b', 'c' }
+    with pytest.raises( ValueError ):
+        frames.schedule( arch(), by='nope' )
+
+
+def test_frames_tex_fades_what_is_not_lit():
+    tex = frames.frames_tex( arch(), [ { 'a' }, { 'b' } ] )
+    assert tex.count( '\\begin{tikzpicture}' ) == 2 and tex.count( '\\begin{document}' ) == 1
+    first, second = tex.split( '% frame 2' )
+    assert first.count( 'transparency group' ) == 5  # the block's two layers and connection, c and the skip
+    assert second.count( 'transparency group' ) == 3  # a, c and the skip
+
+
+@pytest.fixture
+def pdftoppm( tmp_path, monkeypatch ):
+    bindir = tmp_path / 'bin'
+    bindir.mkdir()
+    path = bindir / 'pdftoppm'
+    path.write_text( PDFTOPPM.format( python=sys.executable ) )
+    path.chmod( path.stat().st_mode | stat.S_IEXEC )
+    monkeypatch.setenv( 'PATH', '{}{}{}'.format( bindir, os.pathsep, os.environ['PATH'] ) )
+
+
+def test_frame_images_returns_only_this_run( pdftoppm, tmp_path ):
+    pdf = tmp_path / 'frames.pdf'
+    out = str( tmp_path / 'png' )
+    pdf.write_text( '12' )
+    assert len( frames.frame_images( str( pdf ), out ) ) == 12
+    pdf.write_text( '3' )
+    images = frames.frame_images( str( pdf ), out )
+    assert [ os.path.basename( p ) for p in images ] == [ 'frame-001.png', 'frame-002.png', 'frame-003.png' ]
+    assert open( images[2] ).read() == '3'
@@ -0,0 +1,28 @@
+import pytest
+
+from pycore import geometry
+from pycore.tikzeng import to_Conv, to_ConvConvRelu, to_Sum
+
+
+def test_box_anchors():
+    out = geometry.tex( to_Conv( 'c', width=2, height=10, depth=10 ).node )
+    assert '\\coordinate (c-east)' in out and '\\coordinate (c-northeast)' in out and out.endswith( '\\end{scope}\n' )
+
+
+def test_banded_box_draws_every_band():
+    out = geometry.tex( to_ConvConvRelu( 'c', n_filer=( 64, 64 ), width=( 2, 3 ) ).node )
+    assert out.count( '\\draw [band]' ) == 3  # one per band and the east face
+
+
+def test_ball():
+    assert '\\shade[ball color=' in geometry.tex( to_Sum( 's' ).node )
+
+
+@pytest.mark.parametrize( 'width', [ (), [], '{}' ] )
+def test_box_without_width( width ):
+    with pytest.raises( ValueError, match="layer 'c' has no width" ):
+        geometry.tex( to_Conv( 'c', width=width ).node )
+
+
+def test_expand_keeps_hand_written_tex():
+    assert geometry.expand( [ '% note\n', [ to_Conv( 'c' ) ] ] )[0] == '% note\n'
@@ -0,0 +1,42 @@
+import os
+
+import pytest
+
+from pycore import incremental
+from pycore.tikzeng import to_head, to_cor, to_begin, to_end, to_Conv, to_Pool, to_connection
+
+# a PDF of 1000 bytes and a log with the origin marker of a unit
+UNIT = '''open( os.path.join( out, name + '.pdf' ), 'w' ).write( '%' * 1000 )
+open( os.path.join( out, name + '.log' ), 'w' ).write( 'PNN-ORIGIN:1.5pt,-2pt\\n' )
+'''
+
+
+@pytest.fixture
+def engine( fake_engine ):
+    return fake_engine( UNIT )
+
+
+def arch( caption='a' ):
+    return [ to_head( '.' ), to_cor(), to_begin(), to_Conv( 'a', caption=caption ), to_Pool( 'b', offset='(1,0,0)', to='(a-east)' ),
+             to_connection( 'a', 'b' ), to_end() ]
+
+
+def test_rebuilds_only_what_changed( engine, tmp_path ):
+    out = str( tmp_path / 'out.pdf' )
+    first = incremental.render_incremental( arch(), out, str( tmp_path ), str( tmp_path / 'cache' ), engine )
+    assert first['units'] == 3 and len( first['rebuilt'] ) == 3 and os.path.exists( out )
+    assert incremental.render_incremental( arch(), out, str( tmp_path ), str( tmp_path / 'cache' ), engine )['rebuilt'] == []
+    assert incremental.render_incremental( arch( 'edited' ), out, str( tmp_path ), str( tmp_path / 'cache' ), engine )['rebuilt'] == [ 'a' ]
+
+
+def test_unit_cache_is_bounded( engine, tmp_path ):
+    out = str( tmp_path / 'out.pdf' )
+    cache = str( tmp_path / 'cache' )
+    for caption in 'abcde':
+        incremental.render_incremental( arch( caption ), out, str( tmp_path ), cache, engine, max_bytes=3500 )
+    files = os.listdir( os.path.join( cache, 'units' ) )
+    assert len( [ f for f in files if f.endswith( '.pdf' ) ] ) == 3
+    assert len( [ f for f in files if f.endswith( '.meta' ) ] ) == 3
+    # the diagram never evicts its own units, even when they do not all fit
+    report = incremental.render_incremental( arch( 'f' ), out, str( tmp_path ), cache, engine, max_bytes=1500 )
+    assert len( report['rebuilt'] ) == 1 and os.path.exists( out )
@@ -0,0 +1,38 @@
+import pickle
+
+from pycore import ir
+from pycore.blocks import block_2ConvPool, block_Res
+from pycore.tikzeng import to_Conv, to_connection, to_skip
+
+
+def test_fragments_are_their_tex():
+    c = to_Conv( 'a', caption='x' )
+    assert isinstance( c, str ) and c == c.node.tex() and c.node.kind == 'Conv'
+    assert c.node.site.startswith( __file__ )
+
+
+def test_replace_and_equality():
+    a = to_Conv( 'a' ).node
+    b = a.replace( name='b' )
+    assert b.name == 'b' and a.name == 'a' and b.labels is not a.labels
+    assert a == a.replace() and hash( a ) == hash( a.replace() ) and a != b
+    assert a.key() == to_Conv( 'a' ).node.key()
+
+
+def test_references_and_declares():
+    assert ir.declares( to_Conv( 'a' ).node ) == [ 'a' ]
+    assert ir.references( to_Conv( 'b', to='(a-east)' ).node ) == [ ( 'a', 'east' ) ]
+    assert ir.references( to_connection( 'a', 'b' ).node ) == [ ( 'a', 'east' ), ( 'b', 'west' ) ]
+    assert ( 'b', 'north' ) in ir.references( to_skip( 'a', 'b' ).node )
+    assert ir.declares( '\\node (x) at (0,0) {};\n\\pic {Box={name=y}};' ) == [ 'y', 'x' ]
+
+
+def test_blocks():
+    block = block_2ConvPool( 'b', 'a', 'p' )
+    assert block.kind == '2ConvPool' and all( n.block == 'b' for n in ir.nodes( block ) )
+    assert list( ir.flatten( [ [ block ] ] ) ) == list( block )
+    # a compact block is one item in flatten and survives pickling with its text
+    compact = block_Res( 3, 'r', 'a', 't', compact=True )
+    assert list( ir.flatten( [ compact ] ) ) == [ compact ]
+    again = pickle.loads( pickle.dumps( compact ) )
+    assert again.tex() == compact.tex() and again[0].node == compact[0].node
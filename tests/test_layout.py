@@ -0,0 +1,68 @@
+import os
+
+import pytest
+
+from conftest import ROOT
+from pycore import ir, layout, spec
+from pycore.blocks import block_2ConvPool, block_Res
+from pycore.render import load_arch
+from pycore.tikzeng import to_Conv, to_Pool, to_connection
+
+
+def tex( arch ):
+    return ir.to_tex( ir.flatten( arch ) )
+
+
+def test_chain_gets_columns():
+    arch = [ to_Conv( 'a' ), to_Conv( 'b', offset='(1,0,0)', to='(a-east)' ), to_connection( 'a', 'b' ) ]
+    pos = layout.positions( arch, gap=2. )
+    a, b = layout.graph( arch )[0]
+    drawn = layout.extent( a )[0] + layout.overhang( a ) + layout.overhang( b )
+    assert pos['b'][0] - pos['a'][0] == pytest.approx( drawn + 2. )
+    assert pos['a'][1] == pos['b'][1]
+
+
+def test_branches_get_lanes():
+    arch = [ to_Conv( 'a' ), to_Conv( 'b' ), to_Conv( 'c' ), to_connection( 'a', 'b' ), to_connection( 'a', 'c' ) ]
+    pos = layout.positions( arch )
+    assert pos['b'][0] == pos['c'][0] and pos['b'][1] != pos['c'][1]
+
+
+def test_glued_layers_touch():
+    arch = [ to_Conv( 'a' ), block_2ConvPool( 'b1', 'a', 'pool_b1' ) ]
+    layers = { l.name: l for l in layout.graph( arch )[0] }
+    pos = layout.positions( arch )
+    assert pos['pool_b1'][0] - pos['ccr_b1'][0] == pytest.approx( layout.extent( layers['ccr_b1'] )[0] )
+    assert pos['pool_b1'][1] == pos['ccr_b1'][1]
+
+
+def test_unet_blocks_stay_together():
+    arch = list( load_arch( os.path.join( ROOT, 'pyexamples', 'unet.py' ) ) )
+    layers = { l.name: l for l in layout.graph( arch )[0] }
+    pos = layout.positions( arch )
+    for a, b in ( ( 'ccr_b1', 'pool_b1' ), ( 'unpool_b6', 'ccr_res_b6' ), ( 'ccr_b6', 'ccr_res_c_b6' ) ):
+        assert pos[b][0] - pos[a][0] == pytest.approx( layout.extent( layers[a] )[0] )
+    # columns do not overlap, depth included
+    assert pos['ccr_b2'][0] - layout.overhang( layers['ccr_b2'] ) > pos['pool_b1'][0] + layout.extent( layers['pool_b1'] )[0] + layout.overhang( layers['pool_b1'] )
+
+
+def test_cycle():
+    arch = [ to_Pool( 'a' ), to_Pool( 'b' ), to_connection( 'a', 'b' ), to_connection( 'b', 'a' ) ]
+    with pytest.raises( ValueError, match='cycle' ):
+        layout.positions( arch )
+
+
+@pytest.mark.parametrize( 'spliced', [ False, True ], ids=[ 'block', 'spliced' ] )
+def test_compact_blocks_keep_their_edges( spliced ):
+    block = block_Res( 3, 'r', 'a', 't', compact=True )
+    arch = [ to_Conv( 'a' ) ] + ( list( block ) if spliced else [ block ] )
+    out = tex( layout.layout( arch ) )
+    # drawn node by node at the new positions: every layer, connection and the skip
+    assert out.count( '\\pic' ) == 4 and out.count( '\\draw [connection]' ) == 3 and out.count( '[copyconnection]' ) == 1
+    assert 'pnnResBlock' not in out
+
+
+def test_compact_blocks_in_specs_keep_their_edges():
+    records = [ { 'type': 'Conv', 'name': 'a' }, { 'block': 'Res', 'num': 3, 'name': 'r', 'top': 't', 'compact': True } ]
+    out = tex( spec.build( records ) )
+    assert out.count( '\\draw [connection]' ) == 3 and out.count( '[copyconnection]' ) == 1
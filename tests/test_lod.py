@@ -0,0 +1,48 @@
+from pycore import ir, lod
+from pycore.blocks import block_2ConvPool, block_Res
+from pycore.validate import check
+from pycore.tikzeng import to_head, to_cor, to_begin, to_end, to_Conv, to_SoftMax, to_connection
+
+
+def chain( n ):
+    # n pool blocks between a and out
+    items = [ to_Conv( 'a' ) ]
+    prev = 'a'
+    for i in range( n ):
+        items.append( block_2ConvPool( 'b{}'.format( i ), prev, 'p{}'.format( i ) ) )
+        prev = 'p{}'.format( i )
+    items += [ to_SoftMax( 'out', to='({}-east)'.format( prev ) ), to_connection( prev, 'out' ) ]
+    return [ to_head( '.' ), to_cor(), to_begin() ] + items + [ to_end() ]
+
+
+def layers( arch ):
+    return [ n for n in ir.nodes( arch ) if isinstance( n, ir.Layer ) ]
+
+
+def test_small_archs_are_unchanged():
+    arch = chain( 4 )
+    assert lod.collapse( arch ) == arch
+
+
+def test_runs_of_blocks_collapse():
+    out = lod.collapse( chain( 5 ), max_layers=4 )
+    names = [ l.name for l in layers( out ) ]
+    # the run is one box named after its last layer, captioned with the count
+    assert names == [ 'a', 'p4', 'out' ]
+    assert layers( out )[1].labels['caption'] == '$\\times 5$'
+    check( out )
+
+
+def test_detail():
+    # a full block splits the run in two
+    assert [ l.name for l in layers( lod.collapse( chain( 7 ), max_layers=4, detail={ 'b3': 'full' } ) ) ] == \
+        [ 'a', 'p2', 'ccr_b3', 'p3', 'p6', 'out' ]
+    # a summary block is one box even below max_layers
+    arch = [ to_head( '.' ), to_cor(), to_begin(), to_Conv( 'a' ), block_Res( 4, 'res', 'a', 'r' ), to_end() ]
+    out = lod.collapse( arch, detail={ 'res': 'summary' } )
+    assert [ l.name for l in layers( out ) ] == [ 'a', 'r' ]
+    check( out )
+
+
+def test_canvas_width():
+    assert lod.canvas_width( [ to_Conv( 'a', width=10 ).node, to_Conv( 'b', offset='(2,0,0)', width=10 ).node ] ) > 2
@@ -0,0 +1,77 @@
+import io
+
+import pytest
+
+from pycore import multi
+from pycore.render import to_job
+from pycore.tikzeng import to_head, to_cor, to_begin, to_end, to_Conv, to_generate
+
+pypdf = pytest.importorskip( 'pypdf' )
+
+# a page per layer n<width>, that many pt wide
+PAGES = '''import re, pypdf
+writer = pypdf.PdfWriter()
+for m in re.finditer( r'name=n(\\d+)', tex ):
+    writer.add_blank_page( width=int( m.group( 1 ) ), height=72 )
+writer.write( os.path.join( out, name + '.pdf' ) )
+'''
+
+
+def tex( name ):
+    out = io.StringIO()
+    to_generate( [ to_head( '.' ), to_cor(), to_begin(), to_Conv( name ), to_end() ], out, echo=False )
+    return out.getvalue()
+
+
+def test_prefix_names():
+    assert multi.prefix_names( '\\begin{tikzpicture}\n', 'd0-' ) == '\\begin{tikzpicture}[name prefix=d0-]\n'
+    assert multi.prefix_names( '\\begin{tikzpicture}[x=1cm]\n', 'd1-' ) == '\\begin{tikzpicture}[name prefix=d1-,x=1cm]\n'
+
+
+def test_pack():
+    doc, counts = multi.pack( [ tex( 'a' ), tex( 'a' ) ] )
+    assert counts == [ 1, 1 ]
+    assert doc.count( '\\begin{document}' ) == 1 and doc.count( '\\end{document}' ) == 1
+    assert 'name prefix=d0-' in doc and 'name prefix=d1-' in doc
+
+
+def widths( path ):
+    return [ int( p.mediabox.width ) for p in pypdf.PdfReader( path ).pages ]
+
+
+def pdf( path, n ):
+    writer = pypdf.PdfWriter()
+    for i in range( n ):
+        writer.add_blank_page( width=72 * ( i + 1 ), height=72 )
+    with open( path, 'wb' ) as f:
+        writer.write( f )
+    return path
+
+
+def test_split_pdf( tmp_path ):
+    packed = pdf( str( tmp_path / 'pack.pdf' ), 3 )
+    outs = multi.split_pdf( packed, [ 2, 1 ], [ str( tmp_path / 'a.pdf' ), str( tmp_path / 'b.pdf' ) ] )
+    assert [ widths( o ) for o in outs ] == [ [ 72, 144 ], [ 216 ] ]
+    with pytest.raises( RuntimeError, match='has 3 pages, expected 4' ):
+        multi.split_pdf( packed, [ 2, 2 ], [ str( tmp_path / 'a.pdf' ), str( tmp_path / 'b.pdf' ) ] )
+
+
+@pytest.fixture
+def engine( fake_engine ):
+    return fake_engine( PAGES )
+
+
+def test_render_pack( engine, tmp_path ):
+    jobs = [ to_job( [ to_head( '.' ), to_cor(), to_begin(), to_Conv( 'n{}'.format( 100 + i ) ), to_end() ], 'd{}'.format( i ), str( tmp_path ) )
+             for i in range( 3 ) ]
+    results = multi.render_pack( jobs, str( tmp_path / 'out' ), engine=engine )
+    assert [ ( r['status'], r['pack'] ) for r in results ] == [ ( 'ok', 3 ) ] * 3
+    assert [ widths( r['pdf'] ) for r in results ] == [ [ 100 ], [ 101 ], [ 102 ] ]
+
+
+def test_broken_diagram_fails_alone( engine, tmp_path ):
+    archs = [ [ to_head( '.' ), to_cor(), to_begin(), to_Conv( name ), to_end() ] for name in ( 'n100', 'broken', 'n102' ) ]
+    jobs = [ to_job( a, 'd{}'.format( i ), str( tmp_path ) ) for i, a in enumerate( archs ) ]
+    results = multi.render_pack( jobs, str( tmp_path / 'out' ), engine=engine )
+    assert [ r['status'] for r in results ] == [ 'ok', 'error', 'ok' ]
+    assert widths( results[2]['pdf'] ) == [ 102 ]
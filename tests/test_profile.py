@@ -0,0 +1,28 @@
+import pytest
+
+from pycore import profile
+from pycore.tikzeng import to_head, to_cor, to_begin, to_end, to_Conv, to_connection
+
+
+def arch():
+    return [ to_head( '.' ), to_cor(), to_begin(), to_Conv( 'a' ), to_Conv( 'b', to='(a-east)' ), to_connection( 'a', 'b' ), to_end() ]
+
+
+def test_instrument_marks_every_item():
+    chunks, info = profile.instrument( arch() )
+    assert [ e['item'] for e in info ] == [ 'Conv a', 'Conv b', 'connection a -> b' ]
+    tex = ''.join( chunks )
+    assert tex.count( '\\pnnprof{' ) == 5  # begin, one per item and end
+    assert tex.index( '\\pnnprof{begin}' ) > tex.index( '\\begin{document}' )
+    with pytest.raises( ValueError ):
+        profile.instrument( [ to_Conv( 'a' ) ] )
+
+
+def test_report():
+    _, info = profile.instrument( arch() )
+    log = 'PNN-PROF:begin:65536\nPNN-PROF:0:131072\nPNN-PROF:1:851968\nPNN-PROF:2:917504\nPNN-PROF:end:1310720\n'
+    result = profile.report( info, profile.parse_log( log ) )
+    assert result['phases']['preamble'] == 1 and result['phases']['picture'] == 13 and result['phases']['shipout'] == 6
+    # ranked by the time TeX spent on the item
+    assert [ ( e['item'], e['tex_seconds'] ) for e in result['items'] ] == [ ( 'Conv b', 11 ), ( 'Conv a', 1 ), ( 'connection a -> b', 1 ) ]
+    assert 'Conv b' in profile.format_report( result )
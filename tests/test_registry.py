@@ -0,0 +1,40 @@
+import pytest
+
+from pycore import registry
+
+
+def test_single_xlabel_padding():
+    assert 'xlabel={{64, }},' in registry.Conv( 'c' ).tex()
+    assert 'xlabel={{64, 32}},' in registry.Conv( 'c', n_filer=( 64, 32 ) ).tex()
+    to_Norm = registry.register_layer( 'TestNorm', 'Box', keys=( 'xlabel', 'width' ), args=( 'n_filer', ),
+                                       pad_xlabel=False, n_filer=16, width=1 )
+    assert 'xlabel={{16}},' in to_Norm( 'n' ).tex()
+    assert 'xlabel={{16, 8}},' in to_Norm( 'n', ( 16, 8 ) ).tex()
+
+
+def test_arguments():
+    assert 'width=3' in registry.Conv( 'c', 256, 64, '(0,0,0)', '(0,0,0)', 3 ).tex()
+    with pytest.raises( TypeError, match="unexpected keyword argument 'nope'" ):
+        registry.Conv( 'c', nope=1 )
+    with pytest.raises( TypeError, match="multiple values for argument 's_filer'" ):
+        registry.Conv( 'c', 1, s_filer=2 )
+
+
+def test_builtin_kinds_cannot_be_scoped():
+    with pytest.raises( ValueError, match="layer type 'Conv' is built in" ):
+        registry.scoped_layer( 'Conv', 'Box', keys=( 'width', ) )
+
+
+def test_kinds_are_not_replaced_by_accident():
+    with pytest.raises( ValueError, match="layer type 'Conv' is built in" ):
+        registry.define_layer( 'Conv', 'Ball', keys=( 'fill', ) )
+    assert registry.Conv( 'c' ).tex().count( 'Box={' ) == 1
+    first = registry.register_layer( 'TestTwice', 'Box', keys=( 'width', ), width=1 )
+    # declaring it again the same way (a script run twice) is fine
+    again = registry.register_layer( 'TestTwice', 'Box', keys=( 'width', ), width=1 )
+    layer = first( 'l' )
+    with pytest.raises( ValueError, match="'TestTwice' is already declared differently" ):
+        registry.register_layer( 'TestTwice', 'Box', keys=( 'width', ), width=2 )
+    assert 'width=1' in layer.tex() and again( 'm' ).tex().count( 'width=1' ) == 1
+    replaced = registry.register_layer( 'TestTwice', 'Box', keys=( 'width', ), width=2, replace=True )
+    assert 'width=2' in replaced( 'n' ).tex()
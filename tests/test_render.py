@@ -0,0 +1,49 @@
+import os
+
+import pytest
+
+from pycore import render
+from pycore.cache import RenderCache
+from pycore.validate import ArchError
+from pycore.tikzeng import to_head, to_cor, to_begin, to_end, to_Conv
+
+@pytest.fixture
+def engine( fake_engine ):
+    return fake_engine()
+
+
+def arch( name='a', to='(0,0,0)' ):
+    return [ to_head( '.' ), to_cor(), to_begin(), to_Conv( name, to=to ), to_end() ]
+
+
+def test_to_job( tmp_path ):
+    assert render.to_job( str( tmp_path / 'net.py' ) ) == { 'name': 'net', 'script': str( tmp_path / 'net.py' ), 'cwd': str( tmp_path ) }
+    assert 'spec' in render.to_job( 'specs/net.yaml' ) and 'tex' in render.to_job( 'net.tex' )
+    with pytest.raises( ValueError ):
+        render.to_job( arch() )
+
+
+def test_render_is_cached( engine, tmp_path ):
+    cache = RenderCache( str( tmp_path / 'cache' ) )
+    out = str( tmp_path / 'a.pdf' )
+    assert render.render( arch(), out, str( tmp_path ), cache, engine ) == 'miss'
+    assert render.render( arch(), out, str( tmp_path ), cache, engine ) == 'hit'
+    assert open( out ).read() == '%PDF'
+    with pytest.raises( ArchError ):
+        render.render( arch( to='(x-east)' ), out, str( tmp_path ), cache, engine )
+
+
+def test_render_batch_reports_each_job( engine, tmp_path ):
+    jobs = [ render.to_job( arch( name ), name, str( tmp_path ) ) for name in ( 'a', 'broken', 'c' ) ]
+    results = render.render_batch( jobs, str( tmp_path / 'out' ), workers=1, engine=engine )
+    assert [ r['status'] for r in results ] == [ 'ok', 'error', 'ok' ]
+    assert 'Undefined control sequence' in results[1]['error']
+    assert os.path.exists( str( tmp_path / 'out' / 'c.pdf' ) )
+
+
+def test_render_and_jobs_prepare_the_same_arch( tmp_path ):
+    a = [ to_head( '.' ), to_cor(), to_begin(), to_Conv( 'a' ), to_Conv( 'b', to='(a-east)' ), to_end() ]
+    texpath = render.generate_job( render.to_job( a, 'j', str( tmp_path ) ), str( tmp_path ), styles=True, geometry=True )
+    assert open( texpath ).read() == ''.join( render.prepare( a, str( tmp_path ), styles=True, geometry=True ) )
+    with pytest.raises( ArchError ):
+        render.prepare( arch( to='(x-east)' ) )
@@ -0,0 +1,63 @@
+import os
+import re
+
+from conftest import ROOT
+from pycore import ir, route, scene
+from pycore.blocks import block_2ConvPool
+from pycore.render import load_arch
+from pycore.tikzeng import to_head, to_cor, to_begin, to_end, to_Conv, to_connection, to_skip
+
+
+def tex( arch ):
+    return ''.join( c if isinstance( c, str ) else c.tex() for c in ir.flatten( arch ) )
+
+
+def edges( arch ):
+    return { ( n.of, n.to ): n for n in ir.nodes( arch ) if isinstance( n, ir.Edge ) }
+
+
+def test_unet_skips_get_their_own_lanes():
+    arch = route.route( load_arch( os.path.join( ROOT, 'pyexamples', 'unet.py' ) ) )
+    anchors = {}
+    scene.build( arch, anchors )
+    heights = {}
+    for e in edges( arch ).values():
+        if e.kind == 'skip':
+            y0, y1 = route._heights( anchors, e.of, 'southeast', 'northeast' )
+            heights[e.of] = y0 + e.pos[0] * ( y1 - y0 )
+    # nested from the inside out: the outer skips run above the inner ones
+    assert heights['ccr_b1'] > heights['ccr_b2'] > heights['ccr_b3'] > heights['ccr_b4']
+
+
+def blocked( compact ):
+    # a -> ccr_b runs through x
+    return [ to_head( '.' ), to_cor(), to_begin(), to_Conv( 'a' ), to_Conv( 'x', offset='(1,0,0)', to='(a-east)' ),
+             block_2ConvPool( 'b', 'a', 'p', offset='(4,0,0)', compact=compact ), to_end() ]
+
+
+def test_connections_in_compact_blocks_are_routed():
+    plain, compact = route.route( blocked( False ) ), route.route( blocked( True ) )
+    assert edges( plain )[( 'a', 'ccr_b' )].pos is not None
+    assert edges( compact )[( 'a', 'ccr_b' )].pos == edges( plain )[( 'a', 'ccr_b' )].pos
+    # drawn node by node, the macro call is gone
+    assert tex( compact ) == tex( plain ) and 'pnnTwoConvPool' not in tex( compact )
+
+
+def test_compact_blocks_without_routed_edges_stay_compact():
+    arch = [ to_head( '.' ), to_cor(), to_begin(), to_Conv( 'a' ), block_2ConvPool( 'b', 'a', 'p', compact=True ), to_end() ]
+    assert 'pnnTwoConvPool' in tex( route.route( arch ) )
+
+
+def test_lane_coordinates_are_unique():
+    arch = [ to_head( '.' ), to_cor(), to_begin(), to_Conv( 'a' ), to_Conv( 'x', offset='(1,0,0)', to='(a-east)' ),
+             to_Conv( 'b', offset='(4,0,0)', to='(a-east)' ), to_Conv( 'c', offset='(1,0,0)', to='(b-east)' ),
+             to_connection( 'a', 'b' ), to_connection( 'a', 'c' ), to_end() ]
+    out = tex( route.route( arch ) )
+    names = re.findall( r'coordinate\[pos=[^\]]*\] \(([^)]*)\)', out )
+    assert len( names ) == 4 and len( set( names ) ) == 4
+
+
+def test_flat_layers_are_left_alone():
+    arch = [ to_head( '.' ), to_cor(), to_begin(), to_Conv( 'a', height=0 ), to_Conv( 'b', offset='(2,0,0)', to='(a-east)' ),
+             to_skip( 'a', 'b' ), to_end() ]
+    assert edges( route.route( arch ) )[( 'a', 'b' )].pos == 1.25
@@ -0,0 +1,35 @@
+import pytest
+
+from pycore import scene
+from pycore.geometry import SCALE
+from pycore.tikzeng import to_head, to_cor, to_begin, to_end, to_Conv, to_Sum, to_connection
+
+
+def test_colors():
+    assert scene.color( 'red' ) == ( 1., 0., 0. )
+    assert scene.color( 'rgb:red,1;white,1' ) == ( 1., .5, .5 )
+    assert scene.color( 'red!50!blue' ) == ( .5, 0., .5 )
+    assert scene.color( '\\Mine', { 'Mine': '{rgb:blue,1}' } ) == ( 0., 0., 1. )
+    assert scene.color( '\\SumColor' ) == scene.color( scene.DEFAULT_COLORS['SumColor'] )
+
+
+def test_points():
+    assert scene.point( '(1,2)', {} ) == ( 1., 2., 0. )
+    assert scene.point( '(a-east)', { 'a-east': ( 3., 0., 0. ) } ) == ( 3., 0., 0. )
+    assert scene.point( '($(a-east)+(1,0,0)-(0,1,0)$)', { 'a-east': ( 3., 0., 0. ) } ) == ( 4., -1., 0. )
+
+
+def test_layers_are_placed_on_their_anchors():
+    anchors = {}
+    prims = scene.build( [ to_head( '.' ), to_cor(), to_begin(), to_Conv( 'a', width=2 ),
+                           to_Sum( 's', offset='(1,0,0)', to='(a-east)' ), to_connection( 'a', 's' ), to_end() ], anchors )
+    assert anchors['a-east'] == pytest.approx( ( 2 * SCALE, 0., 0. ) )
+    assert anchors['s-anchor'] == pytest.approx( ( 2 * SCALE + 1, 0., 0. ) )
+    line = [ p for p in prims if p['kind'] == 'line' and p['arrows'] == 'mid' ]
+    assert line[0]['points'] == [ anchors['a-east'], anchors['s-west'] ]
+    assert [ p for p in prims if p['kind'] == 'circle' ][0]['fill'] == scene.color( '\\SumColor' )
+
+
+def test_bounds():
+    assert scene.bounds( [] ) == ( 0., 0., 1., 1. )
+    assert scene.bounds( [ { 'kind': 'circle', 'at': ( 0, 0, 0 ), 'r': 1 } ], margin=0 ) == ( -1, -1, 1, 1 )
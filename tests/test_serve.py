@@ -0,0 +1,82 @@
+import json
+import asyncio
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+from pycore import serve
+
+CONV = json.dumps( [ { 'type': 'Conv', 'name': 'c' } ] )
+
+
+def run( coro ):
+    return asyncio.run( coro )
+
+
+async def respond( service, data ):
+    reader = asyncio.StreamReader()
+    reader.feed_data( data )
+    reader.feed_eof()
+    return await service._respond( reader )
+
+
+def post( body, length=None ):
+    length = len( body ) if length is None else length
+    return 'POST /render?format=svg HTTP/1.1\r\nContent-Length: {}\r\n\r\n'.format( length ).encode() + body
+
+
+@pytest.mark.parametrize( 'length', [ '-5', 'abc', '1e3' ] )
+def test_bad_content_length( length ):
+    status, _, body = run( respond( serve.Service( 1 ), post( b'{}', length ) ) )
+    assert status == 400 and b'Content-Length' in body
+
+
+def test_short_body():
+    status, _, _ = run( respond( serve.Service( 1 ), post( b'{}', 10 ) ) )
+    assert status == 400
+
+
+def test_read_timeout( monkeypatch ):
+    monkeypatch.setattr( serve, 'READ_TIMEOUT', .05 )
+    async def go():
+        reader = asyncio.StreamReader()
+        reader.feed_data( b'POST /render HTTP/1.1\r\n' )
+        return await serve.Service( 1 )._respond( reader )
+    assert run( go() )[0] == 408
+
+
+def test_types_do_not_leak_between_requests():
+    ball = json.dumps( [ { 'types': { 'Conv': { 'pic': 'Ball', 'keys': [ 'fill' ] } } }, { 'type': 'Conv', 'name': 'c' } ] )
+    plain = serve.render_spec( CONV, 'svg' )
+    with pytest.raises( ValueError ):
+        serve.render_spec( ball, 'svg' )
+    assert serve.render_spec( CONV, 'svg' ) == plain
+
+
+class Broken:
+    def submit( self, fn, *args ):
+        f = Future()
+        f.set_exception( BrokenProcessPool( 'a worker died' ) )
+        return f
+
+    def shutdown( self, wait=True ):
+        pass
+
+
+def test_broken_pool_is_replaced_and_counted_once():
+    async def go():
+        service = serve.Service( 1 )
+        service._pool = lambda: ThreadPoolExecutor( 1 )
+        await service.start()
+        service.pool = Broken()
+        try:
+            # two identical requests share the one failing render
+            answers = await asyncio.gather( respond( service, post( CONV.encode() ) ), respond( service, post( CONV.encode() ) ) )
+            assert [ a[0] for a in answers ] == [ 500, 500 ]
+            assert service.counts['failed'] == 1 and service.counts['coalesced'] == 1
+            status, headers, _ = await respond( service, post( CONV.encode() ) )
+            assert status == 200 and headers['Content-Type'] == 'image/svg+xml'
+        finally:
+            await service.stop()
+    run( go() )
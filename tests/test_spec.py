@@ -0,0 +1,44 @@
+import pytest
+
+from pycore import ir, spec
+from pycore.tikzeng import to_generate
+
+
+def tex( records ):
+    return ''.join( c if isinstance( c, str ) else c.tex() for c in ir.flatten( spec.build( records ) ) )
+
+
+def test_builds_layers_and_edges():
+    out = tex( [ { 'type': 'Conv', 'name': 'a', 'shape': [ 64, 256, 256 ] }, { 'type': 'Pool', 'name': 'b' },
+                 { 'of': 'a', 'to': 'b', 'type': 'skip' } ] )
+    assert 'name=a,' in out and 'name=b,' in out and '(a-southeast)' in out
+
+
+def test_unknown_type():
+    with pytest.raises( ValueError, match="unknown layer type 'Nope'" ):
+        spec.build( [ { 'type': 'Nope', 'name': 'a' } ] )
+
+
+def test_types_stay_in_their_spec():
+    ball = { 'types': { 'Quantum': { 'pic': 'Ball', 'keys': [ 'fill', 'radius' ], 'defaults': { 'radius': 2 } } } }
+    assert 'Ball={' in tex( [ ball, { 'type': 'Quantum', 'name': 'q' } ] )
+    with pytest.raises( ValueError, match="unknown layer type 'Quantum'" ):
+        spec.build( [ { 'type': 'Quantum', 'name': 'q' } ] )
+    # the same name declared differently by another spec is its own kind
+    box = { 'types': { 'Quantum': { 'pic': 'Box', 'keys': [ 'fill', 'width' ] } } }
+    assert 'Box={' in tex( [ box, { 'type': 'Quantum', 'name': 'q' } ] )
+    assert 'Ball={' in tex( [ ball, { 'type': 'Quantum', 'name': 'q' } ] )
+
+
+def test_types_cannot_replace_builtins():
+    plain = tex( [ { 'type': 'Conv', 'name': 'c' } ] )
+    with pytest.raises( ValueError, match="'Conv' is built in" ):
+        spec.build( [ { 'types': { 'Conv': { 'pic': 'Ball', 'keys': [ 'fill' ] } } }, { 'type': 'Conv', 'name': 'c' } ] )
+    assert tex( [ { 'type': 'Conv', 'name': 'c' } ] ) == plain
+
+
+def test_parse_jsonl( tmp_path ):
+    arch = spec.build( spec.parse( '{"type": "Conv", "name": "a"}\n\n{"type": "Conv", "name": "b"}\n', '.jsonl' ) )
+    out = tmp_path / 'x.tex'
+    to_generate( arch, str( out ), echo=False )
+    assert '(a-east)' in out.read_text()
@@ -0,0 +1,35 @@
+from pycore import ir, styles
+from pycore.tikzeng import to_head, to_cor, to_begin, to_end, to_Conv, to_Pool, to_generate
+
+
+def tex( arch ):
+    return ''.join( c if isinstance( c, str ) else c.tex() for c in arch )
+
+
+def arch( *layers ):
+    return [ to_head( '.' ), to_cor(), to_begin() ] + list( layers ) + [ to_end() ]
+
+
+def test_repeated_bodies_become_one_style():
+    out = tex( styles.dedup( arch( to_Conv( 'a' ), to_Conv( 'b', to='(a-east)' ), to_Conv( 'c', to='(b-east)' ) ) ) )
+    assert out.count( '\\tikzset{/boxblock/pnnstyle1/.style={' ) == 1
+    assert all( '{{Box={{name={}, pnnstyle1}}}}'.format( n ) in out for n in 'abc' )
+
+
+def test_appearance_is_shared_when_bodies_differ():
+    out = tex( styles.dedup( arch( to_Conv( 'a', caption='x' ), to_Conv( 'b', caption='y', to='(a-east)' ) ) ) )
+    assert '{Box={name=a, pnnstyle1, caption=x,' in out and 'fill=\\ConvColor' in out.split( '\\pic' )[0]
+
+
+def test_nothing_repeated():
+    a = arch( to_Conv( 'a' ), to_Pool( 'b', to='(a-east)' ) )
+    assert tex( styles.dedup( a ) ) == tex( ir.flatten( a ) )
+
+
+def test_colors_defined_again_are_dropped():
+    out = tex( styles.dedup( [ to_head( '.' ), to_cor(), '\\def\\ConvColor{rgb:red,1}\n', to_begin(), to_end() ] ) )
+    assert out.count( '\\def\\ConvColor' ) == 1 and '\\def\\ConvColor{rgb:red,1}' in out
+
+
+def test_hash_in_options_is_escaped():
+    assert '##' in styles.define( 'pnnstyle1', 'Box', [ ( 2, 'fill=#1' ) ] )
@@ -0,0 +1,30 @@
+import os
+import xml.etree.ElementTree as ET
+
+import pytest
+
+from conftest import ROOT
+from pycore import svg
+from pycore.render import load_arch
+from pycore.tikzeng import to_Conv
+
+SVG = '{http://www.w3.org/2000/svg}'
+
+
+def test_unet_as_svg( tmp_path ):
+    path = svg.write_svg( load_arch( os.path.join( ROOT, 'pyexamples', 'unet.py' ) ), str( tmp_path / 'unet.svg' ) )
+    root = ET.parse( path ).getroot()
+    assert root.tag == SVG + 'svg' and float( root.get( 'width' )[:-2] ) > 0
+    assert len( root.findall( SVG + 'polygon' ) ) > 100 and root.findall( SVG + 'text' )
+
+
+def test_main( tmp_path, capsys ):
+    assert svg.main( [ os.path.join( ROOT, 'pyexamples', 'test_simple.py' ), '-o', str( tmp_path ) ] ) == 0
+    assert os.path.exists( str( tmp_path / 'test_simple.svg' ) ) and capsys.readouterr().out.startswith( 'ok' )
+    ( tmp_path / 'bad.py' ).write_text( 'x = 1\n' )
+    assert svg.main( [ str( tmp_path / 'bad.py' ), '-o', str( tmp_path ) ] ) == 1
+
+
+def test_box_without_width():
+    with pytest.raises( ValueError, match="layer 'c' has no width" ):
+        svg.to_svg( [ to_Conv( 'c', width=() ) ] )
@@ -0,0 +1,32 @@
+import os
+import struct
+
+import pytest
+
+from conftest import ROOT
+from pycore import thumbnail
+from pycore.render import load_arch
+from pycore.tikzeng import to_head, to_cor, to_begin, to_end, to_Conv
+
+np = pytest.importorskip( 'numpy' )
+
+
+def test_rasterize_fits_the_size():
+    img = thumbnail.rasterize( load_arch( os.path.join( ROOT, 'pyexamples', 'unet.py' ) ), 128 )
+    assert img.dtype == np.uint8 and max( img.shape[:2] ) <= 128 and img.shape[2] == 3
+    # something was drawn on the white background
+    assert ( img < 250 ).any() and ( img == 255 ).any()
+
+
+def test_png( tmp_path ):
+    arch = [ to_head( '.' ), to_cor(), to_begin(), to_Conv( 'a' ), to_end() ]
+    data = open( thumbnail.write_thumbnail( arch, str( tmp_path / 'a.png' ), 64 ), 'rb' ).read()
+    assert data[:8] == b'\x89PNG\r\n\x1a\n'
+    w, h = struct.unpack( '>II', data[16:24] )
+    assert max( w, h ) <= 64 and data.endswith( b'IEND\xaeB`\x82' )
+
+
+def test_thumbnails_report_errors( tmp_path ):
+    ( tmp_path / 'bad.py' ).write_text( 'x = 1\n' )
+    status = list( thumbnail.thumbnails( [ str( tmp_path / 'bad.py' ) ], str( tmp_path / 'out' ) ) )
+    assert status[0]['status'] == 'error' and 'does not define `arch`' in status[0]['error']
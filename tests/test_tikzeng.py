@@ -0,0 +1,41 @@
+import io
+
+from pycore.blocks import block_2ConvPool
+from pycore.tikzeng import to_head, to_cor, to_begin, to_end, to_Conv, to_connection, to_generate, to_stream
+
+
+def arch():
+    return [ to_head( '.' ), to_cor(), to_begin(), to_Conv( 'a' ), block_2ConvPool( 'b', 'a', 'p' ),
+             to_connection( 'a', 'ccr_b' ), to_end() ]
+
+
+def joined( arch ):
+    # what the list-based to_generate wrote: every fragment in order
+    out = []
+    for c in arch:
+        out += [ str( x ) for x in c ] if isinstance( c, list ) else [ c ]
+    return ''.join( out )
+
+
+def test_generator_input_matches_the_list( tmp_path ):
+    path = str( tmp_path / 'a.tex' )
+    to_generate( ( c for c in arch() ), path, echo=False )
+    assert open( path ).read() == joined( arch() )
+
+
+def test_echo( capsys ):
+    to_generate( arch(), io.StringIO(), echo=False )
+    assert capsys.readouterr().out == ''
+    to_generate( arch(), io.StringIO() )
+    # as print() did: every item followed by a newline, a block as one item
+    assert capsys.readouterr().out == ''.join( ( c if isinstance( c, str ) else c.tex() ) + '\n' for c in arch() )
+
+
+def test_file_like_objects():
+    text = io.StringIO()
+    to_stream( iter( arch() ), text )
+    assert text.getvalue() == joined( arch() )
+    # binary streams are written as UTF-8 and stay open
+    data = io.BytesIO()
+    to_generate( arch() + [ '% µ\n' ], data, echo=False )
+    assert not data.closed and data.getvalue().decode( 'utf-8' ) == joined( arch() ) + '% µ\n'
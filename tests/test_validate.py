@@ -0,0 +1,40 @@
+import pytest
+
+from pycore.validate import ArchError, check, validate
+from pycore.tikzeng import to_head, to_cor, to_begin, to_end, to_Conv, to_Pool, to_Sum, to_connection, to_skip
+
+
+def arch( *layers ):
+    return [ to_head( '.' ), to_cor(), to_begin() ] + list( layers ) + [ to_end() ]
+
+
+def kinds( a ):
+    return [ p['kind'] for p in validate( a ) ]
+
+
+def test_valid_arch():
+    check( arch( to_Conv( 'a' ), to_Pool( 'b', to='(a-east)' ), to_connection( 'a', 'b' ), to_skip( 'a', 'b' ) ) )
+
+
+def test_undefined_suggests_a_name():
+    problems = validate( arch( to_Conv( 'conv1' ), to_Pool( 'p', to='(conv2-east)' ) ) )
+    assert [ p['kind'] for p in problems ] == [ 'undefined' ]
+    assert "'conv2' is not declared (did you mean 'conv1'?)" in problems[0]['message']
+
+
+def test_duplicate_order_and_anchor():
+    assert kinds( arch( to_Conv( 'a' ), to_Conv( 'a', to='(a-east)' ) ) ) == [ 'duplicate' ]
+    assert kinds( arch( to_connection( 'a', 'b' ), to_Conv( 'a' ), to_Conv( 'b' ) ) ) == [ 'order', 'order' ]
+    assert kinds( arch( to_Sum( 's' ), to_Conv( 'c', to='(s-northeast)' ) ) ) == [ 'anchor' ]
+
+
+def test_hand_written_tex():
+    # names declared and used by hand-written TeX count too, skip tops are known anchors
+    assert kinds( arch( '\\coordinate (x) at (0,0,0);\n', to_Conv( 'a', to='(x-east)' ) ) ) == []
+    assert kinds( arch( to_Conv( 'a' ), to_Conv( 'b' ), to_skip( 'a', 'b' ), '\\draw (a-top) -- (b-top);\n' ) ) == []
+
+
+def test_check_raises_with_every_problem():
+    with pytest.raises( ArchError ) as e:
+        check( arch( to_Conv( 'a', to='(x-east)' ), to_Conv( 'b', to='(y-east)' ) ) )
+    assert [ p['name'] for p in e.value.problems ] == [ 'x', 'y' ]
@@ -0,0 +1,29 @@
+import os
+
+from pycore import watch
+
+SCRIPT = '''from pycore.tikzeng import *
+arch = [ to_head( '.' ), to_cor(), to_begin(), to_Conv( 'a', caption='{}' ), to_Pool( 'b', to='({}-east)' ), to_end() ]
+'''
+
+
+def test_rebuilds_only_on_change( fake_engine, tmp_path ):
+    engine = fake_engine()
+    script = tmp_path / 'arch.py'
+    script.write_text( SCRIPT.format( 'x', 'a' ) )
+    log = []
+    w = watch.Watcher( str( script ), engine=engine, log=log.append )
+    assert w.build() == 'built' and os.path.exists( str( tmp_path / 'arch.pdf' ) )
+    assert w.build() == 'unchanged' and len( engine.calls() ) == 1
+    script.write_text( SCRIPT.format( 'y', 'a' ) )
+    assert w.build() == 'built' and len( engine.calls() ) == 2
+    # a broken arch keeps the last PDF
+    script.write_text( SCRIPT.format( 'y', 'nope' ) )
+    assert w.build() == 'error' and "'nope' is not declared" in log[-1]
+    assert os.path.exists( str( tmp_path / 'arch.pdf' ) ) and len( engine.calls() ) == 2
+
+
+def test_snapshot( tmp_path ):
+    ( tmp_path / 'a' ).write_text( 'x' )
+    state = watch.snapshot( [ str( tmp_path / 'a' ), str( tmp_path / 'b' ) ] )
+    assert state[str( tmp_path / 'a' )][1] == 1 and state[str( tmp_path / 'b' )] is None
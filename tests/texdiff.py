@@ -0,0 +1,67 @@
+import re
+import difflib
+
+# Structural comparison of generated TeX: the document is cut into statements
+# (\pic ...;, \draw ...;, \def..., \begin{...}, ...) at brace depth 0, comments
+# and whitespace are dropped and the key=value options of a pic are sorted, so
+# only changes to what is drawn show up in the diff.
+
+_START = re.compile( r'\\(?:pic|draw|node|path|coordinate|def|begin|end|usepackage|subimport|usetikzlibrary|'
+                     r'documentclass|newcommand|tikzstyle|tikzset)\b' )
+_COMMENT = re.compile( r'(?<!\\)%.*' )
+_PIC = re.compile( r'^(\\pic.*?\{\s*\w+\s*=\s*\{)(.*)(\}\s*\}\s*;)$', re.S )
+
+
+def _split_top( text, sep=',' ):
+    # split at `sep` outside braces
+    parts, depth, start = [], 0, 0
+    for i, ch in enumerate( text ):
+        if ch == '{':
+            depth += 1
+        elif ch == '}':
+            depth -= 1
+        elif ch == sep and depth == 0:
+            parts.append( text[start:i] )
+            start = i + 1
+    parts.append( text[start:] )
+    return parts
+
+
+def _squash( s ):
+    s = re.sub( r'\s+', ' ', s ).strip()
+    return re.sub( r'\s*([,={}();\[\]])\s*', r'\1', s )
+
+
+def statements( tex ):
+    text = '\n'.join( _COMMENT.sub( '', line ) for line in tex.splitlines() )
+    out, depth, start = [], 0, 0
+    for i, ch in enumerate( text ):
+        if ch == '{':
+            depth += 1
+        elif ch == '}':
+            depth -= 1
+        elif ch == '\\' and depth == 0 and i > start and _START.match( text, i ):
+            out.append( text[start:i] )
+            start = i
+    out.append( text[start:] )
+    result = []
+    for s in out:
+        s = s.strip()
+        if not s:
+            continue
+        m = _PIC.match( s )
+        if m:
+            options = sorted( _squash( o ) for o in _split_top( m.group( 2 ) ) if o.strip() )
+            s = _squash( m.group( 1 ) ) + ','.join( options ) + _squash( m.group( 3 ) )
+        else:
+            s = _squash( s )
+        result.append( s )
+    return result
+
+
+def diff( expected, actual, name='golden' ):
+    # unified diff of the statements, '' when they are the same
+    a, b = statements( expected ), statements( actual )
+    if a == b:
+        return ''
+    return '\n'.join( difflib.unified_diff( a, b, name, 'generated', lineterm='', n=2 ) )